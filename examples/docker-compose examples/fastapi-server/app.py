@@ -1,126 +1,100 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException, Query
-import psycopg2
 import os
-from typing import List, Dict, Any, Optional
-import json
-from psycopg2.extras import RealDictCursor
+from psycopg.rows import dict_row
+from psycopg_pool import AsyncConnectionPool, PoolTimeout
 
-app = FastAPI(title="Products API", description="API for products and stores")
+def get_conninfo():
+    """PostgreSQL connection string from the environment"""
+    return (
+        f"host={os.getenv('POSTGRES_HOST', 'postgres')} "
+        f"dbname={os.getenv('POSTGRES_DB', 'pricedb')} "
+        f"user={os.getenv('POSTGRES_USER', 'postgres')} "
+        f"password={os.getenv('POSTGRES_PASSWORD', 'postgres')} "
+        f"port=5432"
+    )
 
-def get_db_connection():
-    """Create PostgreSQL connection"""
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open the connection pool at startup and close it at shutdown"""
+    app.state.pool = AsyncConnectionPool(
+        get_conninfo(),
+        min_size=int(os.getenv('DB_POOL_MIN_SIZE', '2')),
+        max_size=int(os.getenv('DB_POOL_MAX_SIZE', '10')),
+        # Requests wait this long for a free connection before getting a 503
+        timeout=float(os.getenv('DB_POOL_TIMEOUT', '10')),
+        kwargs={"row_factory": dict_row, "autocommit": True},
+        open=False,
+    )
+    await app.state.pool.open()
+    print(f"Database pool opened (max {app.state.pool.max_size} connections)")
     try:
-        connection = psycopg2.connect(
-            host=os.getenv('POSTGRES_HOST', 'postgres'),
-            database=os.getenv('POSTGRES_DB', 'pricedb'),
-            user=os.getenv('POSTGRES_USER', 'postgres'),
-            password=os.getenv('POSTGRES_PASSWORD', 'postgres'),
-            port=5432,
-            cursor_factory=RealDictCursor
-        )
-        return connection
+        yield
+    finally:
+        await app.state.pool.close()
+
+app = FastAPI(title="Products API", description="API for products and stores", lifespan=lifespan)
+
+async def fetch(query, params=None, one=False):
+    """Run a query on a pooled connection without blocking the event loop"""
+    try:
+        async with app.state.pool.connection() as conn:
+            cursor = await conn.execute(query, params)
+            return await (cursor.fetchone() if one else cursor.fetchall())
+    except PoolTimeout:
+        raise HTTPException(status_code=503, detail="No database connection available, try again")
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Database connection failed: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Database query failed: {str(e)}")
+
+# Every query the API sends; salim/check_query_plans.py EXPLAINs them against a
+# synthetic dataset. The store list is precomputed per row by the ingest consumer.
+
+# Index scan on price_items_created_at_idx
+PRODUCTS_QUERY = """
+SELECT p.*
+FROM price_items p
+ORDER BY p.created_at DESC, p.id DESC
+LIMIT %s
+"""
+
+# Latest row for the code, via price_items_item_code_idx
+PRODUCT_BY_BARCODE_QUERY = """
+SELECT p.*
+FROM price_items p
+WHERE p.item_code = %s
+ORDER BY p.created_at DESC, p.id DESC
+LIMIT 1
+"""
+
+SUPERS_QUERY = "SELECT * FROM stores ORDER BY store_name"
+
+def to_product(row):
+    """API shape: the row's columns plus its stores under availableInSupers"""
+    product = dict(row)
+    # Set by the ingest consumer; [] until it has run its schema migration
+    available_in_supers = product.pop('available_in_supers', None) or []
+    return {"product": {**product, "availableInSupers": available_in_supers}}
 
 @app.get("/products")
 async def get_products(limit: int = Query(100, ge=1, le=1000)):
     """Get all available products with their available stores"""
-    conn = get_db_connection()
-    try:
-        cursor = conn.cursor()
-        query = """
-        SELECT 
-            p.*,
-            COALESCE(
-                json_agg(
-                    json_build_object(
-                        'store_id', s.store_id,
-                        'store_name', s.store_name,
-                        'store_type', s.store_type,
-                        'city', s.city
-                    )
-                    ORDER BY s.store_name
-                ) FILTER (WHERE s.id IS NOT NULL), 
-                '[]'::json
-            ) as available_in_supers
-        FROM price_items p
-        LEFT JOIN product_store_availability psa ON p.id = psa.price_item_id
-        LEFT JOIN stores s ON psa.store_id = s.id
-        GROUP BY p.id
-        ORDER BY p.created_at DESC
-        LIMIT %s
-        """
-        cursor.execute(query, (limit,))
-        results = cursor.fetchall()
-        
-        products = []
-        for row in results:
-            product = dict(row)
-            products.append({
-                "product": {
-                    **{k: v for k, v in product.items() if k != 'available_in_supers'},
-                    "availableInSupers": product['available_in_supers']
-                }
-            })
-        
-        return products
-    finally:
-        conn.close()
+    results = await fetch(PRODUCTS_QUERY, (limit,))
+    return [to_product(row) for row in results]
 
 @app.get("/supers")
 async def get_supers():
     """Get all available stores"""
-    conn = get_db_connection()
-    try:
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM stores ORDER BY store_name")
-        stores = cursor.fetchall()
-        return [dict(store) for store in stores]
-    finally:
-        conn.close()
+    return await fetch(SUPERS_QUERY)
 
 @app.get("/products/{barcode}")
 async def get_product_by_barcode(barcode: str):
     """Get one product by barcode with available stores"""
-    conn = get_db_connection()
-    try:
-        cursor = conn.cursor()
-        query = """
-        SELECT 
-            p.*,
-            COALESCE(
-                json_agg(
-                    json_build_object(
-                        'store_id', s.store_id,
-                        'store_name', s.store_name,
-                        'store_type', s.store_type,
-                        'city', s.city
-                    )
-                    ORDER BY s.store_name
-                ) FILTER (WHERE s.id IS NOT NULL), 
-                '[]'::json
-            ) as available_in_supers
-        FROM price_items p
-        LEFT JOIN product_store_availability psa ON p.id = psa.price_item_id
-        LEFT JOIN stores s ON psa.store_id = s.id
-        WHERE p.item_code = %s
-        GROUP BY p.id
-        """
-        cursor.execute(query, (barcode,))
-        result = cursor.fetchone()
-        
-        if not result:
-            raise HTTPException(status_code=404, detail="Product not found")
-        
-        product = dict(result)
-        return {
-            "product": {
-                **{k: v for k, v in product.items() if k != 'available_in_supers'},
-                "availableInSupers": product['available_in_supers']
-            }
-        }
-    finally:
-        conn.close()
+    product = await fetch(PRODUCT_BY_BARCODE_QUERY, (barcode,), one=True)
+
+    if not product:
+        raise HTTPException(status_code=404, detail="Product not found")
+
+    return to_product(product)
 
 @app.get("/")
 async def root():
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""Measure the Products API's latency and requests/sec at 50 and 200 concurrent clients.
+
+Runs against a running server (the compose stack's fastapi-server by default):
+    pip install httpx
+    python load_test.py --url http://localhost:8000 --concurrency 50 200 --duration 20
+
+Each client sends requests back to back for --duration seconds, cycling through
+/products?limit=20, /supers and /products/{barcode} for barcodes taken from the
+database. --label and --output save the results, so a run before a change can be
+compared with one after it:
+    python load_test.py --label before --output before.json
+    python load_test.py --label after --output after.json --compare before.json
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+import httpx
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+async def get_barcodes(client, count=50):
+    response = await client.get('/products', params={'limit': count})
+    response.raise_for_status()
+    return [row['product']['item_code'] for row in response.json()] or ['0']
+
+
+async def client_loop(client, paths, offset, deadline, latencies, errors):
+    i = offset
+    while time.perf_counter() < deadline:
+        path = paths[i % len(paths)]
+        i += 1
+        started = time.perf_counter()
+        try:
+            response = await client.get(path)
+            if response.status_code >= 500:
+                errors.append(response.status_code)
+                continue
+        except httpx.HTTPError as e:
+            errors.append(type(e).__name__)
+            continue
+        latencies.append(time.perf_counter() - started)
+
+
+async def run_level(url, paths, concurrency, duration):
+    """`concurrency` clients for `duration` seconds; returns the level's stats"""
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    latencies, errors = [], []
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=30) as client:
+        started = time.perf_counter()
+        deadline = started + duration
+        await asyncio.gather(*[
+            client_loop(client, paths, i, deadline, latencies, errors)
+            for i in range(concurrency)
+        ])
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'concurrency': concurrency,
+        'requests': len(latencies),
+        'errors': len(errors),
+        'rps': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 1),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 1),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 1),
+    }
+
+
+def print_results(label, results, baseline=None):
+    print(f"\n{label}")
+    print(f"{'clients':>8} {'requests':>9} {'errors':>7} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    baseline = {row['concurrency']: row for row in (baseline or [])}
+    for row in results:
+        line = (f"{row['concurrency']:>8} {row['requests']:>9} {row['errors']:>7} {row['rps']:>8} "
+                f"{row['p50_ms']:>8} {row['p95_ms']:>8} {row['p99_ms']:>8}")
+        before = baseline.get(row['concurrency'])
+        if before and before['rps']:
+            line += f"   req/s x{row['rps'] / before['rps']:.1f}, p95 {before['p95_ms']} → {row['p95_ms']} ms"
+        print(line)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description='Load test the Products API')
+    parser.add_argument('--url', default='http://localhost:8000')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[50, 200])
+    parser.add_argument('--duration', type=float, default=20, help='seconds per concurrency level')
+    parser.add_argument('--label', default='run')
+    parser.add_argument('--output', help='save the results as JSON')
+    parser.add_argument('--compare', help='results JSON of an earlier run to compare with')
+    args = parser.parse_args()
+
+    async with httpx.AsyncClient(base_url=args.url, timeout=30) as client:
+        barcodes = await get_barcodes(client)
+    paths = ['/products?limit=20', '/supers'] + [f'/products/{barcode}' for barcode in barcodes]
+
+    results = []
+    for concurrency in args.concurrency:
+        print(f"Running {concurrency} clients for {args.duration:.0f}s...")
+        results.append(await run_level(args.url, paths, concurrency, args.duration))
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)['results']
+    print_results(args.label, results, baseline)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'label': args.label, 'url': args.url, 'duration': args.duration, 'results': results}, f, indent=2)
+        print(f"Saved {args.output}")
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,28 @@
+#!/bin/bash
+
+echo "Initializing S3 bucket and ObjectCreated notifications..."
+
+BUCKET=price-data
+EVENTS_QUEUE=price-data-events
+
+# Create bucket and the queue that receives its notifications
+awslocal s3 mb s3://$BUCKET
+awslocal sqs create-queue --queue-name $EVENTS_QUEUE
+echo "Created bucket: $BUCKET and queue: $EVENTS_QUEUE"
+
+QUEUE_ARN=$(awslocal sqs get-queue-attributes \
+  --queue-url "$(awslocal sqs get-queue-url --queue-name $EVENTS_QUEUE --output text)" \
+  --attribute-names QueueArn --query 'Attributes.QueueArn' --output text)
+
+# Send every new object under prices/ to the events queue
+awslocal s3api put-bucket-notification-configuration \
+  --bucket $BUCKET \
+  --notification-configuration "{
+    \"QueueConfigurations\": [{
+      \"QueueArn\": \"$QUEUE_ARN\",
+      \"Events\": [\"s3:ObjectCreated:*\"],
+      \"Filter\": {\"Key\": {\"FilterRules\": [{\"Name\": \"prefix\", \"Value\": \"prices/\"}]}}
+    }]
+  }"
+
+echo "S3 notifications for s3://$BUCKET/prices/ -> $QUEUE_ARN"
@@ -1,10 +1,46 @@
+import functools
 import pika
 import psycopg2
 import json
 import time
+import math
 import os
+import random
+import sys
 from datetime import datetime
 
+# The crawler's chain registry loader (simple-crawler/utils/registry.py). The image
+# copies it next to app.py; outside Docker it is found in the repo.
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'simple-crawler', 'utils'))
+from registry import chain_names, load_registry
+
+RETRY_COUNT_HEADER = 'x-retry-count'
+# Headers exchanges ignore x- prefixed keys when matching, so the routing header can't have one
+RETRY_LEVEL_HEADER = 'retry-level'
+
+# Retrying can't fix these: bad JSON, missing or malformed fields, constraint violations
+PERMANENT_ERRORS = (ValueError, KeyError, TypeError, psycopg2.DataError, psycopg2.IntegrityError)
+
+# The stores a price item is available in, as served by fastapi-server's /products.
+# Kept in price_items.available_in_supers so the API reads it without joining.
+AVAILABLE_IN_SUPERS_SQL = """
+COALESCE(
+    (SELECT jsonb_agg(
+                jsonb_build_object(
+                    'store_id', s.store_id,
+                    'store_name', s.store_name,
+                    'store_type', s.store_type,
+                    'city', s.city
+                )
+                ORDER BY s.store_name
+            )
+     FROM product_store_availability psa
+     JOIN stores s ON psa.store_id = s.id
+     WHERE psa.price_item_id = price_items.id),
+    '[]'::jsonb
+)
+"""
+
 def create_postgres_connection():
     """Create PostgreSQL connection"""
     max_retries = 30
@@ -36,7 +72,7 @@ def create_rabbitmq_connection():
         try:
             connection = pika.BlockingConnection(
                 pika.ConnectionParameters(
-                    host='rabbitmq',
+                    host=os.getenv('RABBITMQ_HOST', 'rabbitmq'),
                     port=5672,
                     virtual_host='/',
                     credentials=pika.PlainCredentials('guest', 'guest')
@@ -54,6 +90,9 @@ def setup_database_table(pg_conn):
     """Create the price_items, stores, and product_store_availability tables if they don't exist"""
     cursor = pg_conn.cursor()
     
+    # Several consumer processes start at once; serialize the DDL between them
+    cursor.execute("SELECT pg_advisory_xact_lock(hashtext('price_items_schema'))")
+    
     # Create stores table
     create_stores_table = """
     CREATE TABLE IF NOT EXISTS stores (
@@ -87,10 +126,16 @@ def setup_database_table(pg_conn):
         is_weighted INTEGER,
         item_id VARCHAR(50),
         raw_data JSONB,
+        raw_hash VARCHAR(64),
         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
     );
     """
     
+    # Tables created before change-only ingestion lack the content hash column
+    add_raw_hash_column = """
+    ALTER TABLE price_items ADD COLUMN IF NOT EXISTS raw_hash VARCHAR(64);
+    """
+    
     # Create product_store_availability table
     create_availability_table = """
     CREATE TABLE IF NOT EXISTS product_store_availability (
@@ -102,13 +147,48 @@ def setup_database_table(pg_conn):
     );
     """
     
+    # Denormalized store list: added nullable so rows from before it existed can be
+    # told apart and backfilled once; new rows start as [] and are kept current by
+    # update_available_in_supers()
+    add_available_in_supers_column = """
+    ALTER TABLE price_items ADD COLUMN IF NOT EXISTS available_in_supers JSONB;
+    """
+    backfill_available_in_supers = f"""
+    UPDATE price_items SET available_in_supers = {AVAILABLE_IN_SUPERS_SQL}
+    WHERE available_in_supers IS NULL;
+    """
+    default_available_in_supers = """
+    ALTER TABLE price_items ALTER COLUMN available_in_supers SET DEFAULT '[]'::jsonb;
+    """
+    
+    # /products pages by newest first, /products/{barcode} looks up the latest row of a code
+    create_indexes = """
+    CREATE INDEX IF NOT EXISTS price_items_created_at_idx ON price_items (created_at DESC, id DESC);
+    CREATE INDEX IF NOT EXISTS price_items_item_code_idx ON price_items (item_code, created_at DESC, id DESC);
+    CREATE INDEX IF NOT EXISTS product_store_availability_store_idx ON product_store_availability (store_id);
+    """
+    
     cursor.execute(create_stores_table)
     cursor.execute(create_price_items_table)
+    cursor.execute(add_raw_hash_column)
     cursor.execute(create_availability_table)
+    cursor.execute(add_available_in_supers_column)
+    cursor.execute(backfill_available_in_supers)
+    if cursor.rowcount:
+        print(f"Backfilled available_in_supers for {cursor.rowcount} price items")
+    cursor.execute(default_available_in_supers)
+    cursor.execute(create_indexes)
     pg_conn.commit()
     cursor.close()
     print("Database tables 'price_items', 'stores', and 'product_store_availability' ready")
 
+@functools.lru_cache(maxsize=1)
+def get_chain_names():
+    """chain_id → name from the crawler's chain registry (CHAIN_REGISTRY_PATH, default simple-crawler/chains.json)"""
+    registry = load_registry(os.getenv('CHAIN_REGISTRY_PATH'))
+    print(f"Loaded {len(registry['chains'])} chains from the chain registry")
+    return chain_names(registry)
+
 def get_or_create_store(pg_conn, store_id, chain_id):
     """Get existing store or create a new one, returns store database ID"""
     cursor = pg_conn.cursor()
@@ -121,16 +201,7 @@ def get_or_create_store(pg_conn, store_id, chain_id):
         if result:
             return result[0]
         
-        # Basic chain mapping (can be expanded)
-        chain_names = {
-            "7290055700007": "Super Pharm",
-            "7290058140886": "Rami Levy",
-            "7290103152017": "Yochananof",
-            "7290873255550": "Mega",
-            "7290058108879": "Osher Ad"
-        }
-        
-        chain_name = chain_names.get(chain_id, f"Chain {chain_id}")
+        chain_name = get_chain_names().get(chain_id, f"Chain {chain_id}")
         store_name = f"{chain_name} Store {store_id}"
         store_type = "supermarket"
         city = "Unknown"  # Could be enhanced with store location data
@@ -155,6 +226,13 @@ def get_or_create_store(pg_conn, store_id, chain_id):
     finally:
         cursor.close()
 
+def update_available_in_supers(cursor, price_item_id):
+    """Recompute one price item's denormalized store list (in the caller's transaction)"""
+    cursor.execute(
+        f"UPDATE price_items SET available_in_supers = {AVAILABLE_IN_SUPERS_SQL} WHERE id = %s",
+        (price_item_id,)
+    )
+
 def create_product_store_availability(pg_conn, price_item_id, store_db_id):
     """Create product-store availability relationship"""
     cursor = pg_conn.cursor()
@@ -167,6 +245,9 @@ def create_product_store_availability(pg_conn, price_item_id, store_db_id):
         """
         
         cursor.execute(insert_query, (price_item_id, store_db_id))
+        # Same transaction: the API never sees the link without the store in the list
+        if cursor.rowcount:
+            update_available_in_supers(cursor, price_item_id)
         pg_conn.commit()
         
     except Exception as e:
@@ -202,8 +283,8 @@ def insert_price_item(pg_conn, message_data):
         INSERT INTO price_items (
             source_file, processed_at, item_code, item_name, manufacturer_name,
             item_price, unit_of_measure_price, quantity, unit_qty, unit_of_measure,
-            price_update_date, item_status, allow_discount, is_weighted, item_id, raw_data
-        ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            price_update_date, item_status, allow_discount, is_weighted, item_id, raw_data, raw_hash
+        ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
         RETURNING id
         """
         
@@ -223,7 +304,8 @@ def insert_price_item(pg_conn, message_data):
             int(item_data.get('AllowDiscount', 0)) if item_data.get('AllowDiscount') else None,
             int(item_data.get('bIsWeighted', 0)) if item_data.get('bIsWeighted') else None,
             item_data.get('ItemId'),
-            json.dumps(item_data)
+            json.dumps(item_data),
+            message_data.get('raw_hash')
         )
         
         cursor.execute(insert_query, values)
@@ -246,64 +328,214 @@ def insert_price_item(pg_conn, message_data):
         
     except Exception as e:
         print(f"Error inserting price item: {e}")
-        pg_conn.rollback()
-        return False
+        if not pg_conn.closed:
+            pg_conn.rollback()
+        raise
     finally:
         cursor.close()
 
-def process_message(ch, method, properties, body, pg_conn):
+def route_failed_message(ch, method, properties, body, error, retry_policy):
+    """Republish a failed message to its next delayed-retry queue, or to the DLQ, then ack it.
+    
+    Permanent errors go straight to the DLQ; transient ones are retried with
+    exponential backoff until retry_policy['delays'] is exhausted.
+    """
+    headers = dict(properties.headers or {})
+    retry_count = int(headers.get(RETRY_COUNT_HEADER, 0))
+    delays = retry_policy['delays']
+    permanent = isinstance(error, PERMANENT_ERRORS)
+    headers['x-last-error'] = f"{type(error).__name__}: {error}"[:500]
+    
+    if permanent or retry_count >= len(delays):
+        headers['x-original-exchange'] = method.exchange
+        headers['x-original-routing-key'] = method.routing_key
+        headers['x-dead-lettered-at'] = datetime.now().isoformat()
+        exchange, routing_key = '', retry_policy['dlq']
+        reason = "permanent error" if permanent else f"gave up after {retry_count} retries"
+        print(f"Dead-lettering message ({reason}): {error}")
+    else:
+        # The retry queue dead-letters back to the main exchange with this same routing key
+        headers[RETRY_COUNT_HEADER] = retry_count + 1
+        headers[RETRY_LEVEL_HEADER] = str(retry_count)
+        exchange, routing_key = retry_policy['exchange'], method.routing_key
+        print(f"Retrying message in {delays[retry_count]}s (retry {retry_count + 1}/{len(delays)}): {error}")
+    
+    ch.basic_publish(
+        exchange=exchange,
+        routing_key=routing_key,
+        body=body,
+        properties=pika.BasicProperties(
+            delivery_mode=2,
+            content_type=properties.content_type,
+            headers=headers
+        )
+    )
+    ch.basic_ack(delivery_tag=method.delivery_tag)
+
+def process_message(ch, method, properties, body, pg_conn, retry_policy):
     """Process a message from RabbitMQ"""
     try:
         message_data = json.loads(body)
         
-        success = insert_price_item(pg_conn, message_data)
+        insert_price_item(pg_conn, message_data)
         
-        if success:
-            ch.basic_ack(delivery_tag=method.delivery_tag)
-            print(f"Processed message from {message_data.get('source_file', 'unknown')}")
-        else:
-            ch.basic_nack(delivery_tag=method.delivery_tag, requeue=True)
-            print("Failed to process message, requeuing...")
+        ch.basic_ack(delivery_tag=method.delivery_tag)
+        print(f"Processed message from {message_data.get('source_file', 'unknown')}")
             
     except Exception as e:
-        print(f"Error processing message: {e}")
-        ch.basic_nack(delivery_tag=method.delivery_tag, requeue=True)
+        if pg_conn.closed:
+            # Not the message's fault: exit without acking so it is redelivered,
+            # and let the launcher restart us with a fresh connection
+            print(f"Lost PostgreSQL connection: {e}")
+            raise
+        route_failed_message(ch, method, properties, body, e, retry_policy)
+
+def partition_queue_name(queue_prefix, partition):
+    """Name of the queue holding one store partition"""
+    return f"{queue_prefix}.{partition}"
+
+def setup_partitioned_topology(channel, exchange_name, queue_prefix, partition_count):
+    """Declare the direct exchange and one durable queue per store partition"""
+    channel.exchange_declare(exchange=exchange_name, exchange_type='direct', durable=True)
+    for partition in range(partition_count):
+        queue_name = partition_queue_name(queue_prefix, partition)
+        channel.queue_declare(queue=queue_name, durable=True)
+        channel.queue_bind(queue=queue_name, exchange=exchange_name, routing_key=str(partition))
+    print(f"Exchange '{exchange_name}' routes to {partition_count} partition queues '{queue_prefix}.N'")
+
+def retry_queue_name(queue_prefix, level):
+    """Name of the delayed-retry queue for one backoff level"""
+    return f"{queue_prefix}.retry.{level}"
+
+def setup_retry_topology(channel, exchange_name, queue_prefix, retry_delays):
+    """Declare the delayed-retry queues and the final dead-letter queue.
+    
+    Retries are published to a headers exchange and routed by their retry-level
+    header. Each level's queue holds messages for its TTL, then dead-letters them back
+    to the main exchange with their original routing key, i.e. their own partition.
+    """
+    retry_exchange = f"{exchange_name}.retry"
+    channel.exchange_declare(exchange=retry_exchange, exchange_type='headers', durable=True)
+    for level, delay in enumerate(retry_delays):
+        queue_name = retry_queue_name(queue_prefix, level)
+        channel.queue_declare(queue=queue_name, durable=True, arguments={
+            'x-message-ttl': int(delay * 1000),
+            'x-dead-letter-exchange': exchange_name
+        })
+        channel.queue_bind(queue=queue_name, exchange=retry_exchange,
+                           arguments={'x-match': 'all', RETRY_LEVEL_HEADER: str(level)})
+    
+    dlq_name = f"{queue_prefix}.dlq"
+    channel.queue_declare(queue=dlq_name, durable=True)
+    print(f"Retry delays {retry_delays}s via '{retry_exchange}', dead letters in '{dlq_name}'")
+    return {'exchange': retry_exchange, 'dlq': dlq_name, 'delays': retry_delays}
+
+def register_worker(connection, queue_prefix):
+    """Join the presence queue; its consumer count is the number of live workers"""
+    presence_queue = f"{queue_prefix}.workers"
+    channel = connection.channel()
+    channel.queue_declare(queue=presence_queue, durable=False)
+    channel.basic_consume(queue=presence_queue, on_message_callback=lambda *args: None, auto_ack=True)
+    return channel, presence_queue
+
+def count_live_workers(channel, presence_queue):
+    return max(1, channel.queue_declare(queue=presence_queue, passive=True).method.consumer_count)
+
+def claim_partitions(connection, queue_prefix, partition_count, wanted, claimed, callback, prefetch_count):
+    """Become the exclusive consumer of free partition queues until `wanted` are owned.
+
+    Only one consumer may hold a partition, which keeps every store's messages in
+    order. A partition owned by another worker is skipped; it is picked up by a
+    later attempt once that worker releases it or goes away.
+    """
+    # Start at a random partition so workers starting together don't all race for 0
+    offset = random.randrange(partition_count)
+    for i in range(partition_count):
+        if len(claimed) >= wanted:
+            break
+        partition = (offset + i) % partition_count
+        if partition in claimed:
+            continue
+        
+        channel = connection.channel()
+        channel.basic_qos(prefetch_count=prefetch_count)
+        # Retries/dead letters must be confirmed before the original is acked
+        channel.confirm_delivery()
+        try:
+            channel.basic_consume(
+                queue=partition_queue_name(queue_prefix, partition),
+                on_message_callback=callback,
+                exclusive=True
+            )
+        except pika.exceptions.ChannelClosedByBroker:
+            # ACCESS_REFUSED: another worker already owns this partition
+            continue
+        
+        claimed[partition] = channel
+        print(f"Claimed partition {partition}")
+
+def release_partitions(claimed, wanted):
+    """Give up partitions above our fair share so a newly started worker can claim them"""
+    while len(claimed) > wanted:
+        partition, channel = claimed.popitem()
+        # Closing the channel returns its unacked (prefetched) messages to the queue
+        channel.close()
+        print(f"Released partition {partition}")
 
 def main():
-    queue_name = os.getenv('RABBITMQ_QUEUE', 'price-items')
+    queue_prefix = os.getenv('RABBITMQ_QUEUE', 'price-items')
+    exchange_name = os.getenv('RABBITMQ_EXCHANGE', 'price-items')
+    partition_count = int(os.getenv('PARTITION_COUNT', '8'))
+    prefetch_count = int(os.getenv('PREFETCH_COUNT', '50'))
+    rebalance_interval = int(os.getenv('REBALANCE_INTERVAL', '10'))
+    startup_delay = int(os.getenv('STARTUP_DELAY', '20'))
+    max_retries = int(os.getenv('MAX_RETRIES', '5'))
+    retry_base_delay = float(os.getenv('RETRY_BASE_DELAY', '5'))
+    retry_delays = [retry_base_delay * 2 ** level for level in range(max_retries)]
     
     print("Starting RabbitMQ to PostgreSQL consumer...")
-    print(f"Queue: {queue_name}")
+    print(f"Exchange: {exchange_name} ({partition_count} partition queues '{queue_prefix}.N')")
     
     # Wait for services to be ready
-    time.sleep(20)
+    time.sleep(startup_delay)
     
+    # A missing or broken chain registry stops the consumer here, not on the first message
+    get_chain_names()
     pg_conn = create_postgres_connection()
     setup_database_table(pg_conn)
     
     rabbitmq_conn = create_rabbitmq_connection()
-    channel = rabbitmq_conn.channel()
-    
-    # Declare queue to ensure it exists
-    channel.queue_declare(queue=queue_name, durable=True)
-    
-    # Set up fair dispatch
-    channel.basic_qos(prefetch_count=1)
+    setup_channel = rabbitmq_conn.channel()
+    setup_partitioned_topology(setup_channel, exchange_name, queue_prefix, partition_count)
+    retry_policy = setup_retry_topology(setup_channel, exchange_name, queue_prefix, retry_delays)
+    presence_channel, presence_queue = register_worker(rabbitmq_conn, queue_prefix)
     
     # Set up callback function
     callback = lambda ch, method, properties, body: process_message(
-        ch, method, properties, body, pg_conn
+        ch, method, properties, body, pg_conn, retry_policy
     )
     
-    channel.basic_consume(queue=queue_name, on_message_callback=callback)
+    claimed = {}
+    last_rebalance = 0
     
     print("Waiting for messages. To exit press CTRL+C")
     
     try:
-        channel.start_consuming()
+        while True:
+            # Each worker owns its fair share of partitions; shares shift as workers come and go
+            if time.time() - last_rebalance >= rebalance_interval:
+                workers = count_live_workers(presence_channel, presence_queue)
+                wanted = math.ceil(partition_count / workers)
+                release_partitions(claimed, wanted)
+                claim_partitions(rabbitmq_conn, queue_prefix, partition_count, wanted,
+                                 claimed, callback, prefetch_count)
+                last_rebalance = time.time()
+                if not claimed:
+                    print("All partitions are owned by other workers, standing by...")
+            
+            rabbitmq_conn.process_data_events(time_limit=1)
     except KeyboardInterrupt:
         print("Stopping consumer...")
-        channel.stop_consuming()
         rabbitmq_conn.close()
         pg_conn.close()
 
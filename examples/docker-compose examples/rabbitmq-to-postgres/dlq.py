@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""Inspect and replay the consumer's dead-letter queue.
+
+    python dlq.py inspect --limit 20     # print messages, leave them in the DLQ
+    python dlq.py replay --limit 100     # publish back to their partitions with a fresh retry budget
+
+Inside the compose stack:
+    docker-compose exec rabbitmq-to-postgres python dlq.py inspect
+"""
+
+import argparse
+import json
+import os
+
+import pika
+
+from app import RETRY_COUNT_HEADER, RETRY_LEVEL_HEADER, create_rabbitmq_connection
+
+
+def describe(body, headers):
+    try:
+        message = json.loads(body)
+        item = message.get('item_data') or {}
+        summary = f"{message.get('source_file')} store={message.get('store_id')} item={item.get('ItemCode')}"
+    except ValueError:
+        summary = f"<unparseable body> {body[:80]!r}"
+    return (f"{summary}\n"
+            f"    retries={headers.get(RETRY_COUNT_HEADER, 0)} "
+            f"dead-lettered={headers.get('x-dead-lettered-at')}\n"
+            f"    error={headers.get('x-last-error')}")
+
+
+def inspect(channel, dlq_name, limit):
+    """Print up to `limit` messages; they are requeued when the channel closes"""
+    count = channel.queue_declare(queue=dlq_name, passive=True).method.message_count
+    print(f"{dlq_name}: {count} message(s)")
+    for i in range(min(limit, count)):
+        method, properties, body = channel.basic_get(queue=dlq_name, auto_ack=False)
+        if method is None:
+            break
+        print(f"[{i + 1}] {describe(body, properties.headers or {})}")
+
+
+def replay(channel, dlq_name, limit):
+    """Publish up to `limit` messages back to their original exchange and routing key"""
+    channel.confirm_delivery()
+    replayed = 0
+    while replayed < limit:
+        method, properties, body = channel.basic_get(queue=dlq_name, auto_ack=False)
+        if method is None:
+            break
+        headers = dict(properties.headers or {})
+        exchange = headers.pop('x-original-exchange', '')
+        routing_key = headers.pop('x-original-routing-key', None)
+        if routing_key is None:
+            print(f"Skipping message without an original routing key: {describe(body, headers)}")
+            channel.basic_nack(delivery_tag=method.delivery_tag, requeue=True)
+            break
+        for header in (RETRY_COUNT_HEADER, RETRY_LEVEL_HEADER, 'x-dead-lettered-at', 'x-death'):
+            headers.pop(header, None)
+
+        channel.basic_publish(
+            exchange=exchange,
+            routing_key=routing_key,
+            body=body,
+            properties=pika.BasicProperties(
+                delivery_mode=2,
+                content_type=properties.content_type,
+                headers=headers
+            )
+        )
+        channel.basic_ack(delivery_tag=method.delivery_tag)
+        replayed += 1
+    print(f"Replayed {replayed} message(s) from {dlq_name}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('command', choices=['inspect', 'replay'])
+    parser.add_argument('--limit', type=int, default=20)
+    parser.add_argument('--queue', default=os.getenv('RABBITMQ_QUEUE', 'price-items'))
+    args = parser.parse_args()
+
+    dlq_name = f"{args.queue}.dlq"
+    connection = create_rabbitmq_connection()
+    channel = connection.channel()
+    try:
+        if args.command == 'inspect':
+            inspect(channel, dlq_name, args.limit)
+        else:
+            replay(channel, dlq_name, args.limit)
+    finally:
+        connection.close()
+
+
+if __name__ == '__main__':
+    main()
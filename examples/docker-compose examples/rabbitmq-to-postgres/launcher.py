@@ -0,0 +1,44 @@
+import multiprocessing
+import os
+import signal
+import sys
+import time
+
+from app import main as run_consumer
+
+
+def start_worker(index):
+    process = multiprocessing.Process(target=run_consumer, name=f"consumer-{index}")
+    process.start()
+    print(f"Started consumer-{index} (pid {process.pid})")
+    return process
+
+
+def main():
+    """Run WORKERS consumer processes and restart any that exit"""
+    workers = int(os.getenv('WORKERS', '1'))
+    
+    print(f"Launching {workers} consumer process(es)...")
+    processes = [start_worker(i) for i in range(workers)]
+    
+    def shutdown(signum, frame):
+        print("Stopping consumers...")
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.join(timeout=10)
+        sys.exit(0)
+    
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+    
+    while True:
+        time.sleep(5)
+        for i, process in enumerate(processes):
+            if not process.is_alive():
+                print(f"consumer-{i} exited with code {process.exitcode}, restarting...")
+                processes[i] = start_worker(i)
+
+
+if __name__ == "__main__":
+    main()
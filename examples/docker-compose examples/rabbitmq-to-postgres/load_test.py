@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""Measure consumer throughput (items/sec) for 1/2/4/8 worker processes.
+
+Runs the consumers locally against the compose stack's RabbitMQ and PostgreSQL:
+    POSTGRES_HOST=localhost RABBITMQ_HOST=localhost python load_test.py --items 20000
+
+Each run publishes synthetic items for --stores stores to the partitioned exchange,
+waits until all of them are in price_items and then deletes the inserted rows.
+With --bad-ratio a share of the items carries an unparseable price; those must end
+up in the dead-letter queue without slowing the good ones down.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from datetime import datetime
+
+import pika
+
+from app import create_postgres_connection, partition_queue_name, setup_database_table, \
+    setup_partitioned_topology
+from app import main as run_consumer
+
+# The producer's routing, so the test partitions stores exactly like s3-to-rabbitmq
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 's3-to-rabbitmq'))
+from routing import partition_for_store
+
+LOAD_TEST_SOURCE = 'load-test/synthetic.json'
+
+
+def is_bad_item(i, bad_ratio):
+    return bad_ratio > 0 and i % round(1 / bad_ratio) == 0
+
+
+def publish_items(channel, exchange_name, partition_count, item_count, store_count, bad_ratio=0):
+    properties = pika.BasicProperties(delivery_mode=2)
+    chain_id = '7290055700007'
+    for i in range(item_count):
+        store_id = f"{i % store_count:04d}"
+        message = {
+            'source_file': LOAD_TEST_SOURCE,
+            'timestamp': datetime.now().isoformat(),
+            'chain_id': chain_id,
+            'store_id': store_id,
+            'item_data': {
+                'ItemCode': f'{7290000000000 + i}',
+                'ItemName': 'מוצר לבדיקת עומס',
+                'ManufacturerName': 'בדיקה',
+                'ItemPrice': 'N/A' if is_bad_item(i, bad_ratio) else f'{(i % 5000) / 100 + 1:.2f}',
+                'Quantity': '1.00',
+                'UnitOfMeasure': 'יחידה',
+                'PriceUpdateDate': '2025-08-06 05:10:00',
+            },
+        }
+        channel.basic_publish(
+            exchange=exchange_name,
+            routing_key=str(partition_for_store(chain_id, store_id, partition_count)),
+            body=json.dumps(message),
+            properties=properties
+        )
+
+
+def count_rows(pg_conn):
+    cursor = pg_conn.cursor()
+    cursor.execute("SELECT COUNT(*) FROM price_items WHERE source_file = %s", (LOAD_TEST_SOURCE,))
+    count = cursor.fetchone()[0]
+    cursor.close()
+    return count
+
+
+def wait_for_consumers(channel, queue_prefix, partition_count, timeout=60):
+    """Wait until every partition queue has its exclusive consumer"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        consumers = sum(
+            channel.queue_declare(queue=partition_queue_name(queue_prefix, p), passive=True).method.consumer_count
+            for p in range(partition_count)
+        )
+        if consumers == partition_count:
+            return True
+        time.sleep(0.5)
+    return False
+
+
+def run(workers, args, channel, pg_conn):
+    processes = [multiprocessing.Process(target=run_consumer) for _ in range(workers)]
+    for process in processes:
+        process.start()
+    
+    try:
+        if not wait_for_consumers(channel, args.queue, args.partitions):
+            raise Exception(f"Consumers did not claim all {args.partitions} partitions")
+        # Give the workers a few rebalance rounds to settle on their fair shares
+        time.sleep(3)
+        
+        good_items = sum(1 for i in range(args.items) if not is_bad_item(i, args.bad_ratio))
+        started = time.perf_counter()
+        publish_items(channel, args.exchange, args.partitions, args.items, args.stores, args.bad_ratio)
+        while count_rows(pg_conn) < good_items:
+            time.sleep(0.2)
+        elapsed = time.perf_counter() - started
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.join()
+    
+    cursor = pg_conn.cursor()
+    cursor.execute("DELETE FROM price_items WHERE source_file = %s", (LOAD_TEST_SOURCE,))
+    pg_conn.commit()
+    cursor.close()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--items', type=int, default=20000)
+    parser.add_argument('--stores', type=int, default=64)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--bad-ratio', type=float, default=0, help='share of malformed items, e.g. 0.01')
+    parser.add_argument('--partitions', type=int, default=int(os.getenv('PARTITION_COUNT', '8')))
+    parser.add_argument('--exchange', default=os.getenv('RABBITMQ_EXCHANGE', 'price-items'))
+    parser.add_argument('--queue', default=os.getenv('RABBITMQ_QUEUE', 'price-items'))
+    args = parser.parse_args()
+    
+    # Consumers started by this script connect immediately and claim partitions quickly
+    os.environ['PARTITION_COUNT'] = str(args.partitions)
+    os.environ['STARTUP_DELAY'] = '0'
+    os.environ['REBALANCE_INTERVAL'] = '1'
+    
+    pg_conn = create_postgres_connection()
+    setup_database_table(pg_conn)
+    connection = pika.BlockingConnection(pika.ConnectionParameters(host=os.getenv('RABBITMQ_HOST', 'localhost')))
+    channel = connection.channel()
+    setup_partitioned_topology(channel, args.exchange, args.queue, args.partitions)
+    
+    print(f"{args.items} items across {args.stores} stores, {args.partitions} partitions")
+    print(f"{'workers':>8} {'seconds':>10} {'items/sec':>12}")
+    try:
+        for workers in args.workers:
+            elapsed = run(workers, args, channel, pg_conn)
+            print(f"{workers:>8} {elapsed:>10.2f} {args.items / elapsed:>12.0f}")
+        if args.bad_ratio:
+            dead_letters = channel.queue_declare(queue=f"{args.queue}.dlq", passive=True).method.message_count
+            print(f"{dead_letters} message(s) in {args.queue}.dlq (inspect with dlq.py)")
+    finally:
+        connection.close()
+        pg_conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,34 @@
 import boto3
+import gzip
+import hashlib
+import io
+import itertools
 import json
+import re
+import sys
 import time
 import os
+import urllib.request
+import uuid
 from datetime import datetime
 from botocore.config import Config
+from botocore.exceptions import ClientError
+
+# The crawler's XML → record parser (simple-crawler/utils/records.py). The image
+# copies it next to app.py; outside Docker it is found in the repo.
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'simple-crawler', 'utils'))
+from records import iter_xml_records
+
+# Content-addressed layout: each distinct file is stored (and processed) once under
+# prices/sha256/<hash>; index/ records every sighting without triggering the consumer
+BLOB_PREFIX = 'prices/sha256/'
+INDEX_PREFIX = 'index/'
+STAGING_PREFIX = 'staging/'
+
+# PriceFull7290055700007-0084-202508060510(.gz), optionally with a sub-chain
+FILE_NAME_PATTERN = re.compile(
+    r'^(?P<file_type>[A-Za-z]+)(?P<chain_id>\d+)-(?:\d+-)?(?P<store_id>\d+)-(?P<timestamp>\d{12,14})'
+)
 
 def create_s3_client():
     """Create S3 client for LocalStack"""
@@ -25,32 +50,187 @@ def create_bucket_if_not_exists(s3_client, bucket_name):
         s3_client.create_bucket(Bucket=bucket_name)
         print(f"Created bucket {bucket_name}")
 
+def object_exists(s3_client, bucket_name, key):
+    try:
+        s3_client.head_object(Bucket=bucket_name, Key=key)
+        return True
+    except ClientError as e:
+        if e.response['Error']['Code'] in ('404', 'NoSuchKey', 'NotFound'):
+            return False
+        raise
+
+def file_identity(file_name, header, default_type):
+    """(chain_id, store_id, file_type) from the file name, falling back to the XML/JSON header"""
+    match = FILE_NAME_PATTERN.match(file_name)
+    if match:
+        return match.group('chain_id'), match.group('store_id'), match.group('file_type')
+    chain_id = header.get('ChainId') or header.get('ChainID') or ''
+    store_id = header.get('StoreId') or header.get('StoreID') or ''
+    return chain_id, store_id, default_type
+
+def put_index_entry(s3_client, bucket_name, chain_id, store_id, file_type, sha256, blob_key, source):
+    """Record that (chain, store, file type) had this content at this time"""
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    index_key = f"{INDEX_PREFIX}{chain_id or 'unknown'}/{store_id or 'unknown'}/{file_type}/{timestamp}.json"
+    entry = {
+        'chain_id': chain_id,
+        'store_id': store_id,
+        'file_type': file_type,
+        'timestamp': timestamp,
+        'sha256': sha256,
+        'key': blob_key,
+        'source': source
+    }
+    s3_client.put_object(
+        Bucket=bucket_name,
+        Key=index_key,
+        Body=json.dumps(entry).encode('utf-8'),
+        ContentType='application/json'
+    )
+    return index_key
+
+def read_json_header(file_path, limit=64 * 1024):
+    """ChainId/StoreId from the start of a converted price JSON, without loading all of it"""
+    with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
+        head = f.read(limit)
+    header = {}
+    for field in ('ChainId', 'StoreId'):
+        match = re.search(rf'"{field}"\s*:\s*"([^"]*)"', head)
+        if match:
+            header[field] = match.group(1)
+    return header
+
+def sha256_file(file_path):
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
 def upload_price_file(s3_client, bucket_name, file_path):
-    """Upload a price file to S3"""
+    """Upload a price file to S3 under its content hash, skipping content that is already there"""
     if not os.path.exists(file_path):
         print(f"File {file_path} does not exist")
         return False
     
     try:
         file_name = os.path.basename(file_path)
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        s3_key = f"prices/{timestamp}_{file_name}"
+        header = read_json_header(file_path)
+        chain_id, store_id, file_type = file_identity(file_name, header, 'PriceFull')
+        sha256 = sha256_file(file_path)
+        s3_key = f"{BLOB_PREFIX}{sha256}{os.path.splitext(file_name)[1]}"
         
-        s3_client.upload_file(file_path, bucket_name, s3_key)
-        print(f"Uploaded {file_path} to s3://{bucket_name}/{s3_key}")
+        if object_exists(s3_client, bucket_name, s3_key):
+            print(f"Unchanged: {file_path} is already stored as s3://{bucket_name}/{s3_key}")
+        else:
+            s3_client.upload_file(
+                file_path, bucket_name, s3_key,
+                ExtraArgs={'Metadata': {'chain-id': chain_id, 'store-id': store_id, 'file-type': file_type}}
+            )
+            print(f"Uploaded {file_path} to s3://{bucket_name}/{s3_key}")
+        put_index_entry(s3_client, bucket_name, chain_id, store_id, file_type, sha256, s3_key, file_path)
         return True
     except Exception as e:
         print(f"Error uploading file: {e}")
         return False
 
+class NdjsonStream(io.RawIOBase):
+    """Read-only file object producing one JSON line per record, for upload_fileobj"""
+    
+    def __init__(self, records):
+        self.records = records
+        self.pending = b''
+        self.count = 0
+        self.digest = hashlib.sha256()
+    
+    def readable(self):
+        return True
+    
+    def readinto(self, buffer):
+        while len(self.pending) < len(buffer):
+            record = next(self.records, None)
+            if record is None:
+                break
+            line = (json.dumps(record, ensure_ascii=False) + '\n').encode('utf-8')
+            self.pending += line
+            self.digest.update(line)
+            self.count += 1
+        size = min(len(buffer), len(self.pending))
+        buffer[:size] = self.pending[:size]
+        self.pending = self.pending[size:]
+        return size
+
+def upload_price_records(s3_client, bucket_name, source_url, record_tag):
+    """Stream a (gzipped) price XML from a URL into S3 as NDJSON, with no local files.
+    
+    download → gunzip → iterparse → NDJSON → multipart upload all happen on the
+    fly; ChainId/StoreId travel as object metadata. The upload goes to a staging
+    key while its sha256 is computed, then moves to prices/sha256/<hash>.ndjson
+    unless that content is already stored.
+    """
+    try:
+        response = urllib.request.urlopen(source_url, timeout=60)
+        stream = gzip.GzipFile(fileobj=response) if source_url.endswith('.gz') else response
+        
+        header = {}
+        records = iter_xml_records(stream, record_tag, header)
+        # ChainId/StoreId precede the items, so they are known after the first record
+        first = next(records, None)
+        if first is None:
+            print(f"No <{record_tag}> records in {source_url}")
+            return False
+        
+        file_name = os.path.basename(source_url)
+        if file_name.endswith('.gz'):
+            file_name = file_name[:-3]
+        chain_id, store_id, file_type = file_identity(file_name, header, record_tag)
+        extra_args = {
+            'ContentType': 'application/x-ndjson',
+            'Metadata': {'chain-id': chain_id, 'store-id': store_id, 'file-type': file_type}
+        }
+        staging_key = f"{STAGING_PREFIX}{uuid.uuid4().hex}.ndjson"
+        
+        body = NdjsonStream(itertools.chain([first], records))
+        s3_client.upload_fileobj(
+            io.BufferedReader(body, buffer_size=1024 * 1024),
+            bucket_name,
+            staging_key,
+            ExtraArgs=extra_args
+        )
+        response.close()
+        
+        sha256 = body.digest.hexdigest()
+        s3_key = f"{BLOB_PREFIX}{sha256}.ndjson"
+        try:
+            if object_exists(s3_client, bucket_name, s3_key):
+                print(f"Unchanged: {source_url} is already stored as s3://{bucket_name}/{s3_key}")
+            else:
+                s3_client.copy(
+                    {'Bucket': bucket_name, 'Key': staging_key},
+                    bucket_name,
+                    s3_key,
+                    ExtraArgs=dict(extra_args, MetadataDirective='REPLACE')
+                )
+                print(f"Streamed {body.count} records from {source_url} to s3://{bucket_name}/{s3_key}")
+        finally:
+            s3_client.delete_object(Bucket=bucket_name, Key=staging_key)
+        put_index_entry(s3_client, bucket_name, chain_id, store_id, file_type, sha256, s3_key, source_url)
+        return True
+    except Exception as e:
+        print(f"Error streaming {source_url}: {e}")
+        return False
+
 def main():
     bucket_name = os.getenv('S3_BUCKET', 'price-data')
     source_file = os.getenv('SOURCE_FILE', '/data/prices.json')
     upload_interval = int(os.getenv('UPLOAD_INTERVAL', '30'))
+    # When set, records are streamed from this URL instead of uploading SOURCE_FILE
+    source_url = os.getenv('SOURCE_URL')
+    record_tag = os.getenv('RECORD_TAG', 'Item')
     
     print("Starting S3 Producer...")
     print(f"Bucket: {bucket_name}")
-    print(f"Source file: {source_file}")
+    print(f"Source: {source_url or source_file}")
     print(f"Upload interval: {upload_interval} seconds")
     
     # Wait for LocalStack to be ready
@@ -60,7 +240,10 @@ def main():
     create_bucket_if_not_exists(s3_client, bucket_name)
     
     while True:
-        success = upload_price_file(s3_client, bucket_name, source_file)
+        if source_url:
+            success = upload_price_records(s3_client, bucket_name, source_url, record_tag)
+        else:
+            success = upload_price_file(s3_client, bucket_name, source_file)
         if success:
             print(f"File uploaded successfully at {datetime.now()}")
         else:
@@ -4,8 +4,13 @@ import json
 import time
 import os
 from datetime import datetime
+from urllib.parse import unquote_plus
 from botocore.config import Config
 
+from dedup import ItemHashStore
+from publisher import ConfirmedPublisher
+from routing import partition_for_store
+
 def create_s3_client():
     """Create S3 client for LocalStack"""
     return boto3.client(
@@ -17,6 +22,40 @@ def create_s3_client():
         config=Config(signature_version='s3v4')
     )
 
+def create_sqs_client():
+    """Create SQS client for LocalStack"""
+    return boto3.client(
+        'sqs',
+        endpoint_url='http://localstack:4566',
+        aws_access_key_id='test',
+        aws_secret_access_key='test',
+        region_name='us-east-1'
+    )
+
+def get_events_queue_url(sqs_client, queue_name):
+    """Resolve the S3 notifications queue URL, waiting for LocalStack init to create it"""
+    max_retries = 30
+    retry_count = 0
+    
+    while retry_count < max_retries:
+        try:
+            return sqs_client.get_queue_url(QueueName=queue_name)['QueueUrl']
+        except Exception as e:
+            retry_count += 1
+            print(f"Events queue '{queue_name}' not ready (attempt {retry_count}/{max_retries}): {e}")
+            time.sleep(2)
+    
+    raise Exception(f"Events queue '{queue_name}' not found after maximum retries")
+
+def get_rabbitmq_parameters():
+    """RabbitMQ connection parameters"""
+    return pika.ConnectionParameters(
+        host='rabbitmq',
+        port=5672,
+        virtual_host='/',
+        credentials=pika.PlainCredentials('guest', 'guest')
+    )
+
 def create_rabbitmq_connection():
     """Create RabbitMQ connection"""
     max_retries = 30
@@ -24,14 +63,7 @@ def create_rabbitmq_connection():
     
     while retry_count < max_retries:
         try:
-            connection = pika.BlockingConnection(
-                pika.ConnectionParameters(
-                    host='rabbitmq',
-                    port=5672,
-                    virtual_host='/',
-                    credentials=pika.PlainCredentials('guest', 'guest')
-                )
-            )
+            connection = pika.BlockingConnection(get_rabbitmq_parameters())
             return connection
         except Exception as e:
             retry_count += 1
@@ -40,19 +72,23 @@ def create_rabbitmq_connection():
     
     raise Exception("Failed to connect to RabbitMQ after maximum retries")
 
-def setup_rabbitmq_queue(channel, queue_name):
-    """Setup RabbitMQ queue"""
-    channel.queue_declare(queue=queue_name, durable=True)
-    print(f"Queue '{queue_name}' declared")
+def setup_partitioned_topology(channel, exchange_name, queue_prefix, partition_count):
+    """Declare the direct exchange and one durable queue per store partition"""
+    channel.exchange_declare(exchange=exchange_name, exchange_type='direct', durable=True)
+    for partition in range(partition_count):
+        queue_name = f"{queue_prefix}.{partition}"
+        channel.queue_declare(queue=queue_name, durable=True)
+        channel.queue_bind(queue=queue_name, exchange=exchange_name, routing_key=str(partition))
+    print(f"Exchange '{exchange_name}' routes to {partition_count} partition queues '{queue_prefix}.N'")
 
 def get_latest_s3_files(s3_client, bucket_name, processed_files):
     """Get list of new files from S3 bucket"""
     try:
-        response = s3_client.list_objects_v2(Bucket=bucket_name, Prefix='prices/')
+        paginator = s3_client.get_paginator('list_objects_v2')
         
         new_files = []
-        if 'Contents' in response:
-            for obj in response['Contents']:
+        for page in paginator.paginate(Bucket=bucket_name, Prefix='prices/'):
+            for obj in page.get('Contents', []):
                 key = obj['Key']
                 if key not in processed_files:
                     new_files.append(key)
@@ -62,92 +98,227 @@ def get_latest_s3_files(s3_client, bucket_name, processed_files):
         print(f"Error listing S3 objects: {e}")
         return []
 
-def process_s3_file(s3_client, bucket_name, s3_key, channel, queue_name):
+def parse_s3_event_keys(message_body, bucket_name, prefix='prices/'):
+    """Extract created object keys from an S3 notification (same `Records` shape the lambda simulator receives)"""
+    event = json.loads(message_body)
+    
+    # S3 sends a one-off s3:TestEvent when the notification configuration is applied
+    if event.get('Event') == 's3:TestEvent':
+        return []
+    
+    keys = []
+    for record in event.get('Records', []):
+        if not record.get('eventName', '').startswith('ObjectCreated'):
+            continue
+        if record['s3']['bucket']['name'] != bucket_name:
+            continue
+        # Keys arrive URL-encoded (spaces as '+')
+        key = unquote_plus(record['s3']['object']['key'])
+        if key.startswith(prefix):
+            keys.append(key)
+    
+    return keys
+
+def process_s3_file(s3_client, bucket_name, s3_key, publisher, exchange_name, partition_count,
+                    hash_store=None):
     """Download file from S3 and send to RabbitMQ"""
     try:
         # Download file from S3
         response = s3_client.get_object(Bucket=bucket_name, Key=s3_key)
-        file_content = response['Body'].read().decode('utf-8')
         
-        # Parse JSON to validate and extract items
-        data = json.loads(file_content)
-        root_data = data.get('Root', {})
-        items = root_data.get('Items', {}).get('Item', [])
-        
-        # Extract store information from root
-        chain_id = root_data.get('ChainId')
-        store_id = root_data.get('StoreId')
+        if s3_key.endswith('.ndjson'):
+            # Streamed uploads: one item per line, store information in the object metadata
+            items = [json.loads(line) for line in response['Body'].iter_lines() if line.strip()]
+            chain_id = response['Metadata'].get('chain-id') or None
+            store_id = response['Metadata'].get('store-id') or None
+        else:
+            file_content = response['Body'].read().decode('utf-8')
+            
+            # Parse JSON to validate and extract items
+            data = json.loads(file_content)
+            root_data = data.get('Root', {})
+            items = root_data.get('Items', {}).get('Item', [])
+            
+            # Extract store information from root
+            chain_id = root_data.get('ChainId')
+            store_id = root_data.get('StoreId')
         
         if not isinstance(items, list):
             items = [items]
         
         print(f"Processing {len(items)} items from {s3_key} (Store: {store_id}, Chain: {chain_id})")
         
-        # Send each item to RabbitMQ
-        for item in items:
+        # Forward only items whose content changed since they were last published
+        if hash_store is not None:
+            changed = hash_store.filter_changed(chain_id, store_id, items)
+        else:
+            changed = [(item, None) for item in items]
+        skipped = len(items) - len(changed)
+        
+        # Publish every item and wait for the broker to confirm all of them
+        properties = pika.BasicProperties(
+            delivery_mode=2,  # Make message persistent
+        )
+        routing_key = str(partition_for_store(chain_id, store_id, partition_count))
+        messages = []
+        for item, raw_hash in changed:
             message = {
                 'source_file': s3_key,
                 'timestamp': datetime.now().isoformat(),
                 'chain_id': chain_id,
                 'store_id': store_id,
+                'raw_hash': raw_hash,
                 'item_data': item
             }
-            
-            channel.basic_publish(
-                exchange='',
-                routing_key=queue_name,
-                body=json.dumps(message),
-                properties=pika.BasicProperties(
-                    delivery_mode=2,  # Make message persistent
-                )
-            )
+            messages.append((routing_key, json.dumps(message), properties))
         
-        print(f"Successfully sent {len(items)} messages from {s3_key} to queue '{queue_name}'")
+        if not publisher.publish_batch(exchange_name, messages):
+            print(f"Broker did not confirm all messages from {s3_key}")
+            return False
+        
+        if hash_store is not None:
+            hash_store.commit(chain_id, store_id, changed)
+            hash_store.record_counts(skipped, len(changed))
+            print(f"Dedup: forwarded {len(changed)}, skipped {skipped} unchanged items from {s3_key} "
+                  f"(totals: forwarded {hash_store.forwarded_total}, skipped {hash_store.skipped_total})")
+        
+        print(f"Broker confirmed {len(changed)} messages from {s3_key} to partition {routing_key}")
         return True
         
     except Exception as e:
         print(f"Error processing file {s3_key}: {e}")
         return False
 
+def process_new_files(s3_client, bucket_name, new_files, publisher, exchange_name, partition_count,
+                      processed_files, hash_store=None):
+    """Process a list of S3 keys, marking the successful ones as processed"""
+    all_succeeded = True
+    for s3_key in new_files:
+        if s3_key in processed_files:
+            continue
+        print(f"Processing new file: {s3_key}")
+        success = process_s3_file(s3_client, bucket_name, s3_key, publisher, exchange_name,
+                                  partition_count, hash_store)
+        if success:
+            processed_files.add(s3_key)
+        else:
+            all_succeeded = False
+    return all_succeeded
+
+def run_polling(s3_client, bucket_name, publisher, exchange_name, partition_count, processed_files,
+                check_interval, hash_store=None):
+    """Legacy mode: list the bucket every check_interval seconds"""
+    while True:
+        new_files = get_latest_s3_files(s3_client, bucket_name, processed_files)
+        process_new_files(s3_client, bucket_name, new_files, publisher, exchange_name, partition_count,
+                          processed_files, hash_store)
+        
+        if new_files:
+            print(f"Processed {len(new_files)} new files")
+        
+        time.sleep(check_interval)
+
+def run_event_driven(s3_client, sqs_client, events_queue_url, bucket_name, publisher, exchange_name,
+                     partition_count, processed_files, reconcile_interval, hash_store=None):
+    """Process keys as S3 ObjectCreated notifications arrive, reconciling with a bucket listing as a fallback"""
+    next_reconcile = 0  # reconcile right away to pick up anything uploaded while we were down
+    
+    while True:
+        if time.time() >= next_reconcile:
+            new_files = get_latest_s3_files(s3_client, bucket_name, processed_files)
+            if new_files:
+                print(f"Reconciler found {len(new_files)} unprocessed files")
+                process_new_files(s3_client, bucket_name, new_files, publisher, exchange_name, partition_count,
+                                  processed_files, hash_store)
+            next_reconcile = time.time() + reconcile_interval
+        
+        # Long-poll, but wake up in time for the next reconcile pass
+        wait_seconds = max(1, min(20, int(next_reconcile - time.time())))
+        try:
+            response = sqs_client.receive_message(
+                QueueUrl=events_queue_url,
+                MaxNumberOfMessages=10,
+                WaitTimeSeconds=wait_seconds
+            )
+        except Exception as e:
+            print(f"Error receiving S3 events: {e}")
+            time.sleep(2)
+            continue
+        
+        for message in response.get('Messages', []):
+            try:
+                keys = parse_s3_event_keys(message['Body'], bucket_name)
+            except (ValueError, KeyError) as e:
+                print(f"Discarding malformed S3 event {message['MessageId']}: {e}")
+                keys = []
+            
+            if keys:
+                print(f"S3 event for {len(keys)} key(s): {', '.join(keys)}")
+            
+            # Leave the event on the queue if anything failed; it becomes visible again
+            # after the visibility timeout and the reconciler is a second safety net
+            if process_new_files(s3_client, bucket_name, keys, publisher, exchange_name, partition_count,
+                                 processed_files, hash_store):
+                sqs_client.delete_message(
+                    QueueUrl=events_queue_url,
+                    ReceiptHandle=message['ReceiptHandle']
+                )
+
 def main():
     bucket_name = os.getenv('S3_BUCKET', 'price-data')
     queue_name = os.getenv('RABBITMQ_QUEUE', 'price-items')
+    exchange_name = os.getenv('RABBITMQ_EXCHANGE', 'price-items')
+    partition_count = int(os.getenv('PARTITION_COUNT', '8'))
+    ingest_mode = os.getenv('INGEST_MODE', 'poll')
     check_interval = int(os.getenv('CHECK_INTERVAL', '30'))
+    events_queue_name = os.getenv('S3_EVENTS_QUEUE', 'price-data-events')
+    reconcile_interval = int(os.getenv('RECONCILE_INTERVAL', '300'))
+    publish_window = int(os.getenv('PUBLISH_WINDOW', '256'))
+    dedup_enabled = os.getenv('DEDUP_ENABLED', 'true').lower() == 'true'
+    dedup_db_path = os.getenv('DEDUP_DB_PATH', '/data/item-hashes.sqlite3')
     
     print("Starting S3 to RabbitMQ processor...")
     print(f"S3 Bucket: {bucket_name}")
-    print(f"RabbitMQ Queue: {queue_name}")
-    print(f"Check interval: {check_interval} seconds")
+    print(f"RabbitMQ Exchange: {exchange_name} ({partition_count} partition queues '{queue_name}.N')")
+    print(f"Ingest mode: {ingest_mode}")
+    print(f"Publisher confirm window: {publish_window}")
+    print(f"Change-only ingestion: {'on (' + dedup_db_path + ')' if dedup_enabled else 'off'}")
+    if ingest_mode == 'events':
+        print(f"S3 events queue: {events_queue_name}")
+        print(f"Reconcile interval: {reconcile_interval} seconds")
+    else:
+        print(f"Check interval: {check_interval} seconds")
     
     # Wait for services to be ready
     time.sleep(15)
     
     s3_client = create_s3_client()
     connection = create_rabbitmq_connection()
-    channel = connection.channel()
-    setup_rabbitmq_queue(channel, queue_name)
+    setup_partitioned_topology(connection.channel(), exchange_name, queue_name, partition_count)
+    connection.close()
+    
+    publisher = ConfirmedPublisher(get_rabbitmq_parameters(), window=publish_window)
+    publisher.start()
     
+    hash_store = ItemHashStore(dedup_db_path) if dedup_enabled else None
     processed_files = set()
     
     try:
-        while True:
-            new_files = get_latest_s3_files(s3_client, bucket_name, processed_files)
-            
-            for s3_key in new_files:
-                print(f"Processing new file: {s3_key}")
-                success = process_s3_file(s3_client, bucket_name, s3_key, channel, queue_name)
-                if success:
-                    processed_files.add(s3_key)
-            
-            if new_files:
-                print(f"Processed {len(new_files)} new files")
-            
-            time.sleep(check_interval)
+        if ingest_mode == 'events':
+            sqs_client = create_sqs_client()
+            events_queue_url = get_events_queue_url(sqs_client, events_queue_name)
+            run_event_driven(s3_client, sqs_client, events_queue_url, bucket_name, publisher,
+                             exchange_name, partition_count, processed_files, reconcile_interval, hash_store)
+        else:
+            run_polling(s3_client, bucket_name, publisher, exchange_name, partition_count, processed_files,
+                        check_interval, hash_store)
             
     except KeyboardInterrupt:
         print("Shutting down...")
     finally:
-        connection.close()
+        publisher.close()
+        if hash_store is not None:
+            hash_store.close()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
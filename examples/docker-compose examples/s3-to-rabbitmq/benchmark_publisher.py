@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""Measure confirmed-publish throughput for several in-flight window sizes.
+
+Usage (with the compose stack running):
+    python benchmark_publisher.py --host localhost --messages 20000 --windows 1 64 1024
+"""
+
+import argparse
+import json
+import time
+
+import pika
+
+from publisher import ConfirmedPublisher
+
+BENCHMARK_QUEUE = 'publisher-confirms-benchmark'
+
+
+def build_messages(count, queue_name):
+    """Messages shaped like the price items s3-to-rabbitmq publishes"""
+    properties = pika.BasicProperties(delivery_mode=2)
+    messages = []
+    for i in range(count):
+        body = json.dumps({
+            'source_file': 'prices/benchmark.json',
+            'chain_id': '7290055700007',
+            'store_id': '0084',
+            'item_data': {
+                'ItemCode': f'{7290000000000 + i}',
+                'ItemName': 'מוצר לבדיקה',
+                'ItemPrice': '9.90',
+                'PriceUpdateDate': '2025-08-06 05:10:00',
+            },
+        })
+        messages.append((queue_name, body, properties))
+    return messages
+
+
+def run(parameters, window, messages):
+    publisher = ConfirmedPublisher(parameters, window=window)
+    publisher.start()
+    try:
+        started = time.perf_counter()
+        confirmed = publisher.publish_batch('', messages)
+        elapsed = time.perf_counter() - started
+    finally:
+        publisher.close()
+    return confirmed, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--messages', type=int, default=20000)
+    parser.add_argument('--windows', type=int, nargs='+', default=[1, 64, 1024])
+    args = parser.parse_args()
+
+    parameters = pika.ConnectionParameters(
+        host=args.host,
+        port=5672,
+        virtual_host='/',
+        credentials=pika.PlainCredentials('guest', 'guest')
+    )
+
+    connection = pika.BlockingConnection(parameters)
+    channel = connection.channel()
+    channel.queue_declare(queue=BENCHMARK_QUEUE, durable=True)
+
+    messages = build_messages(args.messages, BENCHMARK_QUEUE)
+    print(f"Publishing {args.messages} persistent messages per run")
+    print(f"{'window':>8} {'seconds':>10} {'msgs/sec':>12}")
+
+    try:
+        for window in args.windows:
+            channel.queue_purge(BENCHMARK_QUEUE)
+            confirmed, elapsed = run(parameters, window, messages)
+            status = '' if confirmed else '  (not all confirmed)'
+            print(f"{window:>8} {elapsed:>10.2f} {args.messages / elapsed:>12.0f}{status}")
+    finally:
+        channel.queue_delete(BENCHMARK_QUEUE)
+        connection.close()
+
+
+if __name__ == '__main__':
+    main()
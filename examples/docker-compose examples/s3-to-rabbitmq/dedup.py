@@ -0,0 +1,83 @@
+import hashlib
+import json
+import os
+import sqlite3
+
+
+def normalize_item(item):
+    """Canonical form of a price item: sorted keys, surrounding whitespace stripped"""
+    if isinstance(item, dict):
+        return {key: normalize_item(value) for key, value in sorted(item.items())}
+    if isinstance(item, list):
+        return [normalize_item(value) for value in item]
+    if isinstance(item, str):
+        return item.strip()
+    return item
+
+
+def hash_item(item):
+    """Content hash of the normalized item (hex, stored as raw_hash downstream)"""
+    canonical = json.dumps(normalize_item(item), ensure_ascii=False, separators=(',', ':'))
+    return hashlib.blake2b(canonical.encode('utf-8'), digest_size=16).hexdigest()
+
+
+class ItemHashStore:
+    """Last seen content hash per (chain, store, item_code), kept in a local SQLite file"""
+
+    def __init__(self, db_path):
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.connection = sqlite3.connect(db_path)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS item_hashes (
+                chain_id TEXT NOT NULL,
+                store_id TEXT NOT NULL,
+                item_code TEXT NOT NULL,
+                hash BLOB NOT NULL,
+                PRIMARY KEY (chain_id, store_id, item_code)
+            ) WITHOUT ROWID
+        """)
+        self.connection.commit()
+        self.skipped_total = 0
+        self.forwarded_total = 0
+
+    def filter_changed(self, chain_id, store_id, items):
+        """Return (item, raw_hash) pairs for items that are new or changed since the last commit"""
+        known = dict(self.connection.execute(
+            "SELECT item_code, hash FROM item_hashes WHERE chain_id = ? AND store_id = ?",
+            (chain_id or '', store_id or '')
+        ))
+
+        changed = []
+        for item in items:
+            raw_hash = hash_item(item)
+            item_code = item.get('ItemCode') if isinstance(item, dict) else None
+            # Items without a code can't be tracked, so they are always forwarded
+            if item_code and known.get(item_code) == bytes.fromhex(raw_hash):
+                continue
+            changed.append((item, raw_hash))
+
+        return changed
+
+    def commit(self, chain_id, store_id, changed):
+        """Remember the hashes of items that were forwarded (call only once they are confirmed)"""
+        rows = [
+            (chain_id or '', store_id or '', item['ItemCode'], bytes.fromhex(raw_hash))
+            for item, raw_hash in changed
+            if isinstance(item, dict) and item.get('ItemCode')
+        ]
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO item_hashes (chain_id, store_id, item_code, hash) VALUES (?, ?, ?, ?)",
+                rows
+            )
+
+    def record_counts(self, skipped, forwarded):
+        self.skipped_total += skipped
+        self.forwarded_total += forwarded
+
+    def close(self):
+        self.connection.close()
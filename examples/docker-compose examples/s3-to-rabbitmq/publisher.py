@@ -0,0 +1,200 @@
+import threading
+import time
+from collections import OrderedDict
+from functools import partial
+
+import pika
+from pika.adapters.select_connection import IOLoop
+
+
+class _Batch:
+    """Tracks the broker's answer for every message of one publish_batch call"""
+
+    def __init__(self, indexes):
+        self.unanswered = set(indexes)
+        self.nacked = []
+        self.closed = False
+        self.condition = threading.Condition()
+
+    def resolve(self, index, acked):
+        with self.condition:
+            if self.closed:
+                return
+            self.unanswered.discard(index)
+            if not acked:
+                self.nacked.append(index)
+            if not self.unanswered:
+                self.condition.notify_all()
+
+    def wait(self, timeout):
+        """Wait for every ack/nack and return the indexes that were not acked"""
+        with self.condition:
+            if not self.condition.wait_for(lambda: not self.unanswered, timeout=timeout):
+                print(f"Timed out waiting for {len(self.unanswered)} confirms")
+            self.closed = True
+            return sorted(self.nacked + list(self.unanswered))
+
+
+class ConfirmedPublisher:
+    """Publishes with RabbitMQ publisher confirms, keeping up to `window` deliveries in flight.
+
+    A BlockingConnection can only wait for one confirm at a time, so the publisher runs a
+    SelectConnection on its own I/O thread. publish_batch() hands messages to that thread,
+    blocks while the window is full, and returns once the broker has confirmed the batch.
+    Nacked messages, and messages lost with the connection, are retried - nothing else is.
+    """
+
+    def __init__(self, parameters, window=256, max_attempts=5, confirm_timeout=60):
+        self.parameters = parameters
+        self.window = window
+        self.max_attempts = max_attempts
+        self.confirm_timeout = confirm_timeout
+
+        self._slots = threading.BoundedSemaphore(window)
+        self._ready = threading.Event()
+        self._stopping = False
+        self._ioloop = IOLoop()
+        self._connection = None
+        self._channel = None
+        self._delivery_tag = 0
+        self._outstanding = OrderedDict()  # delivery tag -> (batch, index)
+        self._thread = None
+
+    def start(self, timeout=60):
+        """Start the I/O thread and wait for a confirm-mode channel"""
+        self._thread = threading.Thread(target=self._run, name="rabbitmq-publisher", daemon=True)
+        self._thread.start()
+        if not self._ready.wait(timeout):
+            raise Exception("Timed out waiting for RabbitMQ publisher channel")
+
+    def close(self):
+        self._stopping = True
+        self._ioloop.add_callback_threadsafe(self._close_connection)
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+
+    def publish_batch(self, exchange, messages):
+        """Publish (routing_key, body, properties) tuples; True once all are confirmed"""
+        pending = list(range(len(messages)))
+        attempt = 0
+
+        while pending and attempt < self.max_attempts:
+            attempt += 1
+            if not self._ready.wait(self.confirm_timeout):
+                print("Publisher channel not available, retrying...")
+                continue
+
+            batch = _Batch(pending)
+            for index in pending:
+                self._slots.acquire()
+                routing_key, body, properties = messages[index]
+                self._ioloop.add_callback_threadsafe(
+                    partial(self._publish, batch, index, exchange, routing_key, body, properties)
+                )
+
+            pending = batch.wait(self.confirm_timeout)
+
+            if pending:
+                print(f"{len(pending)} message(s) not confirmed (attempt {attempt}/{self.max_attempts}), retrying...")
+                time.sleep(min(2 ** attempt, 30))
+
+        return not pending
+
+    # --- I/O thread ---
+
+    def _run(self):
+        # One IOLoop for the publisher's lifetime: callbacks queued while reconnecting
+        # are not lost and run against the next channel (which fails them for retry)
+        self._connect()
+        self._ioloop.start()
+
+    def _connect(self):
+        self._connection = pika.SelectConnection(
+            self.parameters,
+            on_open_callback=self._on_connection_open,
+            on_open_error_callback=self._on_connection_error,
+            on_close_callback=self._on_connection_closed,
+            custom_ioloop=self._ioloop,
+        )
+
+    def _on_connection_open(self, connection):
+        connection.channel(on_open_callback=self._on_channel_open)
+
+    def _on_connection_error(self, connection, error):
+        print(f"Failed to connect publisher to RabbitMQ: {error}")
+        if self._stopping:
+            self._ioloop.stop()
+        else:
+            self._ioloop.call_later(2, self._connect)
+
+    def _on_connection_closed(self, connection, reason):
+        self._ready.clear()
+        self._channel = None
+        self._fail_outstanding()
+        if self._stopping:
+            self._ioloop.stop()
+        else:
+            print(f"Publisher connection closed, reconnecting: {reason}")
+            self._ioloop.call_later(2, self._connect)
+
+    def _on_channel_open(self, channel):
+        channel.add_on_close_callback(self._on_channel_closed)
+        channel.confirm_delivery(ack_nack_callback=self._on_confirm,
+                                 callback=lambda frame: self._on_confirm_mode(channel))
+
+    def _on_confirm_mode(self, channel):
+        self._channel = channel
+        self._delivery_tag = 0
+        self._ready.set()
+
+    def _on_channel_closed(self, channel, reason):
+        self._ready.clear()
+        self._channel = None
+        self._fail_outstanding()
+        if not self._stopping and self._connection.is_open:
+            print(f"Publisher channel closed, reopening: {reason}")
+            self._connection.channel(on_open_callback=self._on_channel_open)
+
+    def _close_connection(self):
+        if self._connection is not None and self._connection.is_open:
+            self._connection.close()
+        else:
+            self._ioloop.stop()
+
+    def _publish(self, batch, index, exchange, routing_key, body, properties):
+        if self._channel is None or not self._channel.is_open:
+            batch.resolve(index, False)
+            self._slots.release()
+            return
+        self._channel.basic_publish(exchange=exchange, routing_key=routing_key,
+                                    body=body, properties=properties)
+        self._delivery_tag += 1
+        self._outstanding[self._delivery_tag] = (batch, index)
+
+    def _on_confirm(self, frame):
+        method = frame.method
+        acked = isinstance(method, pika.spec.Basic.Ack)
+
+        if method.multiple:
+            tags = []
+            for tag in self._outstanding:
+                if tag > method.delivery_tag:
+                    break
+                tags.append(tag)
+        else:
+            tags = [method.delivery_tag]
+
+        for tag in tags:
+            entry = self._outstanding.pop(tag, None)
+            if entry is None:
+                continue
+            batch, index = entry
+            batch.resolve(index, acked)
+            self._slots.release()
+
+    def _fail_outstanding(self):
+        """Everything in flight on a dead channel is unconfirmed and must be retried"""
+        while self._outstanding:
+            _, (batch, index) = self._outstanding.popitem(last=False)
+            batch.resolve(index, False)
+            self._slots.release()
@@ -0,0 +1,10 @@
+import zlib
+
+
+def partition_for_store(chain_id, store_id, partition_count):
+    """Stable partition for a store, so all of its items are consumed in order by one worker
+
+    Also used by rabbitmq-to-postgres/load_test.py, so test traffic is routed the
+    same way as the producer's.
+    """
+    return zlib.crc32(f"{chain_id}:{store_id}".encode('utf-8')) % partition_count
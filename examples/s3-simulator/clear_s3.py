@@ -1,54 +1,115 @@
 #!/usr/bin/env python3
 
-import boto3
+import argparse
+import re
 import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timedelta, timezone
+
+import boto3
+from botocore.config import Config
 from botocore.exceptions import ClientError
 
-def clear_s3_bucket():
-    """Clear all files from S3 bucket using LocalStack"""
-    
-    print("Clearing all files from S3 bucket...")
-    
+DELETE_BATCH_SIZE = 1000  # S3 maximum keys per delete_objects call
+AGE_UNITS = {'s': 'seconds', 'm': 'minutes', 'h': 'hours', 'd': 'days'}
+
+def parse_age(value):
+    """'30m', '12h', '7d' (or plain seconds) → timedelta"""
+    match = re.fullmatch(r'(\d+(?:\.\d+)?)([smhd]?)', value.strip().lower())
+    if not match:
+        raise argparse.ArgumentTypeError(f"invalid age '{value}' (use e.g. 90s, 30m, 12h, 7d)")
+    amount, unit = match.groups()
+    return timedelta(**{AGE_UNITS[unit or 's']: float(amount)})
+
+def format_size(size):
+    size = float(size)
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if size < 1024 or unit == 'GB':
+            return f"{size:.1f} {unit}"
+        size /= 1024
+
+def delete_batch(s3_client, bucket_name, keys):
+    """One delete_objects call; returns (deleted count, errors)"""
+    try:
+        response = s3_client.delete_objects(
+            Bucket=bucket_name,
+            # Quiet: only errors come back, not one entry per deleted key
+            Delete={'Objects': [{'Key': key} for key in keys], 'Quiet': True}
+        )
+    except ClientError as e:
+        return 0, [{'Key': key, 'Message': str(e)} for key in keys]
+    errors = response.get('Errors', [])
+    return len(keys) - len(errors), errors
+
+def clear_s3_bucket(bucket_name='test-bucket', endpoint_url='http://localhost:4566', prefix='',
+                    older_than=None, workers=8, dry_run=False, verbose=False):
+    """Clear files from S3 bucket using LocalStack
+
+    Listing pages (1000 keys each) are filtered and fed straight into
+    concurrent delete_objects batches, so a bucket of any size is emptied in
+    one pass and deleting overlaps with listing.
+    """
+
+    action = "Counting" if dry_run else "Clearing"
+    filters = []
+    if prefix:
+        filters.append(f"prefix '{prefix}'")
+    if older_than:
+        filters.append(f"older than {older_than}")
+    print(f"{action} files in s3://{bucket_name}" + (f" ({', '.join(filters)})" if filters else "") + "...")
+
     s3_client = boto3.client(
         's3',
-        endpoint_url='http://localhost:4566',
+        endpoint_url=endpoint_url,
         aws_access_key_id='test',
         aws_secret_access_key='test',
-        region_name='us-east-1'
+        region_name='us-east-1',
+        config=Config(max_pool_connections=workers + 2)
     )
-    
-    bucket_name = 'test-bucket'
-    
+
+    cutoff = datetime.now(timezone.utc) - older_than if older_than else None
+    stats = {'listed': 0, 'matched': 0, 'bytes': 0, 'deleted': 0, 'failed': 0}
+    errors = []
+    started = time.perf_counter()
+
+    def collect(future):
+        deleted, batch_errors = future.result()
+        stats['deleted'] += deleted
+        stats['failed'] += len(batch_errors)
+        errors.extend(batch_errors)
+
     try:
-        # List all objects in the bucket
-        response = s3_client.list_objects_v2(Bucket=bucket_name)
-        
-        if 'Contents' not in response:
-            print("✅ Bucket is already empty")
-            return
-        
-        # Delete all objects
-        objects_to_delete = [{'Key': obj['Key']} for obj in response['Contents']]
-        
-        if objects_to_delete:
-            delete_response = s3_client.delete_objects(
-                Bucket=bucket_name,
-                Delete={'Objects': objects_to_delete}
-            )
-            
-            deleted_count = len(delete_response.get('Deleted', []))
-            print(f"✅ Successfully deleted {deleted_count} files from s3://{bucket_name}")
-            
-            # List deleted files
-            for deleted in delete_response.get('Deleted', []):
-                print(f"  - Deleted: {deleted['Key']}")
-        
-        # Check for any deletion errors
-        if 'Errors' in delete_response:
-            print("❌ Some files failed to delete:")
-            for error in delete_response['Errors']:
-                print(f"  - {error['Key']}: {error['Message']}")
-                
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            in_flight = set()
+            batch = []
+            paginator = s3_client.get_paginator('list_objects_v2')
+            for page in paginator.paginate(Bucket=bucket_name, Prefix=prefix, PaginationConfig={'PageSize': 1000}):
+                for obj in page.get('Contents', []):
+                    stats['listed'] += 1
+                    if cutoff and obj['LastModified'] >= cutoff:
+                        continue
+                    stats['matched'] += 1
+                    stats['bytes'] += obj['Size']
+                    if verbose or (dry_run and stats['matched'] <= 10):
+                        print(f"  - {'Would delete' if dry_run else 'Deleting'}: {obj['Key']}")
+                    if not dry_run:
+                        batch.append(obj['Key'])
+
+                    if len(batch) == DELETE_BATCH_SIZE:
+                        # Bounded in-flight batches keep memory flat on huge buckets
+                        if len(in_flight) >= workers * 2:
+                            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                            for future in done:
+                                collect(future)
+                        in_flight.add(executor.submit(delete_batch, s3_client, bucket_name, batch))
+                        batch = []
+
+            if batch:
+                in_flight.add(executor.submit(delete_batch, s3_client, bucket_name, batch))
+            for future in in_flight:
+                collect(future)
+
     except ClientError as e:
         error_code = e.response['Error']['Code']
         if error_code == 'NoSuchBucket':
@@ -61,5 +122,45 @@ def clear_s3_bucket():
         print(f"Unexpected error: {e}")
         sys.exit(1)
 
+    elapsed = time.perf_counter() - started
+    rate = (stats['matched'] if dry_run else stats['deleted']) / elapsed if elapsed else 0
+
+    if stats['listed'] == 0:
+        print("✅ Bucket is already empty" if not prefix else f"✅ No files under '{prefix}'")
+    elif dry_run:
+        if stats['matched'] > 10 and not verbose:
+            print(f"  ... and {stats['matched'] - 10} more")
+        print(f"🔍 Dry run: would delete {stats['matched']} of {stats['listed']} files "
+              f"({format_size(stats['bytes'])}) from s3://{bucket_name}")
+    else:
+        print(f"✅ Successfully deleted {stats['deleted']} of {stats['listed']} files "
+              f"({format_size(stats['bytes'])}) from s3://{bucket_name}")
+    print(f"⏱️ {elapsed:.2f}s, {rate:.0f} files/s with {workers} workers")
+
+    # Check for any deletion errors
+    if errors:
+        print(f"❌ {len(errors)} files failed to delete:")
+        for error in errors[:20]:
+            print(f"  - {error['Key']}: {error['Message']}")
+        if len(errors) > 20:
+            print(f"  ... and {len(errors) - 20} more")
+        sys.exit(1)
+
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser(description="Delete files from the simulator's S3 bucket")
+    parser.add_argument('--bucket', default='test-bucket')
+    parser.add_argument('--endpoint', default='http://localhost:4566', help="S3 endpoint (LocalStack)")
+    parser.add_argument('--prefix', default='', help="Only keys starting with this prefix")
+    parser.add_argument('--older-than', type=parse_age, help="Only files last modified before this age, e.g. 30m, 12h, 7d")
+    parser.add_argument('--workers', type=int, default=8, help="Concurrent delete_objects calls")
+    parser.add_argument('--dry-run', action='store_true', help="List and count what would be deleted, delete nothing")
+    parser.add_argument('--verbose', action='store_true', help="Print every key")
+    args = parser.parse_args()
+
+    clear_s3_bucket(args.bucket, args.endpoint, args.prefix, args.older_than,
+                    max(1, args.workers), args.dry_run, args.verbose)
+
 if __name__ == "__main__":
-    clear_s3_bucket()
\ No newline at end of file
+    main()
@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { 
   ThemeProvider, 
   createTheme,
@@ -17,7 +17,9 @@ import {
   Box,
   IconButton,
   Alert,
-  Avatar
+  Avatar,
+  Button,
+  TextField
 } from '@mui/material';
 import { styled } from '@mui/material/styles';
 import InsertDriveFileIcon from '@mui/icons-material/InsertDriveFile';
@@ -78,22 +80,35 @@ function isGitHubUsername(filename) {
   return githubUsernamePattern.test(nameWithoutExt) && nameWithoutExt.length <= 39 && nameWithoutExt.length >= 1;
 }
 
+const PAGE_SIZE = 100;
+
 function App() {
   const [files, setFiles] = useState([]);
   const [bucket, setBucket] = useState('');
+  const [prefixInput, setPrefixInput] = useState('');
+  const [prefix, setPrefix] = useState('');
+  const [nextCursor, setNextCursor] = useState(null);
+  const [total, setTotal] = useState(null);
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState('');
+  const pagedRef = useRef(false);
 
-  const fetchFiles = async () => {
+  // Without a cursor the list restarts at the first page; with one the page is appended
+  const fetchFiles = async (cursor = null) => {
     setLoading(true);
     setError('');
     try {
-      const response = await fetch('http://localhost:8080/files');
+      const params = new URLSearchParams({ prefix, limit: PAGE_SIZE });
+      if (cursor) params.set('cursor', cursor);
+      const response = await fetch(`http://localhost:8080/files?${params}`);
       const data = await response.json();
       
       if (response.ok) {
-        setFiles(data.files || []);
+        setFiles(previous => cursor ? [...previous, ...(data.files || [])] : (data.files || []));
         setBucket(data.bucket || '');
+        setNextCursor(data.nextCursor || null);
+        setTotal(data.total);
+        pagedRef.current = Boolean(cursor);
       } else {
         setError(data.error || 'Failed to fetch files');
       }
@@ -103,11 +118,21 @@ function App() {
     setLoading(false);
   };
 
+  // Wait for typing to pause before listing (and counting) a new prefix
+  useEffect(() => {
+    const timeout = setTimeout(() => setPrefix(prefixInput), 300);
+    return () => clearTimeout(timeout);
+  }, [prefixInput]);
+
   useEffect(() => {
     fetchFiles();
-    const interval = setInterval(fetchFiles, 10000);
+    // Auto-refresh the first page, but don't reset a list being paged through
+    const interval = setInterval(() => {
+      if (!document.hidden && !pagedRef.current) fetchFiles();
+    }, 10000);
     return () => clearInterval(interval);
-  }, []);
+    // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, [prefix]);
 
   return (
     <ThemeProvider theme={theme}>
@@ -129,10 +154,10 @@ function App() {
       <Container maxWidth="md" sx={{ mt: 4 }}>
         <HeaderBox>
           <Typography variant="h4" component="h1">
-            Files ({files.length})
+            Files ({total ? `${files.length} of ${total.objects}${total.complete ? '' : '+'}` : files.length})
           </Typography>
           <IconButton 
-            onClick={fetchFiles} 
+            onClick={() => fetchFiles()} 
             disabled={loading}
             color="primary"
           >
@@ -140,6 +165,15 @@ function App() {
           </IconButton>
         </HeaderBox>
 
+        <TextField
+          label="Filter by prefix"
+          value={prefixInput}
+          onChange={(event) => setPrefixInput(event.target.value)}
+          size="small"
+          fullWidth
+          sx={{ mb: 2 }}
+        />
+
         {error && (
           <Alert severity="error" sx={{ mb: 2 }}>
             {error}
@@ -188,6 +222,13 @@ function App() {
                 ))}
               </List>
             )}
+            {nextCursor && (
+              <Box sx={{ display: 'flex', justifyContent: 'center', mt: 1 }}>
+                <Button onClick={() => fetchFiles(nextCursor)} disabled={loading} variant="outlined">
+                  {loading ? 'Loading...' : `Load ${PAGE_SIZE} more`}
+                </Button>
+              </Box>
+            )}
           </CardContent>
         </StyledCard>
       </Container>
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Benchmark the lambda simulator: POST synthetic S3 events concurrently and
+report events/sec and latency percentiles.
+
+    docker-compose up -d
+    python lambda/benchmark.py --concurrency 20 --records 10 --duration 15
+"""
+
+import argparse
+import json
+import sys
+import threading
+import time
+import urllib.request
+from urllib.error import URLError
+
+import boto3
+
+
+def upload_objects(endpoint, bucket, count):
+    """Small objects for the events to point at, so head_object finds them"""
+    s3_client = boto3.client(
+        's3',
+        endpoint_url=endpoint,
+        aws_access_key_id='test',
+        aws_secret_access_key='test',
+        region_name='us-east-1'
+    )
+    keys = [f"benchmark/object-{i:04d}.txt" for i in range(count)]
+    for key in keys:
+        s3_client.put_object(Bucket=bucket, Key=key, Body=f"benchmark {key}\n".encode('utf-8'))
+    return keys
+
+
+def make_event(bucket, keys):
+    """S3 notification event with one record per key"""
+    return {
+        'Records': [
+            {
+                'eventName': 'ObjectCreated:Put',
+                's3': {
+                    'bucket': {'name': bucket},
+                    'object': {'key': key}
+                }
+            }
+            for key in keys
+        ]
+    }
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, round((len(sorted_values) - 1) * q))
+    return sorted_values[index]
+
+
+def run_benchmark(url, bodies, concurrency, duration):
+    """Each worker sends events back to back until the duration is over"""
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def worker(worker_id):
+        sent = 0
+        while time.perf_counter() < deadline:
+            body = bodies[(worker_id + sent) % len(bodies)]
+            sent += 1
+            request = urllib.request.Request(url, data=body, headers={'Content-Type': 'application/json'})
+            started = time.perf_counter()
+            error = None
+            try:
+                with urllib.request.urlopen(request, timeout=30) as response:
+                    response.read()
+                    if response.status != 200:
+                        error = f"HTTP {response.status}"
+            except (URLError, OSError) as e:
+                error = str(e)
+            elapsed = time.perf_counter() - started
+            with lock:
+                if error is None:
+                    latencies.append(elapsed)
+                else:
+                    errors.append(error)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'concurrency': concurrency,
+        'events': len(latencies),
+        'errors': len(errors),
+        'seconds': round(wall, 3),
+        'events_per_second': round(len(latencies) / wall, 1) if wall else 0.0,
+        'p50_ms': round(percentile(latencies, 0.5) * 1000, 1),
+        'p90_ms': round(percentile(latencies, 0.9) * 1000, 1),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 1),
+        'sample_error': errors[0] if errors else None
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Events/sec benchmark for the S3 lambda simulator")
+    parser.add_argument('--url', default='http://localhost:8080/', help="Lambda simulator endpoint")
+    parser.add_argument('--s3-endpoint', default='http://localhost:4566')
+    parser.add_argument('--bucket', default='test-bucket')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 10, 50], help="Concurrent clients (one run each)")
+    parser.add_argument('--records', type=int, default=10, help="Records per event")
+    parser.add_argument('--objects', type=int, default=100, help="Objects uploaded for the events to reference")
+    parser.add_argument('--duration', type=float, default=10, help="Seconds per run")
+    parser.add_argument('--no-upload', action='store_true', help="Reuse objects from an earlier run")
+    parser.add_argument('--output', help="Write the results as JSON")
+    args = parser.parse_args()
+
+    print("⏱️ S3 Lambda Simulator Benchmark")
+    print("=" * 60)
+
+    if args.no_upload:
+        keys = [f"benchmark/object-{i:04d}.txt" for i in range(args.objects)]
+    else:
+        try:
+            keys = upload_objects(args.s3_endpoint, args.bucket, args.objects)
+        except Exception as e:
+            print(f"❌ Uploading benchmark objects failed: {e}")
+            print("Make sure LocalStack services are running with: docker-compose up")
+            return 1
+        print(f"📤 Uploaded {len(keys)} objects to s3://{args.bucket}/benchmark/")
+
+    # Pre-encoded events, each with --records consecutive keys
+    bodies = [
+        json.dumps(make_event(args.bucket, [keys[(start + i) % len(keys)] for i in range(args.records)])).encode('utf-8')
+        for start in range(0, len(keys), max(1, args.records))
+    ]
+
+    results = []
+    print(f"{'clients':>8} {'events':>8} {'errors':>7} {'events/s':>9} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8}")
+    for concurrency in args.concurrency:
+        result = run_benchmark(args.url, bodies, concurrency, args.duration)
+        result['records_per_event'] = args.records
+        results.append(result)
+        print(f"{result['concurrency']:>8} {result['events']:>8} {result['errors']:>7} "
+              f"{result['events_per_second']:>9} {result['p50_ms']:>8} {result['p90_ms']:>8} {result['p99_ms']:>8}")
+        if result['sample_error']:
+            print(f"   ⚠️ e.g. {result['sample_error']}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults: {args.output}")
+
+    return 1 if any(result['errors'] for result in results) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,44 +3,83 @@ import os
 import json
 import time
 import threading
-from http.server import HTTPServer, BaseHTTPRequestHandler
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from urllib.parse import urlparse, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from botocore.config import Config
 from botocore.exceptions import ClientError
 
-def lambda_handler(event, context=None):
-    """AWS Lambda handler for S3 events"""
-    print(f"Received event: {json.dumps(event, indent=2)}")
-    
-    s3_client = boto3.client(
+# head_object calls in flight per event, and HTTP connections kept to S3
+HEAD_CONCURRENCY = int(os.getenv('HEAD_CONCURRENCY', 16))
+S3_MAX_POOL_CONNECTIONS = int(os.getenv('S3_MAX_POOL_CONNECTIONS', 50))
+
+# GET /files paging; S3 returns at most 1000 keys per list call
+FILES_DEFAULT_LIMIT = int(os.getenv('FILES_DEFAULT_LIMIT', 100))
+FILES_MAX_LIMIT = 1000
+FILES_CACHE_SECONDS = float(os.getenv('FILES_CACHE_SECONDS', 5))  # 0 disables the page cache
+TOTALS_CACHE_SECONDS = float(os.getenv('TOTALS_CACHE_SECONDS', 60))
+CACHE_MAX_ENTRIES = 256
+
+print_lock = threading.Lock()
+head_executor = ThreadPoolExecutor(max_workers=HEAD_CONCURRENCY, thread_name_prefix='head-object')
+
+@lru_cache(maxsize=None)
+def get_s3_client():
+    """S3 client shared by every invocation (built once, like a warm Lambda container)
+
+    boto3 clients are thread-safe; building one costs tens of milliseconds, so
+    creating it per event dominated the handler's time.
+    """
+    return boto3.client(
         's3',
         endpoint_url=os.getenv('S3_ENDPOINT', 'http://localstack:4566'),
         aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID', 'test'),
         aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY', 'test'),
-        region_name=os.getenv('AWS_DEFAULT_REGION', 'us-east-1')
+        region_name=os.getenv('AWS_DEFAULT_REGION', 'us-east-1'),
+        config=Config(max_pool_connections=S3_MAX_POOL_CONNECTIONS)
     )
+
+def describe_record(record):
+    """Log lines for one S3 record, including the object's size from head_object"""
+    bucket_name = record['s3']['bucket']['name']
+    object_key = record['s3']['object']['key']
+    event_name = record['eventName']
+    
+    lines = [
+        f"🎯 S3 Event Triggered!",
+        f"   Event: {event_name}",
+        f"   Bucket: {bucket_name}",
+        f"   File: {object_key}"
+    ]
+    
+    # Get object details
+    try:
+        response = get_s3_client().head_object(Bucket=bucket_name, Key=object_key)
+        lines.append(f"   Size: {response['ContentLength']} bytes")
+        lines.append(f"   Modified: {response['LastModified']}")
+    except ClientError as e:
+        lines.append(f"   Error getting object details: {e}")
+    
+    lines.append("-" * 50)
+    return "\n".join(lines)
+
+def lambda_handler(event, context=None):
+    """AWS Lambda handler for S3 events"""
+    print(f"Received event: {json.dumps(event, indent=2)}")
     
     try:
         if 'Records' in event:
-            for record in event['Records']:
-                bucket_name = record['s3']['bucket']['name']
-                object_key = record['s3']['object']['key']
-                event_name = record['eventName']
-                
-                print(f"🎯 S3 Event Triggered!")
-                print(f"   Event: {event_name}")
-                print(f"   Bucket: {bucket_name}")
-                print(f"   File: {object_key}")
-                
-                # Get object details
-                try:
-                    response = s3_client.head_object(Bucket=bucket_name, Key=object_key)
-                    size = response['ContentLength']
-                    modified = response['LastModified']
-                    print(f"   Size: {size} bytes")
-                    print(f"   Modified: {modified}")
-                except ClientError as e:
-                    print(f"   Error getting object details: {e}")
-                
-                print("-" * 50)
+            records = event['Records']
+            # head_object for every record at once; map keeps the log in record order
+            if len(records) > 1:
+                blocks = head_executor.map(describe_record, records)
+            else:
+                blocks = map(describe_record, records)
+            for block in blocks:
+                # One print per record so concurrent events don't interleave lines
+                with print_lock:
+                    print(block)
         else:
             print("No S3 records found in event")
             
@@ -56,51 +95,147 @@ def lambda_handler(event, context=None):
         'body': json.dumps('Lambda function executed successfully')
     }
 
+class ListingCache:
+    """Small TTL cache for listing pages and totals, shared by the server threads"""
+    
+    def __init__(self, ttl, max_entries=CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries = {}  # key → (stored_at, value)
+        self.lock = threading.Lock()
+    
+    def peek(self, key):
+        """(age in seconds, value), or (None, None) when missing"""
+        with self.lock:
+            entry = self.entries.get(key)
+        if entry is None:
+            return None, None
+        return time.monotonic() - entry[0], entry[1]
+    
+    def get(self, key):
+        age, value = self.peek(key)
+        return value if age is not None and age < self.ttl else None
+    
+    def put(self, key, value):
+        with self.lock:
+            self.entries.pop(key, None)
+            if len(self.entries) >= self.max_entries:
+                # Drop the oldest entry (dicts keep insertion order)
+                self.entries.pop(next(iter(self.entries)))
+            self.entries[key] = (time.monotonic(), value)
+
+page_cache = ListingCache(FILES_CACHE_SECONDS)
+totals_cache = ListingCache(TOTALS_CACHE_SECONDS)
+totals_running = set()
+totals_lock = threading.Lock()
+totals_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='listing-totals')
+
+def list_files_page(bucket_name, prefix='', limit=FILES_DEFAULT_LIMIT, cursor=None):
+    """One page of the bucket listing; `cursor` is S3's ContinuationToken"""
+    key = (bucket_name, prefix, limit, cursor)
+    if FILES_CACHE_SECONDS > 0:
+        page = page_cache.get(key)
+        if page is not None:
+            return page
+    
+    params = {'Bucket': bucket_name, 'Prefix': prefix, 'MaxKeys': limit}
+    if cursor:
+        params['ContinuationToken'] = cursor
+    response = get_s3_client().list_objects_v2(**params)
+    page = {
+        'files': [
+            {
+                'key': obj['Key'],
+                'size': obj['Size'],
+                'lastModified': obj['LastModified'].isoformat(),
+                'etag': obj['ETag']
+            }
+            for obj in response.get('Contents', [])
+        ],
+        'nextCursor': response.get('NextContinuationToken')
+    }
+    if FILES_CACHE_SECONDS > 0:
+        page_cache.put(key, page)
+    return page
+
+def count_objects(bucket_name, prefix):
+    """Page through the whole prefix, 1000 keys per call
+
+    Running totals are published while counting, unless complete totals from
+    an earlier count are there to show meanwhile.
+    """
+    key = (bucket_name, prefix)
+    totals = {'objects': 0, 'bytes': 0, 'complete': False}
+    try:
+        paginator = get_s3_client().get_paginator('list_objects_v2')
+        for response in paginator.paginate(Bucket=bucket_name, Prefix=prefix, PaginationConfig={'PageSize': 1000}):
+            for obj in response.get('Contents', []):
+                totals['objects'] += 1
+                totals['bytes'] += obj['Size']
+            _, previous = totals_cache.peek(key)
+            if previous is None or not previous['complete']:
+                totals_cache.put(key, dict(totals))
+        totals['complete'] = True
+        totals['countedAt'] = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+        totals_cache.put(key, totals)
+    except ClientError as e:
+        print(f"Error counting s3://{bucket_name}/{prefix}: {e}")
+    finally:
+        with totals_lock:
+            totals_running.discard(key)
+
+def get_totals(bucket_name, prefix):
+    """Object count and bytes under a prefix, counted in the background
+
+    Returns what is known now (None before the first page is counted) and
+    starts a count when there are no complete totals younger than
+    TOTALS_CACHE_SECONDS; a listing never waits for a full bucket scan.
+    """
+    key = (bucket_name, prefix)
+    age, totals = totals_cache.peek(key)
+    stale = totals is None or not totals['complete'] or age >= TOTALS_CACHE_SECONDS
+    if stale:
+        with totals_lock:
+            if key not in totals_running:
+                totals_running.add(key)
+                totals_executor.submit(count_objects, bucket_name, prefix)
+    return totals
+
 class LambdaHTTPHandler(BaseHTTPRequestHandler):
     """HTTP handler to simulate Lambda invocation"""
     
     def do_GET(self):
         """Handle GET requests to list S3 files"""
         try:
-            if self.path == '/files':
-                s3_client = boto3.client(
-                    's3',
-                    endpoint_url=os.getenv('S3_ENDPOINT', 'http://localstack:4566'),
-                    aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID', 'test'),
-                    aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY', 'test'),
-                    region_name=os.getenv('AWS_DEFAULT_REGION', 'us-east-1')
-                )
-                
+            url = urlparse(self.path)
+            if url.path == '/files':
                 bucket_name = os.getenv('S3_BUCKET', 'test-bucket')
+                query = parse_qs(url.query)
+                prefix = query.get('prefix', [''])[0]
+                cursor = query.get('cursor', [None])[0] or None
+                try:
+                    limit = int(query.get('limit', [FILES_DEFAULT_LIMIT])[0])
+                except ValueError:
+                    limit = 0
+                if not 1 <= limit <= FILES_MAX_LIMIT:
+                    self.send_json(400, {'error': f'limit must be between 1 and {FILES_MAX_LIMIT}'})
+                    return
                 
                 try:
-                    response = s3_client.list_objects_v2(Bucket=bucket_name)
-                    files = []
-                    
-                    if 'Contents' in response:
-                        for obj in response['Contents']:
-                            files.append({
-                                'key': obj['Key'],
-                                'size': obj['Size'],
-                                'lastModified': obj['LastModified'].isoformat(),
-                                'etag': obj['ETag']
-                            })
-                    
-                    self.send_response(200)
-                    self.send_header('Content-Type', 'application/json')
-                    self.send_header('Access-Control-Allow-Origin', '*')
-                    self.end_headers()
-                    self.wfile.write(json.dumps({
-                        'files': files,
-                        'bucket': bucket_name
-                    }).encode('utf-8'))
+                    page = list_files_page(bucket_name, prefix, limit, cursor)
+                    self.send_json(200, {
+                        'files': page['files'],
+                        'bucket': bucket_name,
+                        'prefix': prefix,
+                        'limit': limit,
+                        'nextCursor': page['nextCursor'],
+                        'total': get_totals(bucket_name, prefix)
+                    })
                     
                 except ClientError as e:
-                    self.send_response(404)
-                    self.send_header('Content-Type', 'application/json')
-                    self.send_header('Access-Control-Allow-Origin', '*')
-                    self.end_headers()
-                    self.wfile.write(json.dumps({'error': str(e)}).encode('utf-8'))
+                    # A missing bucket is a 404; anything else (e.g. a bad cursor) is the request's fault
+                    status = 404 if e.response.get('Error', {}).get('Code') == 'NoSuchBucket' else 400
+                    self.send_json(status, {'error': str(e)})
             else:
                 self.send_response(404)
                 self.end_headers()
@@ -136,6 +271,13 @@ class LambdaHTTPHandler(BaseHTTPRequestHandler):
             self.end_headers()
             self.wfile.write(json.dumps({'error': str(e)}).encode('utf-8'))
     
+    def send_json(self, status, payload):
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.end_headers()
+        self.wfile.write(json.dumps(payload).encode('utf-8'))
+    
     def do_OPTIONS(self):
         """Handle preflight CORS requests"""
         self.send_response(200)
@@ -153,13 +295,19 @@ def main():
     port = int(os.getenv('LAMBDA_PORT', 8080))
     print(f"🚀 Lambda function server starting on port {port}...")
     
-    server = HTTPServer(('0.0.0.0', port), LambdaHTTPHandler)
+    # Build the client before the first event arrives
+    get_s3_client()
+    
+    # A thread per request: one slow head_object no longer blocks other events
+    server = ThreadingHTTPServer(('0.0.0.0', port), LambdaHTTPHandler)
+    server.daemon_threads = True
     
     try:
         server.serve_forever()
     except KeyboardInterrupt:
         print("\nShutting down lambda function...")
         server.shutdown()
+        head_executor.shutdown(wait=False)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,134 @@
+"""
+Benchmark XML → JSON conversion: whole-tree vs streaming vs NDJSON.
+
+Generates synthetic PriceFull files of the given sizes and converts each one in a
+fresh process, reporting wall time and peak RSS. Also checks that the streaming
+JSON is byte-identical to the tree conversion.
+
+    python benchmark_xml_to_json.py --sizes 10 100 500
+"""
+
+import argparse
+import hashlib
+import multiprocessing
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+
+from utils import convert_xml_to_json, convert_xml_to_json_tree, convert_xml_to_ndjson
+
+ITEM_TEMPLATE = """    <Item>
+      <PriceUpdateDate>2025-08-06 05:10:00</PriceUpdateDate>
+      <ItemCode>{code}</ItemCode>
+      <ItemType>1</ItemType>
+      <ItemName>מוצר לדוגמה {index}</ItemName>
+      <ManufacturerName>יצרן {manufacturer}</ManufacturerName>
+      <ManufactureCountry>IL</ManufactureCountry>
+      <ManufacturerItemDescription>תיאור מוצר</ManufacturerItemDescription>
+      <UnitQty>גרם</UnitQty>
+      <Quantity>500.00</Quantity>
+      <bIsWeighted>0</bIsWeighted>
+      <UnitOfMeasure>100 גרם</UnitOfMeasure>
+      <QtyInPackage>0</QtyInPackage>
+      <ItemPrice>{price}</ItemPrice>
+      <UnitOfMeasurePrice>2.38</UnitOfMeasurePrice>
+      <AllowDiscount>1</AllowDiscount>
+      <ItemStatus>1</ItemStatus>
+      <ItemId>{index}</ItemId>
+    </Item>
+"""
+
+
+def generate_pricefull(path, size_mb):
+    """Write a PriceFull-shaped XML file of roughly size_mb megabytes"""
+    target = size_mb * 1024 * 1024
+    with open(path, "w", encoding="utf-8") as f:
+        f.write('<?xml version="1.0" encoding="utf-8"?>\n<Root>\n')
+        f.write("  <ChainId>7290873255550</ChainId>\n  <SubChainId>001</SubChainId>\n")
+        f.write("  <StoreId>0084</StoreId>\n  <BikoretNo>7</BikoretNo>\n")
+        f.write('  <Items Count="0">\n')
+        index = 0
+        while f.tell() < target:
+            f.write(ITEM_TEMPLATE.format(
+                code=7290000000000 + index,
+                index=index,
+                manufacturer=index % 300,
+                price=f"{(index % 5000) / 100 + 1:.2f}",
+            ))
+            index += 1
+        f.write("  </Items>\n</Root>\n")
+
+
+def _measure(method, xml_path, queue):
+    sys.stdout = open(os.devnull, "w")
+    started = time.perf_counter()
+    if method == "tree":
+        convert_xml_to_json_tree(xml_path, xml_path + ".tree.json")
+    elif method == "stream":
+        convert_xml_to_json(xml_path)
+    else:
+        convert_xml_to_ndjson(xml_path)
+    elapsed = time.perf_counter() - started
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak_mb = peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+    queue.put((elapsed, peak_mb))
+
+
+def measure(method, xml_path):
+    queue = multiprocessing.Queue()
+    process = multiprocessing.Process(target=_measure, args=(method, xml_path, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark XML → JSON conversion")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 500],
+                        help="Input sizes in MB")
+    parser.add_argument("--skip-tree", action="store_true",
+                        help="Skip the tree baseline (needs several GB for 500 MB)")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="xml-bench-")
+    print(f"{'size':>6} {'method':>8} {'seconds':>9} {'peak MB':>9}")
+    try:
+        for size_mb in args.sizes:
+            xml_path = os.path.join(work_dir, f"PriceFull-{size_mb}MB")
+            generate_pricefull(xml_path, size_mb)
+
+            methods = ["stream", "ndjson"]
+            if not args.skip_tree:
+                methods.insert(0, "tree")
+            for method in methods:
+                elapsed, peak_mb = measure(method, xml_path)
+                print(f"{size_mb:>4}MB {method:>8} {elapsed:>9.2f} {peak_mb:>9.0f}")
+
+            if not args.skip_tree:
+                same = file_digest(xml_path + ".json") == file_digest(
+                    xml_path + ".tree.json"
+                )
+                print(f"       streaming output identical to tree output: {same}")
+
+            for suffix in ("", ".json", ".tree.json", ".ndjson"):
+                if os.path.exists(xml_path + suffix):
+                    os.remove(xml_path + suffix)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
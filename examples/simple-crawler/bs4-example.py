@@ -1,11 +1,47 @@
+import argparse
 import os
 import requests
-from urllib.parse import urljoin
+from urllib.parse import urljoin, urlparse
 from bs4 import BeautifulSoup
-from utils import download_file_from_link, extract_and_delete_gz, convert_xml_to_json
+from utils import (
+    ContentStore,
+    DownloadManifest,
+    download_files,
+    download_records_to_ndjson,
+    print_download_summary,
+    summarize_downloads,
+)
+from utils.metrics import RunReport, write_run_report
+from utils.pipeline import extract_and_convert
 
 
-def crawl():
+def print_progress(total):
+    """on_complete callback printing [done/total] as downloads finish"""
+    done = {"count": 0}
+
+    def on_complete(result):
+        done["count"] += 1
+        if result["outcome"] == "failed":
+            state = f"failed ({result['error']})"
+        elif result["path"]:
+            state = "ok"
+        else:
+            state = result["outcome"].replace("_", " ")
+        print(f"[{done['count']}/{total}] {result['link']}: {state}")
+
+    return on_complete
+
+
+def crawl(
+    stream=False,
+    archive=True,
+    per_host_limit=4,
+    manifest_path=None,
+    output_format="json",
+    store_dir=None,
+    report_dir=None,
+    prometheus_path=None,
+):
     url = "https://prices.mega.co.il/"
     download_base_url = "https://prices.carrefour.co.il/" # this sometimes changes so if it failed take a look at the page and update the url
     headers = {"User-Agent": "Mozilla/5.0"}
@@ -21,21 +57,119 @@ def crawl():
     output_dir = "prices"
     os.makedirs(output_dir, exist_ok=True)
 
+    links = []
     for a_tag in price_tags:
         if a_tag and a_tag.has_attr("href"):
             href = a_tag["href"]
-            link = urljoin(download_base_url, href)
-            print(f"Downloading {link}...")
-            output_path = download_file_from_link(link, output_dir)
-            print(f"Output path: {output_path}")
-            if output_path:
-                print(f"Extracting {output_path}...")
-                output_path = extract_and_delete_gz(output_path)
-                if output_path:
-                    convert_xml_to_json(output_path)
+            links.append(urljoin(download_base_url, href))
         else:
             print("Download link not found.")
 
+    if stream:
+        for link in links:
+            # One pass: HTTP → gunzip → parse → NDJSON, no XML on disk
+            print(f"Streaming {link}...")
+            download_records_to_ndjson(link, output_dir, archive=archive)
+        return
+
+    # Download everything concurrently, then extract and convert one by one
+    print(f"Downloading {len(links)} files...")
+    manifest = DownloadManifest(manifest_path) if manifest_path else None
+    report = RunReport("bs4-example")
+    store = ContentStore(store_dir) if store_dir else None
+    try:
+        results = download_files(
+            links,
+            output_dir,
+            per_host_limit=per_host_limit,
+            on_complete=print_progress(len(links)),
+            manifest=manifest,
+            report=report,
+        )
+        print_download_summary(summarize_downloads(results))
+
+        # Only new or changed files come back with a path
+        for result in results:
+            output_path = result["path"]
+            if not output_path:
+                continue
+            # Same bytes as a file already stored: nothing new to convert
+            if not store or store.add_download(output_path):
+                output_path = extract_and_convert(
+                    output_path, output_format, report, urlparse(result["link"]).netloc
+                )
+            # Recorded only once processed, so a failed file is fetched again
+            if output_path and manifest:
+                manifest.record_processed(result)
+    finally:
+        if manifest:
+            manifest.close()
+        if store:
+            store.close()
+    write_run_report(report, report_dir, prometheus_path)
+
 
 if __name__ == "__main__":
-    crawl()
+    parser = argparse.ArgumentParser(description="Crawl price files with requests")
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="stream records straight to NDJSON instead of .gz → XML → JSON",
+    )
+    parser.add_argument(
+        "--no-archive",
+        action="store_true",
+        help="with --stream, don't keep the original .gz files",
+    )
+    parser.add_argument(
+        "--per-host",
+        type=int,
+        default=4,
+        help="concurrent downloads per host (default: 4)",
+    )
+    parser.add_argument(
+        "--format",
+        choices=["json", "parquet"],
+        default="json",
+        help="json: one .json per file; parquet: typed dataset in prices/dataset",
+    )
+    parser.add_argument(
+        "--manifest",
+        default=os.path.join("prices", "manifest.sqlite3"),
+        help="download manifest for conditional/resumable downloads",
+    )
+    parser.add_argument(
+        "--no-manifest",
+        action="store_true",
+        help="download everything unconditionally",
+    )
+    parser.add_argument(
+        "--store",
+        default=os.path.join("prices", "store"),
+        help="content-addressed store that keeps each distinct raw file once",
+    )
+    parser.add_argument(
+        "--no-store",
+        action="store_true",
+        help="don't store or deduplicate raw files",
+    )
+    parser.add_argument(
+        "--report-dir",
+        default=os.path.join("prices", "reports"),
+        help="where to write the JSON run report with per-stage timings",
+    )
+    parser.add_argument(
+        "--prometheus",
+        help="also write the run's metrics to this node_exporter textfile (.prom)",
+    )
+    args = parser.parse_args()
+    crawl(
+        stream=args.stream,
+        archive=not args.no_archive,
+        per_host_limit=args.per_host,
+        manifest_path=None if args.no_manifest else args.manifest,
+        output_format=args.format,
+        store_dir=None if args.no_store else args.store,
+        report_dir=args.report_dir,
+        prometheus_path=args.prometheus,
+    )
@@ -0,0 +1,106 @@
+"""
+Run the HTTP listing code against fixture_server.py and check what it yields.
+
+Starts the fixture server on a free port (once as recorded, once ignoring the
+listing parameters) and checks the branch/category filters, paging, max_pages and
+the ListingError raised when a page only repeats earlier links. Exits non-zero if
+any check fails.
+
+    python check_listing.py
+"""
+
+import os
+import sys
+import threading
+from http.server import ThreadingHTTPServer
+
+from fixture_server import FixtureHandler
+from utils.listing import ListingError, create_session, get_branches, iter_listing_pages
+
+failures = []
+
+
+def check(description, condition):
+    print(f"{'✅' if condition else '❌'} {description}")
+    if not condition:
+        failures.append(description)
+
+
+def start_server(ignore_params):
+    handler = type("Handler", (FixtureHandler,), {"ignore_params": ignore_params})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/"
+
+
+def crawl(session, url, branch, category, max_pages=5):
+    """{page number: file names} of one branch/category listing"""
+    return {
+        page: [os.path.basename(link) for link in links]
+        for page, links in iter_listing_pages(
+            session, url, url, branch, category, max_pages
+        )
+    }
+
+
+def check_recorded(url):
+    session = create_session()
+    try:
+        branches = get_branches(session, url)
+        check(
+            f"branches from the dropdown: {branches}",
+            list(branches) == ["0084", "0105"],
+        )
+
+        pages = crawl(session, url, "0084", "pricefull")
+        names = [name for page in pages.values() for name in page]
+        check(
+            f"pricefull 0084 follows the pagination bar: {pages}",
+            list(pages) == [1, 2],
+        )
+        check(
+            "pricefull 0084 keeps only PriceFull files of branch 0084",
+            names and all(n.startswith("PriceFull") and "-0084-" in n for n in names),
+        )
+        check("no link is yielded twice across pages", len(names) == len(set(names)))
+
+        pages = crawl(session, url, "0105", "promofull")
+        check(
+            f"promofull 0105 filters to one PromoFull file: {pages}",
+            pages == {1: ["PromoFull7290055700007-0105-202508060525.gz"]},
+        )
+
+        pages = crawl(session, url, "0084", "pricefull", max_pages=1)
+        check(f"max_pages=1 stops after page 1: {list(pages)}", list(pages) == [1])
+    finally:
+        session.close()
+
+
+def check_ignored(url):
+    session = create_session()
+    try:
+        crawl(session, url, "0084", "pricefull")
+    except ListingError as e:
+        check(f"a page repeating page 1 raises ListingError: {e}", True)
+    else:
+        check("a page repeating page 1 raises ListingError", False)
+    finally:
+        session.close()
+
+
+def main():
+    for ignore_params, run_checks in ((False, check_recorded), (True, check_ignored)):
+        server, url = start_server(ignore_params)
+        print(f"\nFixture server on {url} (ignore_params={ignore_params})")
+        try:
+            run_checks(url)
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    print(f"\n{len(failures)} check(s) failed" if failures else "\nAll checks passed")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Compare two run reports and show the stages that got slower or faster.
+
+    python compare_reports.py prices/reports/selenium-example-20250101-080000.json \
+        prices/reports/selenium-example-20250102-080000.json --threshold 0.2
+
+Exits with status 1 when a stage's p50 or p90 got slower by more than the
+threshold, so it can gate a change in CI.
+"""
+
+import argparse
+import json
+import sys
+
+from utils.metrics import compare_reports
+
+
+def load(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("old")
+    parser.add_argument("new")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.2,
+        help="relative change to report (default: 0.2 = 20%%)",
+    )
+    args = parser.parse_args()
+
+    old, new = load(args.old), load(args.new)
+    print(f"{old['name']}: {old['duration_seconds']}s → {new['duration_seconds']}s")
+    changes = compare_reports(old, new, args.threshold)
+    if not changes:
+        print(f"No stage changed by more than {args.threshold:.0%}")
+        return
+
+    for change in changes:
+        marker = "🐢" if change["change"] > 0 else "🚀"
+        print(
+            f"{marker} {change['stage']:<13} {change['portal']:<24} "
+            f"{change['file_type']:<10} {change['metric']}: "
+            f"{change['old']:.3f}s → {change['new']:.3f}s ({change['change']:+.0%})"
+        )
+    if any(change["change"] > 0 for change in changes):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
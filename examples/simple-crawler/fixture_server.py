@@ -0,0 +1,279 @@
+"""
+Local replay of the price site's listing pages, for running the crawlers offline.
+
+    python fixture_server.py record --url https://prices.mega.co.il/ --branch 0084
+    python fixture_server.py serve --port 8000
+    python fixture_server.py serve --ignore-params   # a site that renamed them
+    python selenium-example.py --url http://localhost:8000/ \
+        --download-base-url http://localhost:8000/ --no-manifest --no-store
+
+`record` first drives headless Chrome through the branch, category and page-2
+selections and saves the requests the page itself makes to
+fixtures/mega/listing_requests.json, warning if LISTING_PARAMS aren't among them.
+It then saves the site's start page and every listing page the HTTP crawl
+requests into fixtures/mega/. `serve` answers the same requests from those files.
+A `.gz` link that was not recorded is answered with a small generated price file,
+so downloads, extraction and conversion run end to end as well. With
+`--ignore-params` every listing request gets the start page, like a site that
+doesn't know LISTING_PARAMS. check_listing.py runs the listing code against both.
+"""
+
+import argparse
+import gzip
+import json
+import os
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import requests
+
+from utils.listing import LISTING_PARAMS
+from utils.store import parse_file_name
+
+FIXTURES_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "fixtures", "mega"
+)
+CATEGORIES = ["pricefull", "promofull"]
+
+PRICE_FILE_TEMPLATE = """<?xml version="1.0" encoding="utf-8"?>
+<!-- {file_name} -->
+<Root>
+  <ChainId>{chain_id}</ChainId>
+  <SubChainId>001</SubChainId>
+  <StoreId>{store_id}</StoreId>
+  <BikoretNo>7</BikoretNo>
+  <{container} Count="2">
+    <{record_tag}>
+      <ItemCode>7290000000001</ItemCode>
+      <ItemPrice>5.90</ItemPrice>
+      <PriceUpdateDate>2025-08-06 05:10:00</PriceUpdateDate>
+    </{record_tag}>
+    <{record_tag}>
+      <ItemCode>7290000000002</ItemCode>
+      <ItemPrice>12.50</ItemPrice>
+      <PriceUpdateDate>2025-08-06 05:10:00</PriceUpdateDate>
+    </{record_tag}>
+  </{container}>
+</Root>
+"""
+
+
+def page_file_name(category, branch, page):
+    return f"{category}-{branch}-{page}.html"
+
+
+def generated_price_file(file_name):
+    """Gzipped two-record PriceFull/PromoFull file named like the real ones"""
+    info = parse_file_name(file_name) or {"chain_id": "0", "store_id": "0"}
+    promo = file_name.lower().startswith("promo")
+    xml = PRICE_FILE_TEMPLATE.format(
+        file_name=file_name,
+        chain_id=info["chain_id"],
+        store_id=info["store_id"],
+        container="Promotions" if promo else "Items",
+        record_tag="Promotion" if promo else "Item",
+    )
+    return gzip.compress(xml.encode("utf-8"))
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    ignore_params = False
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        file_name = os.path.basename(url.path)
+
+        if file_name.endswith(".gz"):
+            path = os.path.join(FIXTURES_DIR, "files", file_name)
+            if os.path.exists(path):
+                with open(path, "rb") as f:
+                    body = f.read()
+            else:
+                body = generated_price_file(file_name)
+            return self.respond(200, body, "application/gzip")
+
+        path = os.path.join(FIXTURES_DIR, "index.html")
+        if LISTING_PARAMS["category"] in query and not self.ignore_params:
+            listing_path = os.path.join(
+                FIXTURES_DIR,
+                page_file_name(
+                    query[LISTING_PARAMS["category"]],
+                    query.get(LISTING_PARAMS["branch"], ""),
+                    query.get(LISTING_PARAMS["page"], "1"),
+                ),
+            )
+            if not os.path.exists(listing_path):
+                return self.respond(404, b"no such listing page", "text/plain")
+            path = listing_path
+        with open(path, "rb") as f:
+            self.respond(200, f.read(), "text/html; charset=utf-8")
+
+    def respond(self, status, body, content_type):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def page_requests(driver, host):
+    """Document/XHR/fetch requests to host in the performance log since last call"""
+    captured = []
+    for entry in driver.get_log("performance"):
+        message = json.loads(entry["message"])["message"]
+        if message["method"] != "Network.requestWillBeSent":
+            continue
+        request = message["params"]["request"]
+        request_url = urlparse(request["url"])
+        if request_url.netloc != host or message["params"].get("type") not in (
+            "Document",
+            "XHR",
+            "Fetch",
+        ):
+            continue
+        captured.append(
+            {
+                "method": request["method"],
+                "url": request["url"],
+                "query": parse_qs(request_url.query),
+                "post_data": request.get("postData"),
+            }
+        )
+    return captured
+
+
+def capture_listing_requests(url, branch, category, timeout=15):
+    """Requests the page makes when a branch, a category and page 2 are selected"""
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support.ui import Select
+
+    options = Options()
+    for argument in ("--headless", "--no-sandbox", "--disable-dev-shm-usage"):
+        options.add_argument(argument)
+    options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+    driver = webdriver.Chrome(options=options)
+    host = urlparse(url).netloc
+    captured = []
+
+    def wait_for_requests(step):
+        # A filter applied client-side makes no request; give up after timeout
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            requests_made = page_requests(driver, host)
+            if requests_made:
+                captured.extend(dict(request, step=step) for request in requests_made)
+                return
+            time.sleep(0.5)
+        print(f"No request to {host} after selecting the {step}")
+
+    try:
+        driver.get(url)
+        page_requests(driver, host)  # the start page itself
+        Select(driver.find_element(By.ID, "branch_filter")).select_by_value(branch)
+        wait_for_requests("branch")
+        Select(driver.find_element(By.ID, "cat_filter")).select_by_value(category)
+        wait_for_requests("category")
+        next_page = driver.find_elements(
+            By.CSS_SELECTOR, "button.paginationBtn[data-page='2']"
+        )
+        if next_page:
+            next_page[0].click()
+            wait_for_requests("page")
+    finally:
+        driver.quit()
+    return captured
+
+
+def check_listing_params(captured):
+    """Warn about LISTING_PARAMS names the page's own requests don't use"""
+    sent = {name for request in captured for name in request["query"]}
+    missing = [name for name in LISTING_PARAMS.values() if name not in sent]
+    if missing:
+        print(
+            f"⚠️ LISTING_PARAMS {missing} are not in the page's requests "
+            f"(sent: {sorted(sent)}); update utils/listing.py"
+        )
+    else:
+        print(f"✅ The page's requests use LISTING_PARAMS {LISTING_PARAMS}")
+
+
+def record(url, branch, pages, capture=True):
+    """Save the start page and the listing pages the HTTP crawl would request"""
+    os.makedirs(FIXTURES_DIR, exist_ok=True)
+    if capture:
+        captured = capture_listing_requests(url, branch, CATEGORIES[0])
+        path = os.path.join(FIXTURES_DIR, "listing_requests.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(captured, f, ensure_ascii=False, indent=2)
+        print(f"Recorded {len(captured)} listing request(s) → {path}")
+        check_listing_params(captured)
+
+    session = requests.Session()
+    session.headers["User-Agent"] = "Mozilla/5.0"
+
+    response = session.get(url, timeout=30)
+    response.raise_for_status()
+    with open(os.path.join(FIXTURES_DIR, "index.html"), "wb") as f:
+        f.write(response.content)
+    print(f"Recorded {url}")
+
+    for category in CATEGORIES:
+        for page in range(1, pages + 1):
+            params = {
+                LISTING_PARAMS["branch"]: branch,
+                LISTING_PARAMS["category"]: category,
+                LISTING_PARAMS["page"]: page,
+            }
+            response = session.get(url, params=params, timeout=30)
+            response.raise_for_status()
+            path = os.path.join(FIXTURES_DIR, page_file_name(category, branch, page))
+            with open(path, "wb") as f:
+                f.write(response.content)
+            print(f"Recorded {response.url} → {path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("command", choices=["record", "serve"])
+    parser.add_argument("--url", default="https://prices.mega.co.il/")
+    parser.add_argument("--branch", default="0084")
+    parser.add_argument("--pages", type=int, default=2)
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument(
+        "--no-capture",
+        action="store_true",
+        help="record without driving Chrome to capture the page's own requests",
+    )
+    parser.add_argument(
+        "--ignore-params",
+        action="store_true",
+        help="answer every listing request with the start page",
+    )
+    args = parser.parse_args()
+
+    if args.command == "record":
+        record(args.url, args.branch, args.pages, capture=not args.no_capture)
+        return
+
+    FixtureHandler.ignore_params = args.ignore_params
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), FixtureHandler)
+    print(f"Serving {FIXTURES_DIR} on http://127.0.0.1:{args.port}/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+"""
+Crawl every registered chain on a schedule, instead of cron entries per script.
+
+chains.json lists the chains, their portal, URLs and file types; each file type
+has an interval and a priority (Price/Promo deltas hourly, *Full daily). Jobs are
+persisted in prices/scheduler.sqlite3, so runs missed while the scheduler was
+down are caught up when it starts again.
+
+    python scheduler.py run --workers 4          # keep running
+    python scheduler.py run --once               # run everything due, then exit
+    python scheduler.py status
+"""
+
+import argparse
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from utils import ContentStore, DownloadLoop, DownloadManifest
+from utils.crawl import crawl_with_fallback
+from utils.jobqueue import JobQueue
+from utils.listing import RateLimiter
+from utils.metrics import RunReport
+from utils.registry import crawl_targets, load_registry
+
+MAX_ATTEMPTS = 3
+RETRY_DELAY = 300  # seconds before a failed job is tried again
+
+
+def run_job(chain, file_type, limiter, portal, options, max_pages, driver_count=2):
+    """Crawl one file type of one chain like selenium-example.py; returns stats
+
+    The listing is crawled over HTTP, and the branches it can't page are crawled
+    in the browser. Raises if a branch failed both ways, so the job is retried.
+    """
+    config = chain["file_types"][file_type]
+    category = {
+        "value": config["category"],
+        "name": file_type,
+        "record_tag": config.get("record_tag", "Item"),
+    }
+    results, failed = crawl_with_fallback(
+        chain["site_url"],
+        chain["download_base_url"],
+        chain.get("branches") or ["all"],
+        [category],
+        max_pages,
+        dict(
+            options,
+            per_host_limit=portal.get("per_host_downloads", 4),
+            portal=chain["portal"],
+        ),
+        driver_count=driver_count,
+        limiter=limiter,
+    )
+    stats = {
+        "branches": len({result["branch"] for result in results}),
+        "pages": sum(result["pages_processed"] for result in results),
+        "successful": sum(result["successful_downloads"] for result in results),
+        "failed": sum(result["failed_downloads"] for result in results),
+        "skipped": sum(result["skipped_downloads"] for result in results),
+    }
+    if failed:
+        branches = ", ".join(branch for branch, _ in failed)
+        raise RuntimeError(f"branch(es) {branches} not crawled ({stats})")
+    return stats
+
+
+def schedule_targets(registry):
+    """(chain_id, file_type, portal, priority, interval_seconds) for JobQueue"""
+    return [
+        (
+            chain["chain_id"],
+            file_type,
+            chain["portal"],
+            config.get("priority", 5),
+            config.get("interval_minutes", 1440) * 60,
+        )
+        for chain, file_type, config in crawl_targets(registry)
+    ]
+
+
+def run(
+    registry,
+    job_queue,
+    workers,
+    once,
+    tick,
+    max_pages,
+    options,
+    on_job_done=None,
+    driver_count=2,
+):
+    chains = {chain["chain_id"]: chain for chain in registry["chains"]}
+    portals = registry["portals"]
+    limiters = {
+        name: RateLimiter(portal.get("requests_per_second", 1))
+        for name, portal in portals.items()
+    }
+    targets = schedule_targets(registry)
+
+    recovered = job_queue.recover()
+    if recovered:
+        print(f"Re-queued {recovered} job(s) interrupted by the last shutdown")
+
+    running = {}  # future → job
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        while True:
+            job_queue.enqueue_due(targets)
+
+            # Fill free workers, most urgent job first, within each portal's limit
+            while len(running) < workers:
+                busy = [job["portal"] for job in running.values()]
+                available = [
+                    name
+                    for name, portal in portals.items()
+                    if busy.count(name) < portal.get("max_concurrent_jobs", 1)
+                ]
+                job = job_queue.claim(available)
+                if job is None:
+                    break
+                print(
+                    f"▶️ Job {job['id']}: {job['chain_id']} {job['file_type']} "
+                    f"(priority {job['priority']}, attempt {job['attempts']})"
+                )
+                future = executor.submit(
+                    run_job,
+                    chains[job["chain_id"]],
+                    job["file_type"],
+                    limiters[job["portal"]],
+                    portals[job["portal"]],
+                    options,
+                    max_pages,
+                    driver_count,
+                )
+                running[future] = job
+
+            if not running:
+                if once:
+                    break
+                next_due = job_queue.next_due_at() or time.time() + tick
+                time.sleep(min(tick, max(1, next_due - time.time())))
+                continue
+
+            done, _ = wait(running, timeout=tick, return_when=FIRST_COMPLETED)
+            for future in done:
+                job = running.pop(future)
+                try:
+                    stats = future.result()
+                except Exception as e:
+                    retry_at = (
+                        time.time() + RETRY_DELAY
+                        if job["attempts"] < MAX_ATTEMPTS
+                        else None
+                    )
+                    job_queue.fail(job["id"], str(e), retry_at)
+                    state = "retrying later" if retry_at else "giving up"
+                    print(f"❌ Job {job['id']} failed ({state}): {e}")
+                else:
+                    job_queue.finish(job["id"], json.dumps(stats))
+                    print(f"✅ Job {job['id']} done: {stats}")
+                if on_job_done:
+                    on_job_done(job)
+
+
+def print_status(job_queue):
+    status = job_queue.status()
+    print("Jobs:", ", ".join(f"{k}={v}" for k, v in status["counts"].items()) or "none")
+    print("\nNext runs:")
+    for schedule in status["schedules"]:
+        next_run = time.strftime(
+            "%Y-%m-%d %H:%M", time.localtime(schedule["next_run_at"])
+        )
+        print(f"  {schedule['chain_id']} {schedule['file_type']:<10} {next_run}")
+    print("\nRecent jobs:")
+    for job in status["recent"]:
+        print(
+            f"  #{job['id']} {job['chain_id']} {job['file_type']:<10} "
+            f"{job['status']:<8} attempts={job['attempts']} {job['result'] or ''}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("command", choices=["run", "status"], nargs="?", default="run")
+    parser.add_argument("--registry", default=None, help="chain registry (chains.json)")
+    parser.add_argument("--db", default=os.path.join("prices", "scheduler.sqlite3"))
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--once", action="store_true", help="exit when nothing is due")
+    parser.add_argument("--tick", type=int, default=30, help="seconds between checks")
+    parser.add_argument("--max-pages", type=int, default=2)
+    parser.add_argument(
+        "--drivers",
+        type=int,
+        default=2,
+        help="headless Chrome instances per job that falls back to the browser",
+    )
+    parser.add_argument("--format", choices=["json", "parquet"], default="json")
+    parser.add_argument(
+        "--manifest", default=os.path.join("prices", "manifest.sqlite3")
+    )
+    parser.add_argument("--store", default=os.path.join("prices", "store"))
+    parser.add_argument(
+        "--report", default=os.path.join("prices", "reports", "scheduler.json")
+    )
+    parser.add_argument("--prometheus", help="node_exporter textfile (.prom) to keep")
+    args = parser.parse_args()
+
+    job_queue = JobQueue(args.db)
+    if args.command == "status":
+        print_status(job_queue)
+        job_queue.close()
+        return
+
+    manifest = DownloadManifest(args.manifest)
+    store = ContentStore(args.store)
+    report = RunReport("scheduler")
+    # Every job downloads through one loop; a host's limit is its portal's
+    # per_host_downloads, however many jobs download from it
+    downloader = DownloadLoop()
+    options = {
+        "manifest": manifest,
+        "store": store,
+        "output_format": args.format,
+        "report": report,
+        "downloader": downloader,
+    }
+
+    def write_report(job):
+        # Stage percentiles accumulate over the scheduler's lifetime
+        report.count(f"jobs_{job['file_type']}")
+        report.write_json(args.report)
+        if args.prometheus:
+            report.write_prometheus(args.prometheus)
+
+    try:
+        run(
+            load_registry(args.registry),
+            job_queue,
+            args.workers,
+            args.once,
+            args.tick,
+            args.max_pages,
+            options,
+            on_job_done=write_report,
+            driver_count=args.drivers,
+        )
+    except KeyboardInterrupt:
+        print("Shutting down; running jobs will be re-queued on the next start")
+    finally:
+        report.print_summary()
+        downloader.close()
+        manifest.close()
+        store.close()
+        job_queue.close()
+
+
+if __name__ == "__main__":
+    main()
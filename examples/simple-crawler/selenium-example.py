@@ -1,326 +1,224 @@
+import argparse
 import os
 import time
-import platform
-from urllib.parse import urljoin
-from bs4 import BeautifulSoup
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.support.ui import Select
-from selenium.webdriver.common.by import By
-from selenium.common.exceptions import NoSuchElementException
-from webdriver_manager.chrome import ChromeDriverManager
 
 from utils import (
-    convert_xml_to_json,
-    download_file_from_link,
-    extract_and_delete_gz,
+    ContentStore,
+    DownloadLoop,
+    DownloadManifest,
+    print_download_summary,
+    summarize_downloads,
 )
+from utils.crawl import crawl_with_fallback
+from utils.metrics import RunReport, write_run_report
 
+SITE_URL = "https://prices.mega.co.il/"
+# this sometimes changes so if it failed take a look at the page and update the url
+DOWNLOAD_BASE_URL = "https://prices.carrefour.co.il/"
 
-def init_chrome_options():
-    chrome_options = Options()
+CATEGORIES = [
+    {"value": "pricefull", "name": "PriceFull", "record_tag": "Item"},
+    {"value": "promofull", "name": "PromoFull", "record_tag": "Promotion"},
+]
 
-    # Set up headless Chrome
-    chrome_options.add_argument("--headless")
-    chrome_options.add_argument("--disable-gpu")
-    chrome_options.add_argument("--no-sandbox")
-    chrome_options.add_argument("--window-size=1920,1080")
-    chrome_options.add_argument("--disable-dev-shm-usage")
 
-    return chrome_options
-
-
-def get_chromedriver_path():
-    """Get the correct chromedriver path for the current system"""
-    try:
-        # For macOS ARM64, we need to specify the architecture
-        if platform.system() == "Darwin" and platform.machine() == "arm64":
-            print("Detected macOS ARM64, using specific chromedriver...")
-            # Use a more specific approach for ARM64 Macs
-            from webdriver_manager.core.os_manager import ChromeType
-
-            driver_path = ChromeDriverManager(chrome_type=ChromeType.CHROMIUM).install()
-        else:
-            driver_path = ChromeDriverManager().install()
-
-        print(f"Chrome driver path: {driver_path}")
-        return driver_path
-    except Exception as e:
-        print(f"Error with webdriver-manager: {e}")
-        print("Falling back to system chromedriver...")
-        # Fallback to system chromedriver if available
-        return "chromedriver"
-
-
-def find_pagination_elements(driver):
-    """Find pagination elements to determine total pages"""
-    try:
-        # Look for pagination buttons with the specific format
-        pagination_buttons = driver.find_elements(
-            By.CSS_SELECTOR, "button.paginationBtn"
-        )
-
-        if pagination_buttons:
-            print(f"Found {len(pagination_buttons)} pagination buttons")
-            return pagination_buttons
-
-        # Fallback to other pagination selectors if the specific format isn't found
-        pagination_selectors = [
-            "nav[aria-label='pagination']",
-            ".pagination",
-            ".pager",
-            "[class*='pagination']",
-            "[class*='pager']",
-        ]
-
-        for selector in pagination_selectors:
-            try:
-                pagination = driver.find_element(By.CSS_SELECTOR, selector)
-                page_links = pagination.find_elements(By.TAG_NAME, "a")
-                if page_links:
-                    return page_links
-            except NoSuchElementException:
-                continue
+def print_final_summary(all_results, stream):
+    print(f"\n{'='*60}")
+    print("FINAL CRAWLING SUMMARY")
+    print(f"{'='*60}")
 
-        # If no pagination found, return None
-        return None
-    except Exception as e:
-        print(f"Error finding pagination: {e}")
-        return None
+    total_successful = sum(r["successful_downloads"] for r in all_results)
+    total_failed = sum(r["failed_downloads"] for r in all_results)
+    total_pages = sum(r["pages_processed"] for r in all_results)
 
+    branches = {}
+    for result in all_results:
+        branches.setdefault(result["branch"], []).append(result)
 
-def get_next_page_button(driver, current_page):
-    """Find the next page button based on the specific format"""
-    try:
-        # Look for the next page button with data-page attribute
-        next_page_num = current_page + 1
-        next_button = driver.find_element(
-            By.CSS_SELECTOR, f"button.paginationBtn[data-page='{next_page_num}']"
+    for branch_name, results in sorted(branches.items()):
+        # Categories of a branch may run in parallel: report wall-clock time
+        seconds = max(r["finished"] for r in results) - min(
+            r["started"] for r in results
         )
+        print(f"\n{branch_name}: crawled in {seconds:.1f}s")
+        for result in results:
+            print(
+                f"  {result['category']}: {result['successful_downloads']} successful, "
+                f"{result['failed_downloads']} failed, "
+                f"{result['pages_processed']} pages"
+            )
 
-        if next_button and next_button.is_enabled():
-            return next_button
-
-        # Alternative: look for button with onclick containing the next page number
-        all_pagination_buttons = driver.find_elements(
-            By.CSS_SELECTOR, "button.paginationBtn"
+    print(
+        f"\nTOTAL: {total_successful} successful, {total_failed} failed, "
+        f"{total_pages} pages processed"
+    )
+    print(f"Branches processed: {len(branches)}")
+    print(f"Categories processed: {len(all_results)}")
+    if not stream:
+        print_download_summary(
+            summarize_downloads([d for r in all_results for d in r["download_results"]])
         )
-        for button in all_pagination_buttons:
-            onclick_attr = button.get_attribute("onclick")
-            if onclick_attr and f"changePage({next_page_num})" in onclick_attr:
-                if button.is_enabled():
-                    return button
-
-        return None
-    except NoSuchElementException:
-        return None
-    except Exception as e:
-        print(f"Error finding next page button: {e}")
-        return None
-
-
-def get_download_links_from_page(driver, download_base_url):
-    """Extract download links from the current page"""
-    soup = BeautifulSoup(driver.page_source, "html.parser")
-    price_tags = soup.find_all("a", class_="downloadBtn")
-
-    download_links = []
-    for a_tag in price_tags:
-        if a_tag and a_tag.has_attr("href"):
-            href = a_tag["href"]
-            link = urljoin(download_base_url, href)
-            download_links.append(link)
 
-    return download_links
 
-
-def crawl_category(
-    driver, category_value, category_name, download_base_url, max_pages, branch_name
+def crawl(
+    stream=False,
+    archive=True,
+    per_host_limit=4,
+    manifest_path=None,
+    output_format="json",
+    store_dir=None,
+    mode="http",
+    url=SITE_URL,
+    download_base_url=DOWNLOAD_BASE_URL,
+    branch_values=("0084",),
+    driver_count=4,
+    report_dir=None,
+    prometheus_path=None,
 ):
-    """Crawl a specific category and return statistics"""
-    print(f"\n{'='*60}")
-    print(f"STARTING CRAWL FOR CATEGORY: {category_name}")
-    print(f"{'='*60}")
-
-    # Select category filter
-    print(f"Selecting category filter: {category_name}...")
-    try:
-        category_select = Select(driver.find_element("id", "cat_filter"))
-        category_select.select_by_value(category_value)
-        print(f"Selected category: {category_name}")
-
-        # Wait for page to update after category selection
-        print("Waiting for page to update after category selection...")
-        time.sleep(3)
-    except Exception as e:
-        print(f"Error selecting category filter: {e}")
-        print("Continuing without category filter...")
-
-    # Create output directory using branch name (keeping existing structure)
-    output_dir = os.path.join("prices", branch_name)
-    os.makedirs(output_dir, exist_ok=True)
-
-    total_successful = 0
-    total_failed = 0
-    page_num = 1
-
-    while page_num <= max_pages:
-        print(f"\n{'-'*40}")
-        print(f"Processing Page {page_num} - {category_name}")
-        print(f"{'-'*40}")
-
-        # Get download links from current page
-        download_links = get_download_links_from_page(driver, download_base_url)
-        print(f"Found {len(download_links)} download links on page {page_num}")
-
-        if not download_links:
-            print(f"No download links found on page {page_num}. Stopping.")
-            break
-
-        # Download files from current page using existing utils functions
-        for i, link in enumerate(download_links, 1):
-            print(f"[{i}/{len(download_links)}] Downloading {link}...")
-            output_path = download_file_from_link(link, output_dir)
-            print(f"Output path: {output_path}")
-
-            if output_path:
-                try:
-                    print(f"Extracting {output_path}...")
-                    output_path = extract_and_delete_gz(output_path)
-                    if output_path:
-                        convert_xml_to_json(output_path)
-                        total_successful += 1
-                        print(f"✅ Successfully processed: {output_path}")
-                except Exception as e:
-                    print(f"❌ Error processing {output_path}: {e}")
-                    total_failed += 1
-            else:
-                total_failed += 1
-                print(f"❌ Failed to download: {link}")
-
-        print(f"Page {page_num} summary: {len(download_links)} files processed")
-
-        # Try to navigate to next page
-        if page_num < max_pages:
-            try:
-                print(f"Looking for next page button (page {page_num + 1})...")
-                next_button = get_next_page_button(driver, page_num)
-
-                if next_button and next_button.is_enabled():
-                    print(
-                        f"Found next page button. Clicking to navigate to page {page_num + 1}..."
-                    )
-                    next_button.click()
-                    time.sleep(3)  # Wait for page to load
-                    page_num += 1
-                else:
-                    print("No next page button found or it's disabled. Stopping.")
-                    break
-
-            except Exception as e:
-                print(f"Error navigating to next page: {e}")
-                break
-        else:
-            print(f"Reached maximum page limit ({max_pages}). Stopping.")
-            break
-
-    print(f"\n{'-'*40}")
-    print(f"CATEGORY {category_name} COMPLETE")
-    print(f"{'-'*40}")
-    print(f"Total pages processed: {page_num}")
-    print(f"Total successful downloads: {total_successful}")
-    print(f"Total failed downloads: {total_failed}")
-    print(f"Output directory: {output_dir}")
-
-    return {
-        "category": category_name,
-        "pages_processed": page_num,
-        "successful_downloads": total_successful,
-        "failed_downloads": total_failed,
-        "output_dir": output_dir,
-    }
-
-
-def crawl():
-    url = "https://prices.mega.co.il/"
-    download_base_url = "https://prices.carrefour.co.il/"  # this sometimes changes so if it failed take a look at the page and update the url
     max_pages = 2
-
-    chrome_options = init_chrome_options()
-
-    # Automatically download and manage Chrome driver
-    print("Setting up Chrome driver...")
-    try:
-        chromedriver_path = get_chromedriver_path()
-        service = Service(chromedriver_path)
-        driver = webdriver.Chrome(service=service, options=chrome_options)
-    except Exception as e:
-        print(f"Failed to initialize Chrome driver: {e}")
-        print("Trying alternative approach...")
-        # Alternative approach without service
-        driver = webdriver.Chrome(options=chrome_options)
+    branch_values = list(branch_values)
+
+    manifest = DownloadManifest(manifest_path) if manifest_path else None
+    store = ContentStore(store_dir) if store_dir and not stream else None
+    report = RunReport("selenium-example")
+    # One download loop for the HTTP and browser crawls, so per_host_limit holds
+    # across every listing and driver
+    downloader = DownloadLoop(per_host_limit)
+    options = {
+        "stream": stream,
+        "archive": archive,
+        "per_host_limit": per_host_limit,
+        "manifest": manifest,
+        "output_format": output_format,
+        "store": store,
+        "report": report,
+        "downloader": downloader,
+    }
 
     try:
-        print(f"Navigating to {url}")
-        driver.get(url)
-
-        # Select branch with value "0084"
-        print("Selecting branch...")
-        select = Select(driver.find_element("id", "branch_filter"))
-        select.select_by_value("0084")
-        branch_name = select.first_selected_option.text.strip()
-        print(f"Selected branch: {branch_name}")
-
-        # Wait for page to update
-        print("Waiting for page to update...")
-        time.sleep(3)
-
-        # Define categories to crawl
-        categories = [
-            {"value": "pricefull", "name": "PriceFull"},
-            {"value": "promofull", "name": "PromoFull"},
-        ]
-
-        all_results = []
-
-        # Crawl each category
-        for category in categories:
-            result = crawl_category(
-                driver=driver,
-                category_value=category["value"],
-                category_name=category["name"],
-                download_base_url=download_base_url,
-                max_pages=max_pages,
-                branch_name=branch_name,
-            )
-            all_results.append(result)
-
-        # Print final summary
-        print(f"\n{'='*60}")
-        print(f"FINAL CRAWLING SUMMARY")
-        print(f"{'='*60}")
-
-        total_successful = sum(r["successful_downloads"] for r in all_results)
-        total_failed = sum(r["failed_downloads"] for r in all_results)
-        total_pages = sum(r["pages_processed"] for r in all_results)
-
-        for result in all_results:
-            print(
-                f"{result['category']}: {result['successful_downloads']} successful, {result['failed_downloads']} failed, {result['pages_processed']} pages"
-            )
-
-        print(
-            f"\nTOTAL: {total_successful} successful, {total_failed} failed, {total_pages} pages processed"
+        started = time.perf_counter()
+        all_results, failed = crawl_with_fallback(
+            url,
+            download_base_url,
+            branch_values,
+            CATEGORIES,
+            max_pages,
+            options,
+            mode=mode,
+            driver_count=driver_count,
         )
-        print(f"Categories processed: {len(all_results)}")
+        for branch, category in failed:
+            print(f"❌ Branch {branch} / {category['name']} was not crawled")
+
+        print_final_summary(all_results, stream)
+        print(f"Crawl took {time.perf_counter() - started:.1f}s")
+        write_run_report(report, report_dir, prometheus_path)
 
     except Exception as e:
         print(f"Error during crawling: {e}")
     finally:
-        driver.quit()
-        print("Chrome driver closed.")
+        downloader.close()
+        if manifest:
+            manifest.close()
+        if store:
+            store.close()
 
 
 if __name__ == "__main__":
-    crawl()
+    parser = argparse.ArgumentParser(description="Crawl price files with Selenium")
+    parser.add_argument(
+        "--mode",
+        choices=["http", "selenium"],
+        default="http",
+        help="http: request the listing endpoint directly, with headless Chrome only "
+        "for the branch/category listings it can't page; selenium: browser only",
+    )
+    parser.add_argument(
+        "--url",
+        default=SITE_URL,
+        help="site / listing endpoint",
+    )
+    parser.add_argument(
+        "--download-base-url",
+        default=DOWNLOAD_BASE_URL,
+        help="base URL that relative download links are joined to",
+    )
+    parser.add_argument(
+        "--branch",
+        nargs="+",
+        default=["0084"],
+        help="branch_filter values, or 'all' for every branch (default: 0084)",
+    )
+    parser.add_argument(
+        "--drivers",
+        type=int,
+        default=4,
+        help="headless Chrome instances crawling in parallel (default: 4)",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="stream records straight to NDJSON instead of .gz → XML → JSON",
+    )
+    parser.add_argument(
+        "--no-archive",
+        action="store_true",
+        help="with --stream, don't keep the original .gz files",
+    )
+    parser.add_argument(
+        "--per-host",
+        type=int,
+        default=4,
+        help="concurrent downloads per host (default: 4)",
+    )
+    parser.add_argument(
+        "--format",
+        choices=["json", "parquet"],
+        default="json",
+        help="json: one .json per file; parquet: typed dataset in prices/dataset",
+    )
+    parser.add_argument(
+        "--manifest",
+        default=os.path.join("prices", "manifest.sqlite3"),
+        help="download manifest for conditional/resumable downloads",
+    )
+    parser.add_argument(
+        "--no-manifest",
+        action="store_true",
+        help="download everything unconditionally",
+    )
+    parser.add_argument(
+        "--store",
+        default=os.path.join("prices", "store"),
+        help="content-addressed store that keeps each distinct raw file once",
+    )
+    parser.add_argument(
+        "--no-store",
+        action="store_true",
+        help="don't store or deduplicate raw files",
+    )
+    parser.add_argument(
+        "--report-dir",
+        default=os.path.join("prices", "reports"),
+        help="where to write the JSON run report with per-stage timings",
+    )
+    parser.add_argument(
+        "--prometheus",
+        help="also write the run's metrics to this node_exporter textfile (.prom)",
+    )
+    args = parser.parse_args()
+    crawl(
+        stream=args.stream,
+        archive=not args.no_archive,
+        per_host_limit=args.per_host,
+        manifest_path=None if args.no_manifest else args.manifest,
+        output_format=args.format,
+        store_dir=None if args.no_store else args.store,
+        mode=args.mode,
+        url=args.url,
+        download_base_url=args.download_base_url,
+        branch_values=args.branch,
+        driver_count=args.drivers,
+        report_dir=args.report_dir,
+        prometheus_path=args.prometheus,
+    )
@@ -3,8 +3,40 @@ import json
 import shutil
 import os
 import requests
+import tempfile
+import time
 import xml.etree.ElementTree as ET
 
+from .downloader import (
+    DownloadLoop,
+    download_files,
+    download_files_async,
+    print_download_summary,
+    summarize_downloads,
+)
+from .manifest import DownloadManifest
+from .records import elem_to_dict, iter_xml_records
+from .store import ContentStore
+
+__all__ = [
+    "ContentStore",
+    "DownloadLoop",
+    "DownloadManifest",
+    "convert_xml_to_json",
+    "convert_xml_to_json_tree",
+    "convert_xml_to_ndjson",
+    "download_file_from_link",
+    "download_files",
+    "download_files_async",
+    "download_records_to_ndjson",
+    "elem_to_dict",
+    "extract_and_delete_gz",
+    "iter_xml_records",
+    "print_download_summary",
+    "stream_records_from_link",
+    "summarize_downloads",
+]
+
 
 def extract_and_delete_gz(gz_path):
     if not gz_path.endswith(".gz"):
@@ -42,52 +74,413 @@ def download_file_from_link(link, output_dir):
         return None
 
 
-def convert_xml_to_json(xml_file_path: str):
+def convert_xml_to_json_tree(xml_file_path: str, json_file_path: str):
+    """Whole-tree conversion: simple, but holds the XML and the dict tree in memory"""
+    with open(xml_file_path, "r", encoding="utf-8") as f:
+        xml_data = f.read()
+
+    root = ET.fromstring(xml_data)
+    parsed_dict = elem_to_dict(root)
+
+    with open(json_file_path, "w", encoding="utf-8") as json_file:
+        json.dump(parsed_dict, json_file, ensure_ascii=False, indent=2)
+
+
+class _NonConsecutiveRepeat(Exception):
+    """A tag repeats after a different sibling; only the tree converter can group it"""
+
+
+def _indent(level):
+    return "  " * level
+
+
+def _json_value(value, level):
+    """json.dump(indent=2) rendering of `value` nested `level` levels deep"""
+    text = json.dumps(value, ensure_ascii=False, indent=2)
+    return text.replace("\n", "\n" + _indent(level))
+
+
+class _Spool:
+    """Text buffer kept in memory until it grows past max_size, then on disk"""
+
+    def __init__(self, max_size=1024 * 1024):
+        self.max_size = max_size
+        self.parts = []
+        self.size = 0
+        self.file = None
+
+    def write(self, text):
+        if self.file is not None:
+            self.file.write(text)
+            return
+        self.parts.append(text)
+        self.size += len(text)
+        if self.size > self.max_size:
+            self.file = tempfile.TemporaryFile(mode="w+", encoding="utf-8")
+            self.file.write("".join(self.parts))
+            self.parts = []
+
+    def chunks(self):
+        if self.file is None:
+            yield "".join(self.parts)
+            return
+        self.file.seek(0)
+        while True:
+            chunk = self.file.read(1024 * 1024)
+            if not chunk:
+                break
+            yield chunk
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+        self.parts = []
+
+
+def _copy_reindented(spool, target, extra_levels):
+    for chunk in spool.chunks():
+        # Strings are JSON-escaped, so every raw newline is a layout newline
+        if extra_levels:
+            chunk = chunk.replace("\n", "\n" + _indent(extra_levels))
+        target.write(chunk)
+
+
+class _Frame:
+    """A large element whose JSON value is streamed to `out` child by child.
+
+    Siblings with the same tag become a list, which is only known once the next
+    sibling starts. The first element of each tag group is therefore written to a
+    spool and copied to `out` when the group ends, re-indented if it turned out to
+    be the first item of a list.
+    """
+
+    def __init__(self, elem, level, out):
+        self.elem = elem
+        self.level = level
+        self.out = out
+        self.opened = False
+        self.keys_written = 0
+        self.seen_tags = set()
+        self.group_tag = None
+        self.group_count = 0
+        self.group_spool = None
+
+    def write_key(self, key):
+        separator = "\n" if self.keys_written == 0 else ",\n"
+        key_json = json.dumps(key, ensure_ascii=False)
+        self.out.write(f"{separator}{_indent(self.level + 1)}{key_json}: ")
+        self.keys_written += 1
+
+    def _begin_child(self, tag):
+        """Return the (stream, level) a child's value should be written to"""
+        if not self.opened:
+            self.out.write("{")
+            self.opened = True
+
+        if tag == self.group_tag:
+            self.group_count += 1
+            if self.group_count == 2:
+                self.write_key(tag)
+                self.out.write("[\n" + _indent(self.level + 2))
+                _copy_reindented(self.group_spool, self.out, 1)
+                self.group_spool.close()
+                self.group_spool = None
+            self.out.write(",\n" + _indent(self.level + 2))
+            return self.out, self.level + 2
+
+        self.flush_group()
+        if tag in self.seen_tags:
+            raise _NonConsecutiveRepeat(tag)
+        self.seen_tags.add(tag)
+        self.group_tag = tag
+        self.group_count = 1
+        self.group_spool = _Spool()
+        return self.group_spool, self.level + 1
+
+    def add_child(self, child):
+        """Write a finished (small) child subtree"""
+        out, level = self._begin_child(child.tag)
+        out.write(_json_value(elem_to_dict(child)[child.tag], level))
+
+    def start_child(self, child):
+        """Return the frame an open (large) child streams through"""
+        out, level = self._begin_child(child.tag)
+        return _Frame(child, level, out)
+
+    def flush_group(self):
+        if self.group_tag is None:
+            return
+        if self.group_count == 1:
+            self.write_key(self.group_tag)
+            _copy_reindented(self.group_spool, self.out, 0)
+            self.group_spool.close()
+            self.group_spool = None
+        else:
+            self.out.write("\n" + _indent(self.level + 1) + "]")
+        self.group_tag = None
+
+    def finish(self):
+        """Write the attributes, text and closing brace once the element has ended"""
+        self.flush_group()
+        for k, v in self.elem.attrib.items():
+            self.write_key("@" + k)
+            self.out.write(_json_value(v, self.level + 1))
+        text = self.elem.text.strip() if self.elem.text else ""
+        if text:
+            self.write_key("#text")
+            self.out.write(_json_value(text, self.level + 1))
+        self.out.write("\n" + _indent(self.level) + "}")
+
+    def close(self):
+        if self.group_spool is not None:
+            self.group_spool.close()
+
+
+def _position(parent, child):
+    for index, candidate in enumerate(parent):
+        if candidate is child:
+            return index
+    raise ValueError(f"<{child.tag}> is not a child of <{parent.tag}>")
+
+
+def _promote(stack, frames, ended, out):
+    """Switch every open element to streaming and write their finished children.
+
+    iterparse reports events in batches, so the tree may already hold siblings whose
+    events have not been handled yet: children are only finished up to the open
+    element on the stack, or up to the element that just ended.
+    """
+    for i, elem in enumerate(stack):
+        if frames[i] is not None:
+            continue
+        if i == 0:
+            tag_json = json.dumps(elem.tag, ensure_ascii=False)
+            out.write("{\n" + _indent(1) + tag_json + ": ")
+            frames[0] = _Frame(elem, 1, out)
+        else:
+            frames[i] = frames[i - 1].start_child(elem)
+
+        if i + 1 < len(stack):
+            finished = _position(elem, stack[i + 1])
+        else:
+            finished = _position(elem, ended) + 1
+        for child in elem[:finished]:
+            frames[i].add_child(child)
+        del elem[:finished]
+
+
+def _stream_xml_to_json(xml_file_path, out, threshold=256):
+    """Write the same JSON as convert_xml_to_json_tree without building the tree.
+
+    Elements are kept as small subtrees and converted whole when they end. Once an
+    element collects `threshold` children, it and its ancestors switch to streaming:
+    each further child is written and dropped as soon as it ends.
+    """
+    stack = []
+    frames = []
+    try:
+        for event, elem in ET.iterparse(xml_file_path, events=("start", "end")):
+            if event == "start":
+                stack.append(elem)
+                frames.append(None)
+                continue
+
+            stack.pop()
+            frame = frames.pop()
+            if frame is not None:
+                frame.finish()
+
+            if not stack:
+                if frame is None:
+                    json.dump(elem_to_dict(elem), out, ensure_ascii=False, indent=2)
+                else:
+                    out.write("\n}")
+                break
+
+            parent = stack[-1]
+            if frames[-1] is not None:
+                if frame is None:
+                    frames[-1].add_child(elem)
+                # Drop the finished subtree; earlier ones are gone, so it is first
+                parent.remove(elem)
+            elif len(parent) >= threshold:
+                _promote(stack, frames, elem, out)
+    finally:
+        for frame in frames:
+            if frame is not None:
+                frame.close()
+
+
+class _TimedWriter:
+    """Text file wrapper adding up the time spent in write()"""
+
+    def __init__(self, f):
+        self.f = f
+        self.seconds = 0.0
+        self.chars = 0
+
+    def write(self, text):
+        started = time.perf_counter()
+        self.f.write(text)
+        self.seconds += time.perf_counter() - started
+        self.chars += len(text)
+
+
+def convert_xml_to_json(xml_file_path: str, timings: dict = None):
     """
     Converts an XML file (even if extensionless) to a JSON file.
     Skips conversion if the JSON file already exists.
+    Streams with iterparse, so memory stays flat regardless of file size.
+    With a timings dict, fills in "write" (seconds spent writing) and "total".
     """
     json_file_path = xml_file_path + ".json"
     if os.path.exists(json_file_path):
         print(f"✅ JSON already exists: {json_file_path}")
         return json_file_path
 
-    # Step 1: Read XML
-    with open(xml_file_path, "r", encoding="utf-8") as f:
-        xml_data = f.read()
+    # Write next to the target and rename, so a failed run never leaves partial JSON
+    tmp_path = json_file_path + ".tmp"
+    started = time.perf_counter()
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as json_file:
+            out = _TimedWriter(json_file) if timings is not None else json_file
+            _stream_xml_to_json(xml_file_path, out)
+            if timings is not None:
+                timings["write"] = out.seconds
+    except _NonConsecutiveRepeat as e:
+        print(f"Tag <{e}> repeats non-consecutively, falling back to tree conversion")
+        convert_xml_to_json_tree(xml_file_path, tmp_path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    os.replace(tmp_path, json_file_path)
+    if timings is not None:
+        timings["total"] = time.perf_counter() - started
+
+    print(f"✅ Converted to JSON: {json_file_path}")
+    return json_file_path
+
+
+class _TeeReader:
+    """Binary file-like wrapper that copies everything read through it to `sink`"""
+
+    def __init__(self, source, sink):
+        self.source = source
+        self.sink = sink
+
+    def read(self, size=-1):
+        data = self.source.read(size)
+        if data:
+            self.sink.write(data)
+        return data
 
-    # Step 2: Parse XML
-    root = ET.fromstring(xml_data)
 
-    # Step 3: Convert recursively
-    def elem_to_dict(elem):
-        result = {elem.tag: {} if elem.attrib else None}
-        children = list(elem)
-        if children:
-            dd = {}
-            for dc in map(elem_to_dict, children):
-                for k, v in dc.items():
-                    if k in dd:
-                        if not isinstance(dd[k], list):
-                            dd[k] = [dd[k]]
-                        dd[k].append(v)
-                    else:
-                        dd[k] = v
-            result = {elem.tag: dd}
-        if elem.attrib:
-            result[elem.tag].update(("@" + k, v) for k, v in elem.attrib.items())
-        if elem.text and elem.text.strip():
-            text = elem.text.strip()
-            if children or elem.attrib:
-                result[elem.tag]["#text"] = text
+def stream_records_from_link(
+    link, record_tag: str = "Item", archive_dir: str = None, header: dict = None
+):
+    """
+    Yields the <record_tag> records of a (gzipped) price file straight from the HTTP
+    response: download → gunzip → iterparse, with no intermediate files.
+    If `archive_dir` is given, the original .gz is also saved there as it streams.
+    """
+    response = requests.get(link, stream=True, timeout=60)
+    if response.status_code != 200:
+        print(f"Failed to download. Status code: {response.status_code}")
+        response.close()
+        return
+
+    # Only undo HTTP Content-Encoding here; the .gz payload is decompressed below
+    response.raw.decode_content = True
+    source = response.raw
+    archive_path = None
+    archive = None
+    completed = False
+    try:
+        if archive_dir:
+            archive_path = os.path.join(archive_dir, os.path.basename(link))
+            archive = open(archive_path + ".tmp", "wb")
+            source = _TeeReader(source, archive)
+        stream = gzip.GzipFile(fileobj=source) if link.endswith(".gz") else source
+
+        yield from iter_xml_records(stream, record_tag, header)
+
+        if archive is not None:
+            # Make sure the archived copy includes the gzip trailer
+            while source.read(1024 * 1024):
+                pass
+        completed = True
+    finally:
+        response.close()
+        if archive is not None:
+            archive.close()
+            if completed:
+                os.replace(archive_path + ".tmp", archive_path)
+                print(f"Archived to {archive_path}")
             else:
-                result[elem.tag] = text
-        return result
+                os.remove(archive_path + ".tmp")
 
-    parsed_dict = elem_to_dict(root)
 
-    # Step 4: Save to JSON
-    with open(json_file_path, "w", encoding="utf-8") as json_file:
-        json.dump(parsed_dict, json_file, ensure_ascii=False, indent=2)
+def download_records_to_ndjson(
+    link, output_dir, record_tag: str = "Item", archive: bool = True
+):
+    """
+    Single-pass replacement for download → extract → convert: streams the records
+    of `link` into <output_dir>/<name>.ndjson (the name convert_xml_to_ndjson
+    would give), optionally keeping the original .gz next to it.
+    """
+    filename = os.path.basename(link)
+    if filename.endswith(".gz"):
+        filename = filename[:-3]
+    ndjson_file_path = os.path.join(output_dir, filename + ".ndjson")
+    tmp_path = ndjson_file_path + ".tmp"
 
-    print(f"✅ Converted to JSON: {json_file_path}")
+    count = 0
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as ndjson_file:
+            records = stream_records_from_link(
+                link, record_tag, archive_dir=output_dir if archive else None
+            )
+            for record in records:
+                ndjson_file.write(json.dumps(record, ensure_ascii=False) + "\n")
+                count += 1
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    if count == 0:
+        os.remove(tmp_path)
+        print(f"No <{record_tag}> records streamed from {link}")
+        return None
+    os.replace(tmp_path, ndjson_file_path)
+
+    print(f"✅ Streamed {count} <{record_tag}> records to NDJSON: {ndjson_file_path}")
+    return ndjson_file_path
+
+
+def convert_xml_to_ndjson(xml_file_path: str, record_tag: str = "Item"):
+    """
+    Converts an XML file to NDJSON: one <record_tag> object per line.
+    Skips conversion if the NDJSON file already exists.
+    """
+    ndjson_file_path = xml_file_path + ".ndjson"
+    if os.path.exists(ndjson_file_path):
+        print(f"✅ NDJSON already exists: {ndjson_file_path}")
+        return ndjson_file_path
+
+    tmp_path = ndjson_file_path + ".tmp"
+    count = 0
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as ndjson_file:
+            for record in iter_xml_records(xml_file_path, record_tag):
+                ndjson_file.write(json.dumps(record, ensure_ascii=False) + "\n")
+                count += 1
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    os.replace(tmp_path, ndjson_file_path)
+
+    print(f"✅ Converted {count} <{record_tag}> records to NDJSON: {ndjson_file_path}")
+    return ndjson_file_path
@@ -0,0 +1,674 @@
+"""
+The crawl flows of the price site: headless Chrome, the listing endpoint over
+HTTP, and the HTTP crawl with a browser fallback that selenium-example.py and
+scheduler.py share.
+"""
+
+import os
+import platform
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from urllib.parse import urljoin
+
+import requests
+from bs4 import BeautifulSoup
+from selenium import webdriver
+from selenium.common.exceptions import (
+    NoSuchElementException,
+    TimeoutException,
+    WebDriverException,
+)
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.chrome.service import Service
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import Select, WebDriverWait
+from webdriver_manager.chrome import ChromeDriverManager
+
+from .downloader import DownloadLoop
+from .listing import ListingError, create_session, get_branches, iter_listing_pages
+from .pipeline import process_links
+
+# Explicit waits replace the fixed sleeps after every selection and page click
+WAIT_TIMEOUT = 15
+PAGINATION_BUTTONS = (By.CSS_SELECTOR, "button.paginationBtn")
+DOWNLOAD_BUTTONS = (By.CSS_SELECTOR, "a.downloadBtn")
+
+
+def init_chrome_options():
+    chrome_options = Options()
+
+    # Set up headless Chrome
+    chrome_options.add_argument("--headless")
+    chrome_options.add_argument("--disable-gpu")
+    chrome_options.add_argument("--no-sandbox")
+    chrome_options.add_argument("--window-size=1920,1080")
+    chrome_options.add_argument("--disable-dev-shm-usage")
+
+    return chrome_options
+
+
+def get_chromedriver_path():
+    """Get the correct chromedriver path for the current system"""
+    try:
+        # For macOS ARM64, we need to specify the architecture
+        if platform.system() == "Darwin" and platform.machine() == "arm64":
+            print("Detected macOS ARM64, using specific chromedriver...")
+            # Use a more specific approach for ARM64 Macs
+            from webdriver_manager.core.os_manager import ChromeType
+
+            driver_path = ChromeDriverManager(chrome_type=ChromeType.CHROMIUM).install()
+        else:
+            driver_path = ChromeDriverManager().install()
+
+        print(f"Chrome driver path: {driver_path}")
+        return driver_path
+    except Exception as e:
+        print(f"Error with webdriver-manager: {e}")
+        print("Falling back to system chromedriver...")
+        # Fallback to system chromedriver if available
+        return "chromedriver"
+
+
+def find_pagination_elements(driver):
+    """Find pagination elements to determine total pages"""
+    try:
+        # Look for pagination buttons with the specific format
+        pagination_buttons = driver.find_elements(
+            By.CSS_SELECTOR, "button.paginationBtn"
+        )
+
+        if pagination_buttons:
+            print(f"Found {len(pagination_buttons)} pagination buttons")
+            return pagination_buttons
+
+        # Fallback to other pagination selectors if the specific format isn't found
+        pagination_selectors = [
+            "nav[aria-label='pagination']",
+            ".pagination",
+            ".pager",
+            "[class*='pagination']",
+            "[class*='pager']",
+        ]
+
+        for selector in pagination_selectors:
+            try:
+                pagination = driver.find_element(By.CSS_SELECTOR, selector)
+                page_links = pagination.find_elements(By.TAG_NAME, "a")
+                if page_links:
+                    return page_links
+            except NoSuchElementException:
+                continue
+
+        # If no pagination found, return None
+        return None
+    except Exception as e:
+        print(f"Error finding pagination: {e}")
+        return None
+
+
+def get_next_page_button(driver, current_page):
+    """Find the next page button based on the specific format"""
+    try:
+        # Look for the next page button with data-page attribute
+        next_page_num = current_page + 1
+        next_button = driver.find_element(
+            By.CSS_SELECTOR, f"button.paginationBtn[data-page='{next_page_num}']"
+        )
+
+        if next_button and next_button.is_enabled():
+            return next_button
+
+        # Alternative: look for button with onclick containing the next page number
+        all_pagination_buttons = driver.find_elements(
+            By.CSS_SELECTOR, "button.paginationBtn"
+        )
+        for button in all_pagination_buttons:
+            onclick_attr = button.get_attribute("onclick")
+            if onclick_attr and f"changePage({next_page_num})" in onclick_attr:
+                if button.is_enabled():
+                    return button
+
+        return None
+    except NoSuchElementException:
+        return None
+    except Exception as e:
+        print(f"Error finding next page button: {e}")
+        return None
+
+
+def get_download_links_from_page(driver, download_base_url):
+    """Extract download links from the current page"""
+    soup = BeautifulSoup(driver.page_source, "html.parser")
+    price_tags = soup.find_all("a", class_="downloadBtn")
+
+    download_links = []
+    for a_tag in price_tags:
+        if a_tag and a_tag.has_attr("href"):
+            href = a_tag["href"]
+            link = urljoin(download_base_url, href)
+            download_links.append(link)
+
+    return download_links
+
+
+def category_result(category_name, pages_processed, output_dir, page_stats):
+    """Sum per-page statistics into the result dict of one category"""
+    result = {
+        "category": category_name,
+        "pages_processed": pages_processed,
+        "successful_downloads": sum(s["successful"] for s in page_stats),
+        "failed_downloads": sum(s["failed"] for s in page_stats),
+        "skipped_downloads": sum(s["skipped"] for s in page_stats),
+        "download_results": [d for s in page_stats for d in s["download_results"]],
+        "output_dir": output_dir,
+    }
+
+    print(f"\n{'-'*40}")
+    print(f"CATEGORY {category_name} COMPLETE")
+    print(f"{'-'*40}")
+    print(f"Total pages processed: {pages_processed}")
+    print(f"Total successful downloads: {result['successful_downloads']}")
+    print(f"Total failed downloads: {result['failed_downloads']}")
+    print(f"Total skipped (unchanged): {result['skipped_downloads']}")
+    print(f"Output directory: {output_dir}")
+    return result
+
+
+def create_driver(chromedriver_path):
+    """One headless Chrome; falls back to Selenium's own driver lookup"""
+    chrome_options = init_chrome_options()
+    try:
+        service = Service(chromedriver_path)
+        return webdriver.Chrome(service=service, options=chrome_options)
+    except Exception as e:
+        print(f"Failed to initialize Chrome driver: {e}")
+        print("Trying alternative approach...")
+        # Alternative approach without service
+        return webdriver.Chrome(options=chrome_options)
+
+
+class DriverPool:
+    """Up to `size` headless Chrome instances, started on demand and reused.
+
+    A crawl task borrows a driver with `with pool.driver() as driver:`; a driver
+    that raised a WebDriverException is quit and replaced on the next borrow.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.idle = []
+        self.created = 0
+        # Signalled whenever a driver is returned or a slot frees up
+        self.available = threading.Condition()
+        self.drivers = []
+        self.chromedriver_path = None
+
+    def _acquire(self):
+        with self.available:
+            while not self.idle and self.created >= self.size:
+                self.available.wait()
+            if self.idle:
+                return self.idle.pop()
+            self.created += 1
+            if self.chromedriver_path is None:
+                # Automatically download and manage Chrome driver (once)
+                print("Setting up Chrome driver...")
+                self.chromedriver_path = get_chromedriver_path()
+        try:
+            driver = create_driver(self.chromedriver_path)
+        except Exception:
+            with self.available:
+                self.created -= 1
+                self.available.notify()
+            raise
+        with self.available:
+            self.drivers.append(driver)
+        print(f"Started Chrome driver {len(self.drivers)}/{self.size}")
+        return driver
+
+    def _release(self, driver):
+        with self.available:
+            self.idle.append(driver)
+            self.available.notify()
+
+    @contextmanager
+    def driver(self):
+        driver = self._acquire()
+        try:
+            yield driver
+        except WebDriverException:
+            self._discard(driver)
+            raise
+        except BaseException:
+            self._release(driver)
+            raise
+        else:
+            self._release(driver)
+
+    def _discard(self, driver):
+        # The freed slot lets a waiting task start a replacement
+        with self.available:
+            self.created -= 1
+            if driver in self.drivers:
+                self.drivers.remove(driver)
+            self.available.notify()
+        try:
+            driver.quit()
+        except Exception:
+            pass
+
+    def close(self):
+        with self.available:
+            drivers, self.drivers = self.drivers, []
+            self.idle = []
+            self.created = 0
+        for driver in drivers:
+            try:
+                driver.quit()
+            except Exception:
+                pass
+        print(f"Closed {len(drivers)} Chrome driver(s).")
+
+
+def listing_anchor(driver):
+    """An element that the page replaces whenever the listing is re-rendered"""
+    for locator in (PAGINATION_BUTTONS, DOWNLOAD_BUTTONS):
+        elements = driver.find_elements(*locator)
+        if elements:
+            return elements[0]
+    return None
+
+
+def wait_for_listing(driver, anchor=None, timeout=WAIT_TIMEOUT):
+    """Wait until the listing has re-rendered, instead of sleeping a fixed time.
+
+    With an anchor from before the action, first wait for it to go stale; then
+    wait for the pagination buttons (or, on a one-page listing, the links).
+    """
+    wait = WebDriverWait(driver, timeout)
+    if anchor is not None:
+        try:
+            wait.until(EC.staleness_of(anchor))
+        except TimeoutException:
+            print(f"Listing did not re-render within {timeout}s, reading it as is")
+    try:
+        wait.until(
+            EC.any_of(
+                EC.presence_of_element_located(PAGINATION_BUTTONS),
+                EC.presence_of_element_located(DOWNLOAD_BUTTONS),
+            )
+        )
+    except TimeoutException:
+        print(f"No pagination buttons or download links after {timeout}s")
+
+
+def wait_for_page(driver, page_num, anchor=None, timeout=WAIT_TIMEOUT):
+    """After clicking page `page_num`: wait for its button to become active
+    (or the old listing to go stale), then for the pagination to be back"""
+    active = (
+        By.CSS_SELECTOR,
+        f"button.paginationBtn.active[data-page='{page_num}'], "
+        f"button.paginationBtn[data-page='{page_num}'][aria-current]",
+    )
+    conditions = [EC.presence_of_element_located(active)]
+    if anchor is not None:
+        conditions.append(EC.staleness_of(anchor))
+    try:
+        WebDriverWait(driver, timeout).until(EC.any_of(*conditions))
+    except TimeoutException:
+        print(f"Page {page_num} did not load within {timeout}s, reading it as is")
+    wait_for_listing(driver, timeout=timeout)
+
+
+def open_branch(driver, url, branch_value):
+    """Load the site and select a branch; returns the branch's display name"""
+    print(f"Navigating to {url}")
+    driver.get(url)
+    WebDriverWait(driver, WAIT_TIMEOUT).until(
+        EC.presence_of_element_located((By.ID, "branch_filter"))
+    )
+
+    print(f"Selecting branch {branch_value}...")
+    anchor = listing_anchor(driver)
+    select = Select(driver.find_element("id", "branch_filter"))
+    select.select_by_value(branch_value)
+    branch_name = select.first_selected_option.text.strip()
+    print(f"Selected branch: {branch_name}")
+
+    # Wait for page to update
+    wait_for_listing(driver, anchor)
+    return branch_name
+
+
+def get_branch_values(driver, url):
+    """Every non-empty option of the branch_filter dropdown"""
+    driver.get(url)
+    WebDriverWait(driver, WAIT_TIMEOUT).until(
+        EC.presence_of_element_located((By.ID, "branch_filter"))
+    )
+    select = Select(driver.find_element("id", "branch_filter"))
+    return [
+        option.get_attribute("value")
+        for option in select.options
+        if option.get_attribute("value")
+    ]
+
+
+def crawl_category(
+    driver,
+    category_value,
+    category_name,
+    download_base_url,
+    max_pages,
+    branch_name,
+    **options,
+):
+    """Crawl a specific category and return statistics"""
+    print(f"\n{'='*60}")
+    print(f"STARTING CRAWL FOR CATEGORY: {category_name} ({branch_name})")
+    print(f"{'='*60}")
+
+    # Select category filter
+    print(f"Selecting category filter: {category_name}...")
+    try:
+        anchor = listing_anchor(driver)
+        category_select = Select(driver.find_element("id", "cat_filter"))
+        category_select.select_by_value(category_value)
+        print(f"Selected category: {category_name}")
+
+        # Wait for page to update after category selection
+        print("Waiting for page to update after category selection...")
+        wait_for_listing(driver, anchor)
+    except NoSuchElementException as e:
+        print(f"Error selecting category filter: {e}")
+        print("Continuing without category filter...")
+
+    # Create output directory using branch name (keeping existing structure)
+    output_dir = os.path.join("prices", branch_name)
+    os.makedirs(output_dir, exist_ok=True)
+
+    page_stats = []
+    page_num = 1
+
+    while page_num <= max_pages:
+        print(f"\n{'-'*40}")
+        print(f"Processing Page {page_num} - {category_name}")
+        print(f"{'-'*40}")
+
+        # Get download links from current page
+        download_links = get_download_links_from_page(driver, download_base_url)
+        print(f"Found {len(download_links)} download links on page {page_num}")
+
+        if not download_links:
+            print(f"No download links found on page {page_num}. Stopping.")
+            break
+
+        page_stats.append(process_links(download_links, output_dir, **options))
+
+        print(f"Page {page_num} summary: {len(download_links)} files processed")
+
+        # Try to navigate to next page
+        if page_num < max_pages:
+            try:
+                print(f"Looking for next page button (page {page_num + 1})...")
+                next_button = get_next_page_button(driver, page_num)
+
+                if next_button and next_button.is_enabled():
+                    print(
+                        "Found next page button. "
+                        f"Clicking to navigate to page {page_num + 1}..."
+                    )
+                    anchor = listing_anchor(driver)
+                    next_button.click()
+                    wait_for_page(driver, page_num + 1, anchor)
+                    page_num += 1
+                else:
+                    print("No next page button found or it's disabled. Stopping.")
+                    break
+
+            except Exception as e:
+                print(f"Error navigating to next page: {e}")
+                break
+        else:
+            print(f"Reached maximum page limit ({max_pages}). Stopping.")
+            break
+
+    return category_result(category_name, page_num, output_dir, page_stats)
+
+
+def crawl_category_http(
+    session,
+    listing_url,
+    category_value,
+    category_name,
+    download_base_url,
+    max_pages,
+    branch_value,
+    branch_name,
+    **options,
+):
+    """Same as crawl_category, but pages come from the listing endpoint, no browser"""
+    print(f"\n{'='*60}")
+    print(f"STARTING HTTP CRAWL FOR CATEGORY: {category_name}")
+    print(f"{'='*60}")
+
+    output_dir = os.path.join("prices", branch_name)
+    os.makedirs(output_dir, exist_ok=True)
+
+    page_stats = []
+    pages_processed = 0
+    for page_num, download_links in iter_listing_pages(
+        session,
+        listing_url,
+        download_base_url,
+        branch_value,
+        category_value,
+        max_pages,
+    ):
+        print(f"\n{'-'*40}")
+        print(f"Processing Page {page_num} - {category_name}")
+        print(f"{'-'*40}")
+        page_stats.append(process_links(download_links, output_dir, **options))
+        pages_processed = page_num
+        print(f"Page {page_num} summary: {len(download_links)} files processed")
+
+    return category_result(category_name, pages_processed, output_dir, page_stats)
+
+
+def crawl_branch_category(
+    pool, url, download_base_url, branch_value, category, max_pages, options
+):
+    """One (branch, category) task on a pooled driver; adds branch and timing"""
+    started = time.perf_counter()
+    with pool.driver() as driver:
+        branch_name = open_branch(driver, url, branch_value)
+        result = crawl_category(
+            driver=driver,
+            category_value=category["value"],
+            category_name=category["name"],
+            download_base_url=download_base_url,
+            max_pages=max_pages,
+            branch_name=branch_name,
+            record_tag=category["record_tag"],
+            **options,
+        )
+    result["branch"] = branch_name
+    result["started"] = started
+    result["finished"] = time.perf_counter()
+    return result
+
+
+def crawl_with_selenium(
+    url,
+    download_base_url,
+    branch_values,
+    categories,
+    max_pages,
+    options,
+    driver_count=4,
+    tasks=None,
+):
+    """The browser flow: every branch × category on a pool of reused drivers
+
+    With tasks, only those (branch value, category) pairs are crawled. Returns
+    (results, tasks that failed).
+    """
+    pool = DriverPool(driver_count)
+    # One download loop for all tasks, so per_host_limit holds across drivers
+    downloader = None
+    if not options.get("downloader"):
+        downloader = DownloadLoop(options.get("per_host_limit", 4))
+        options = dict(options, downloader=downloader)
+    try:
+        if tasks is None:
+            if branch_values == ["all"]:
+                with pool.driver() as driver:
+                    branch_values = get_branch_values(driver, url)
+                print(f"Found {len(branch_values)} branches")
+            tasks = [
+                (branch, category)
+                for branch in branch_values
+                for category in categories
+            ]
+        print(
+            f"Crawling {len(tasks)} branch × category combinations "
+            f"with {driver_count} drivers"
+        )
+        all_results = []
+        failed = []
+        with ThreadPoolExecutor(max_workers=driver_count) as executor:
+            futures = {
+                executor.submit(
+                    crawl_branch_category,
+                    pool,
+                    url,
+                    download_base_url,
+                    branch,
+                    category,
+                    max_pages,
+                    options,
+                ): (branch, category)
+                for branch, category in tasks
+            }
+            for future in as_completed(futures):
+                branch, category = futures[future]
+                try:
+                    all_results.append(future.result())
+                except Exception as e:
+                    print(
+                        f"❌ Crawl of branch {branch} / {category['name']} failed: {e}"
+                    )
+                    failed.append((branch, category))
+        return all_results, failed
+    finally:
+        pool.close()
+        if downloader:
+            downloader.close()
+
+
+def crawl_with_http(
+    url, download_base_url, branch_values, categories, max_pages, options, limiter=None
+):
+    """Browserless flow: request the listing endpoint directly and parse it with lxml
+
+    Returns (results, tasks): the (branch value, category) pairs whose listing
+    failed, came back empty or raised ListingError are left for the browser.
+    """
+    session = create_session(limiter=limiter)
+    try:
+        branches = get_branches(session, url)
+        if branch_values == ["all"]:
+            branch_values = list(branches)
+        all_results = []
+        failed = []
+        for branch_value in branch_values:
+            branch_name = branches.get(branch_value, branch_value)
+            print(f"Selected branch: {branch_name}")
+            for category in categories:
+                started = time.perf_counter()
+                try:
+                    result = crawl_category_http(
+                        session=session,
+                        listing_url=url,
+                        category_value=category["value"],
+                        category_name=category["name"],
+                        download_base_url=download_base_url,
+                        max_pages=max_pages,
+                        branch_value=branch_value,
+                        branch_name=branch_name,
+                        record_tag=category["record_tag"],
+                        **options,
+                    )
+                except (requests.RequestException, ListingError) as e:
+                    print(
+                        f"❌ Listing of {branch_name} / {category['name']} failed: {e}"
+                    )
+                    failed.append((branch_value, category))
+                    continue
+                if not result["pages_processed"]:
+                    failed.append((branch_value, category))
+                    continue
+                result["branch"] = branch_name
+                result["started"] = started
+                result["finished"] = time.perf_counter()
+                all_results.append(result)
+        return all_results, failed
+    finally:
+        session.close()
+
+
+def crawl_with_fallback(
+    url,
+    download_base_url,
+    branch_values,
+    categories,
+    max_pages,
+    options,
+    mode="http",
+    driver_count=4,
+    limiter=None,
+):
+    """Crawl over HTTP; the browser crawls whatever the HTTP listing couldn't.
+
+    Each (branch, category) that HTTP leaves over is crawled with Selenium and its
+    result added to the HTTP ones; if not even the branch list loads, or mode is
+    "selenium", the browser crawls everything. Returns (results, tasks that
+    failed in the browser too).
+    """
+    all_results, tasks = [], None
+    if mode == "http":
+        try:
+            all_results, tasks = crawl_with_http(
+                url,
+                download_base_url,
+                branch_values,
+                categories,
+                max_pages,
+                options,
+                limiter,
+            )
+        except Exception as e:
+            # Not even the branch list: the browser crawls everything
+            print(f"HTTP crawl failed: {e}, falling back to Selenium...")
+        else:
+            if not tasks:
+                return all_results, []
+            print(
+                f"{len(tasks)} listing(s) incomplete over HTTP, "
+                "crawling them with Selenium..."
+            )
+
+    results, failed = crawl_with_selenium(
+        url,
+        download_base_url,
+        branch_values,
+        categories,
+        max_pages,
+        options,
+        driver_count,
+        tasks,
+    )
+    return all_results + results, failed
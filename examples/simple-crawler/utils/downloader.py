@@ -0,0 +1,367 @@
+import asyncio
+import hashlib
+import os
+import random
+import threading
+import time
+from urllib.parse import urlparse
+
+import httpx
+
+from .metrics import file_labels
+
+# Worth retrying: the server is overloaded or the connection broke, not a bad link
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+def _request_headers(entry, part_path):
+    """Conditional and Range headers for a manifest entry; returns (headers, offset)"""
+    headers = {}
+    if entry and entry["sha256"]:
+        if entry["etag"]:
+            headers["If-None-Match"] = entry["etag"]
+        if entry["last_modified"]:
+            headers["If-Modified-Since"] = entry["last_modified"]
+
+    offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+    validator = entry and (entry["partial_etag"] or entry["partial_last_modified"])
+    if offset and validator:
+        # If-Range: the server sends the rest only if the file is still that version
+        headers["Range"] = f"bytes={offset}-"
+        headers["If-Range"] = validator
+    elif offset:
+        # Nothing says which version the partial file is; start over
+        os.remove(part_path)
+        offset = 0
+    return headers, offset
+
+
+def _trace_recorder(marks):
+    """httpx trace hook: remember when each connection/request event happened"""
+
+    async def trace(event_name, info):
+        marks[event_name] = time.perf_counter()
+
+    return trace
+
+
+def _span(marks, start_suffix, end_suffix):
+    """Seconds between two trace events (http11 or http2), or None"""
+    start = next((t for name, t in marks.items() if name.endswith(start_suffix)), None)
+    end = next((t for name, t in marks.items() if name.endswith(end_suffix)), None)
+    return end - start if start is not None and end is not None else None
+
+
+def _record_request(report, labels, marks):
+    """connect (DNS + TCP) and TLS only happen on a new connection"""
+    for stage, start, end in (
+        ("connect", "connect_tcp.started", "connect_tcp.complete"),
+        ("tls", "start_tls.started", "start_tls.complete"),
+        (
+            "request_wait",
+            "send_request_headers.started",
+            "receive_response_headers.complete",
+        ),
+    ):
+        seconds = _span(marks, start, end)
+        if seconds is not None:
+            report.record(stage, seconds, portal=labels[0], file_type=labels[1])
+
+
+def _sha256_of(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest
+
+
+async def _download_one(
+    client,
+    host_limits,
+    link,
+    output_dir,
+    retries,
+    backoff,
+    on_progress,
+    manifest,
+    report=None,
+    portal=None,
+):
+    """Download one link into output_dir; returns a result dict, never raises.
+
+    outcome is one of: downloaded, resumed, not_modified (304), unchanged (same
+    sha256 as last time; the file is not kept) or failed.
+    """
+    filename = os.path.basename(link)
+    output_path = os.path.join(output_dir, filename)
+    part_path = output_path + ".part"
+    result = {
+        "link": link,
+        "path": None,
+        "outcome": "failed",
+        "status": None,
+        "bytes": 0,
+        "resumed_from": 0,
+        "attempts": 0,
+        "seconds": 0.0,
+        "error": None,
+        "manifest_entry": None,
+    }
+    started = time.perf_counter()
+    labels = file_labels(link, portal)
+
+    async with host_limits[urlparse(link).netloc]:
+        for attempt in range(retries + 1):
+            result["attempts"] = attempt + 1
+            entry = manifest.get(link) if manifest else None
+            headers, offset = _request_headers(entry, part_path)
+            marks = {}
+            try:
+                async with client.stream(
+                    "GET",
+                    link,
+                    headers=headers,
+                    extensions={"trace": _trace_recorder(marks)},
+                ) as response:
+                    result["status"] = response.status_code
+                    if report:
+                        _record_request(report, labels, marks)
+                    if response.status_code == 304:
+                        if os.path.exists(part_path):
+                            os.remove(part_path)
+                        result["outcome"] = "not_modified"
+                        result["error"] = None
+                        break
+                    if response.status_code == 416 and os.path.exists(part_path):
+                        # The partial file doesn't fit the remote one any more
+                        os.remove(part_path)
+                    if response.status_code in RETRY_STATUS_CODES | {416}:
+                        raise httpx.HTTPStatusError(
+                            f"HTTP {response.status_code}",
+                            request=response.request,
+                            response=response,
+                        )
+                    if response.status_code not in (200, 206):
+                        result["error"] = f"HTTP {response.status_code}"
+                        break
+
+                    etag = response.headers.get("ETag")
+                    last_modified = response.headers.get("Last-Modified")
+                    if response.status_code == 206:
+                        digest = _sha256_of(part_path)
+                        mode = "ab"
+                        result["resumed_from"] = offset
+                    else:
+                        digest = hashlib.sha256()
+                        mode = "wb"
+                        offset = 0
+                    if manifest:
+                        manifest.set_partial(link, etag, last_modified)
+
+                    remaining = int(response.headers.get("Content-Length") or 0)
+                    total = offset + remaining if remaining else None
+                    downloaded = offset
+                    transfer_started = time.perf_counter()
+                    with open(part_path, mode) as f:
+                        async for chunk in response.aiter_bytes(64 * 1024):
+                            f.write(chunk)
+                            digest.update(chunk)
+                            downloaded += len(chunk)
+                            if on_progress:
+                                on_progress(link, downloaded, total)
+                    if report:
+                        report.record(
+                            "transfer",
+                            time.perf_counter() - transfer_started,
+                            downloaded - offset,
+                            *labels,
+                        )
+
+                sha256 = digest.hexdigest()
+                result["bytes"] = downloaded - offset
+                result["error"] = None
+                if entry and entry["sha256"] == sha256:
+                    # Same content as last time (server ignored the validators)
+                    os.remove(part_path)
+                    result["outcome"] = "unchanged"
+                    if manifest:
+                        manifest.record(link, etag, last_modified, downloaded, sha256)
+                else:
+                    os.replace(part_path, output_path)
+                    result["path"] = output_path
+                    result["outcome"] = "resumed" if offset else "downloaded"
+                    # Recorded by the caller once the file has been processed, so
+                    # a failed conversion is downloaded again on the next crawl
+                    result["manifest_entry"] = (etag, last_modified, downloaded, sha256)
+                break
+            except (httpx.TransportError, httpx.HTTPStatusError) as e:
+                # The .part file is kept: the next attempt resumes it with Range
+                result["error"] = str(e) or type(e).__name__
+                if attempt == retries:
+                    break
+                # Exponential backoff with full jitter, so retries don't come in bursts
+                delay = random.uniform(0, backoff * 2**attempt)
+                print(f"Retrying {link} in {delay:.1f}s ({result['error']})")
+                await asyncio.sleep(delay)
+            except (httpx.HTTPError, httpx.InvalidURL, OSError) as e:
+                # Not worth retrying (bad encoding, redirect loop, bad URL, .part I/O),
+                # but still one failed result rather than an error for the whole batch
+                result["error"] = str(e) or type(e).__name__
+                break
+
+    result["seconds"] = time.perf_counter() - started
+    return result
+
+
+async def download_files_async(
+    links,
+    output_dir,
+    max_connections=16,
+    per_host_limit=4,
+    retries=3,
+    backoff=1.0,
+    timeout=60.0,
+    headers=None,
+    on_progress=None,
+    on_complete=None,
+    manifest=None,
+    report=None,
+    portal=None,
+    host_limits=None,
+):
+    """
+    Downloads links concurrently over one pooled HTTP client.
+    At most per_host_limit downloads run against the same host at a time
+    (or host_limits' semaphore, shared with other calls on the same loop).
+    With a DownloadManifest, requests are conditional, interrupted downloads
+    resume with Range and files whose sha256 is unchanged are skipped; new
+    files are only recorded by manifest.record_processed(result), which the
+    caller runs after processing them.
+    With a RunReport, connect/TLS/request wait/transfer times are recorded
+    under `portal` (default: the link's host) and the file type.
+    Returns one result dict per distinct link, in the order given.
+    """
+    # The same file linked twice would race on its .part file
+    links = list(dict.fromkeys(links))
+    os.makedirs(output_dir, exist_ok=True)
+    limits = httpx.Limits(
+        max_connections=max_connections, max_keepalive_connections=max_connections
+    )
+    if host_limits is None:
+        host_limits = {
+            host: asyncio.Semaphore(per_host_limit)
+            for host in {urlparse(link).netloc for link in links}
+        }
+
+    async with httpx.AsyncClient(
+        limits=limits,
+        timeout=timeout,
+        headers=headers or {"User-Agent": "Mozilla/5.0"},
+        follow_redirects=True,
+    ) as client:
+
+        async def run(link):
+            result = await _download_one(
+                client,
+                host_limits,
+                link,
+                output_dir,
+                retries,
+                backoff,
+                on_progress,
+                manifest,
+                report,
+                portal,
+            )
+            if report:
+                report.count(f"download_{result['outcome']}")
+            if result["path"]:
+                print(f"Downloaded to {result['path']}")
+            elif result["outcome"] in ("not_modified", "unchanged"):
+                print(f"Skipped {link}: {result['outcome']}")
+            else:
+                print(f"Failed to download {link}: {result['error']}")
+            if on_complete:
+                on_complete(result)
+            return result
+
+        return await asyncio.gather(*(run(link) for link in links))
+
+
+def download_files(links, output_dir, **kwargs):
+    """Synchronous wrapper around download_files_async for the crawler scripts"""
+    if not links:
+        return []
+    return asyncio.run(download_files_async(links, output_dir, **kwargs))
+
+
+class DownloadLoop:
+    """One event loop thread that runs the downloads of several crawler threads.
+
+    download_files() calls from any thread share its per-host semaphores, so
+    per_host_limit holds for the whole crawl instead of for each thread.
+    """
+
+    def __init__(self, per_host_limit=4):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+        self.per_host_limit = per_host_limit
+        self.host_limits = {}
+
+    def download_files(self, links, output_dir, per_host_limit=None, **kwargs):
+        """Same as download_files, with the loop's shared per-host limits
+
+        A host's limit is the per_host_limit of the first call that downloads from
+        it (the loop's own without one), so callers crawling different portals
+        can share the loop.
+        """
+        if not links:
+            return []
+
+        async def download():
+            # Created on first use, inside the loop
+            for host in {urlparse(link).netloc for link in links}:
+                if host not in self.host_limits:
+                    self.host_limits[host] = asyncio.Semaphore(
+                        per_host_limit or self.per_host_limit
+                    )
+            return await download_files_async(
+                links, output_dir, host_limits=self.host_limits, **kwargs
+            )
+
+        future = asyncio.run_coroutine_threadsafe(download(), self.loop)
+        return future.result()
+
+    def close(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+
+def summarize_downloads(results):
+    """Per-run statistics: count per outcome plus bytes transferred and saved"""
+    summary = {
+        outcome: 0
+        for outcome in ("downloaded", "resumed", "not_modified", "unchanged", "failed")
+    }
+    for result in results:
+        summary[result["outcome"]] += 1
+    summary["total"] = len(results)
+    summary["bytes_downloaded"] = sum(result["bytes"] for result in results)
+    summary["bytes_resumed"] = sum(result["resumed_from"] for result in results)
+    skipped = summary["not_modified"] + summary["unchanged"]
+    summary["hit_rate"] = skipped / len(results) if results else 0.0
+    return summary
+
+
+def print_download_summary(summary):
+    print(
+        f"Downloads: {summary['total']} files, {summary['downloaded']} downloaded, "
+        f"{summary['resumed']} resumed, {summary['not_modified']} not modified, "
+        f"{summary['unchanged']} unchanged, {summary['failed']} failed "
+        f"(hit rate {summary['hit_rate']:.0%}, "
+        f"{summary['bytes_downloaded'] / 1024 / 1024:.1f} MB transferred, "
+        f"{summary['bytes_resumed'] / 1024 / 1024:.1f} MB resumed)"
+    )
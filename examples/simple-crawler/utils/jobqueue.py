@@ -0,0 +1,187 @@
+import os
+import sqlite3
+import time
+
+
+class JobQueue:
+    """Crawl jobs and per (chain, file type) schedules, persisted in SQLite.
+
+    A job that was due while the scheduler was down is still pending when it
+    starts again, so missed runs are caught up instead of silently skipped.
+    Used from the scheduler's main thread only.
+    """
+
+    def __init__(self, db_path):
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.connection = sqlite3.connect(db_path)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS schedules (
+                chain_id TEXT NOT NULL,
+                file_type TEXT NOT NULL,
+                next_run_at REAL NOT NULL,
+                PRIMARY KEY (chain_id, file_type)
+            );
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                chain_id TEXT NOT NULL,
+                file_type TEXT NOT NULL,
+                portal TEXT NOT NULL,
+                priority INTEGER NOT NULL,
+                due_at REAL NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                started_at REAL,
+                finished_at REAL,
+                result TEXT
+            );
+            CREATE INDEX IF NOT EXISTS jobs_pending_idx
+                ON jobs (status, priority, due_at);
+        """)
+        self.connection.commit()
+
+    def recover(self):
+        """Jobs left 'running' by a crashed or killed scheduler go back to pending"""
+        with self.connection:
+            cursor = self.connection.execute(
+                "UPDATE jobs SET status = 'pending' WHERE status = 'running'"
+            )
+        return cursor.rowcount
+
+    def enqueue_due(self, targets, now=None):
+        """Enqueue a job for every target whose next run is due.
+
+        targets: (chain_id, file_type, portal, priority, interval_seconds).
+        Runs missed while the scheduler was down collapse into one catch-up job
+        (crawling the same listing twice in a row gains nothing); the schedule then
+        continues on its original cadence. Returns the number of jobs enqueued.
+        """
+        now = now or time.time()
+        enqueued = 0
+        with self.connection:
+            for chain_id, file_type, portal, priority, interval in targets:
+                row = self.connection.execute(
+                    "SELECT next_run_at FROM schedules "
+                    "WHERE chain_id = ? AND file_type = ?",
+                    (chain_id, file_type),
+                ).fetchone()
+                next_run_at = row["next_run_at"] if row else now
+                if next_run_at > now:
+                    continue
+
+                open_job = self.connection.execute(
+                    "SELECT 1 FROM jobs WHERE chain_id = ? AND file_type = ? "
+                    "AND status IN ('pending', 'running')",
+                    (chain_id, file_type),
+                ).fetchone()
+                missed = int((now - next_run_at) // interval)
+                if not open_job:
+                    self.connection.execute(
+                        "INSERT INTO jobs "
+                        "(chain_id, file_type, portal, priority, due_at) "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        (chain_id, file_type, portal, priority, next_run_at),
+                    )
+                    enqueued += 1
+                    if missed:
+                        print(
+                            f"Catching up {chain_id} {file_type}: "
+                            f"{missed} missed run(s) merged into one job"
+                        )
+                self.connection.execute(
+                    "INSERT OR REPLACE INTO schedules "
+                    "(chain_id, file_type, next_run_at) VALUES (?, ?, ?)",
+                    (chain_id, file_type, next_run_at + (missed + 1) * interval),
+                )
+        return enqueued
+
+    def claim(self, portals_available, now=None):
+        """Mark the most urgent due job on a portal with capacity as running.
+
+        Lower priority numbers go first, then the oldest due time.
+        """
+        if not portals_available:
+            return None
+        now = now or time.time()
+        placeholders = ", ".join("?" for _ in portals_available)
+        with self.connection:
+            row = self.connection.execute(
+                f"SELECT * FROM jobs WHERE status = 'pending' AND due_at <= ? "
+                f"AND portal IN ({placeholders}) "
+                f"ORDER BY priority, due_at, id LIMIT 1",
+                (now, *portals_available),
+            ).fetchone()
+            if row is None:
+                return None
+            self.connection.execute(
+                "UPDATE jobs SET status = 'running', started_at = ?, "
+                "attempts = attempts + 1 WHERE id = ?",
+                (now, row["id"]),
+            )
+        return dict(row, attempts=row["attempts"] + 1)
+
+    def finish(self, job_id, result):
+        with self.connection:
+            self.connection.execute(
+                "UPDATE jobs SET status = 'done', finished_at = ?, result = ? "
+                "WHERE id = ?",
+                (time.time(), result, job_id),
+            )
+
+    def fail(self, job_id, error, retry_at=None):
+        """Record a failure; with retry_at the job goes back to pending until then"""
+        with self.connection:
+            self.connection.execute(
+                "UPDATE jobs SET status = ?, due_at = COALESCE(?, due_at), "
+                "finished_at = ?, result = ? WHERE id = ?",
+                (
+                    "pending" if retry_at else "failed",
+                    retry_at,
+                    time.time(),
+                    error,
+                    job_id,
+                ),
+            )
+
+    def pending_count(self):
+        return self.connection.execute(
+            "SELECT COUNT(*) FROM jobs WHERE status IN ('pending', 'running')"
+        ).fetchone()[0]
+
+    def next_due_at(self):
+        """Earliest time anything becomes due (a pending job or a schedule)"""
+        row = self.connection.execute("""
+            SELECT MIN(due) FROM (
+                SELECT MIN(due_at) AS due FROM jobs WHERE status = 'pending'
+                UNION ALL
+                SELECT MIN(next_run_at) FROM schedules
+            )
+        """).fetchone()
+        return row[0]
+
+    def status(self):
+        """Job counts per status and the schedules, for `scheduler.py status`"""
+        counts = dict(
+            self.connection.execute(
+                "SELECT status, COUNT(*) FROM jobs GROUP BY status"
+            ).fetchall()
+        )
+        schedules = [
+            dict(row)
+            for row in self.connection.execute(
+                "SELECT * FROM schedules ORDER BY next_run_at"
+            )
+        ]
+        recent = [
+            dict(row)
+            for row in self.connection.execute(
+                "SELECT * FROM jobs ORDER BY id DESC LIMIT 10"
+            )
+        ]
+        return {"counts": counts, "schedules": schedules, "recent": recent}
+
+    def close(self):
+        self.connection.close()
@@ -0,0 +1,172 @@
+import os
+import re
+import threading
+import time
+from urllib.parse import urljoin
+
+import requests
+from lxml import html
+
+# Query parameters of the file-listing request the page makes when the branch,
+# category or page changes. Not documented by the site: `fixture_server.py record`
+# checks them against the requests the page makes, and a crawl that finds them
+# ignored raises ListingError so the caller can fall back to the browser.
+LISTING_PARAMS = {"branch": "branch", "category": "cat", "page": "page"}
+
+DOWNLOAD_LINKS = (
+    "//a[contains(concat(' ', normalize-space(@class), ' '), ' downloadBtn ')]/@href"
+)
+PAGE_NUMBERS = (
+    "//button[contains(concat(' ', normalize-space(@class), ' '), ' paginationBtn ')]"
+    "/@data-page"
+)
+
+
+class ListingError(Exception):
+    """The listing endpoint doesn't page the way LISTING_PARAMS assumes"""
+
+
+class RateLimiter:
+    """Token bucket shared by every thread that talks to one portal"""
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.burst, self.tokens + (now - self.updated) * self.rate
+                )
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class RateLimitedSession(requests.Session):
+    """Session that takes a RateLimiter token before every request"""
+
+    def __init__(self, limiter):
+        super().__init__()
+        self.limiter = limiter
+
+    def request(self, *args, **kwargs):
+        self.limiter.acquire()
+        return super().request(*args, **kwargs)
+
+
+def create_session(headers=None, limiter=None):
+    """One keep-alive session for every listing request of a crawl"""
+    session = RateLimitedSession(limiter) if limiter else requests.Session()
+    session.headers.update(headers or {"User-Agent": "Mozilla/5.0"})
+    return session
+
+
+def get_branches(session, listing_url, timeout=30):
+    """{value: label} of the <select id="branch_filter"> options, like the UI shows"""
+    response = session.get(listing_url, timeout=timeout)
+    response.raise_for_status()
+    document = html.fromstring(response.content)
+    return {
+        option.get("value"): option.text_content().strip()
+        for option in document.xpath("//select[@id='branch_filter']/option")
+        if option.get("value")
+    }
+
+
+def _matches(link, category, branch_value):
+    """Does a file link belong to the category/branch filter?
+
+    Only applied when the server ignores the filter and returns everything, which
+    is what the page does when it filters client-side.
+    """
+    name = os.path.basename(link).lower()
+    # The chain id follows the type, so "price" doesn't match "PriceFull..."
+    if category and not re.match(rf"{re.escape(category.lower())}\d", name):
+        return False
+    return not branch_value or f"-{branch_value}-" in name
+
+
+def parse_listing(content, download_base_url):
+    """(download links, page numbers in the pagination bar) of one listing page"""
+    document = html.fromstring(content)
+    links = [
+        urljoin(download_base_url, href) for href in document.xpath(DOWNLOAD_LINKS)
+    ]
+    pages = {int(page) for page in document.xpath(PAGE_NUMBERS) if page.isdigit()}
+    return links, pages
+
+
+def fetch_listing_page(
+    session,
+    listing_url,
+    download_base_url,
+    branch_value,
+    category,
+    page,
+    timeout=30,
+):
+    """Request one page of the file listing; returns (links, page numbers, seconds)"""
+    params = {
+        LISTING_PARAMS["branch"]: branch_value,
+        LISTING_PARAMS["category"]: category,
+        LISTING_PARAMS["page"]: page,
+    }
+    started = time.perf_counter()
+    response = session.get(listing_url, params=params, timeout=timeout)
+    response.raise_for_status()
+    links, pages = parse_listing(response.content, download_base_url)
+    links = [link for link in links if _matches(link, category, branch_value)]
+    return links, pages, time.perf_counter() - started
+
+
+def iter_listing_pages(
+    session,
+    listing_url,
+    download_base_url,
+    branch_value,
+    category,
+    max_pages,
+    timeout=30,
+):
+    """Yield (page number, links) with the same filters and paging as the UI.
+
+    Stops at max_pages or when the pagination bar has no next page. Raises
+    ListingError when a page the bar lists brings no links that weren't seen
+    already: the server ignores the parameters and the rest was never fetched.
+    """
+    seen = set()
+    for page in range(1, max_pages + 1):
+        links, pages, seconds = fetch_listing_page(
+            session,
+            listing_url,
+            download_base_url,
+            branch_value,
+            category,
+            page,
+            timeout,
+        )
+        new_links = [link for link in dict.fromkeys(links) if link not in seen]
+        print(
+            f"Listing page {page} ({category}): {len(new_links)} links "
+            f"in {seconds * 1000:.0f} ms"
+        )
+        if not new_links:
+            if page > 1:
+                raise ListingError(
+                    f"page {page} of {category} repeats earlier pages; "
+                    f"check LISTING_PARAMS"
+                )
+            break
+        seen.update(new_links)
+        yield page, new_links
+        if page + 1 not in pages:
+            break
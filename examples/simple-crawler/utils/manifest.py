@@ -0,0 +1,84 @@
+import os
+import sqlite3
+import threading
+import time
+
+
+class DownloadManifest:
+    """What was last downloaded from each URL (validators, size, sha256), in SQLite.
+
+    The validators make the next request conditional; the partial_* columns hold
+    the validators of an interrupted download so its .part file can be resumed.
+    One instance can be shared by crawler threads; every access holds a lock.
+    """
+
+    def __init__(self, db_path):
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(db_path, check_same_thread=False)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS downloads (
+                url TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                size INTEGER,
+                sha256 TEXT,
+                partial_etag TEXT,
+                partial_last_modified TEXT,
+                downloaded_at REAL
+            )
+        """)
+        self.connection.commit()
+
+    def get(self, url):
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT * FROM downloads WHERE url = ?", (url,)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def set_partial(self, url, etag, last_modified):
+        """Remember which version a .part file belongs to, before writing it"""
+        with self.lock, self.connection:
+            self.connection.execute(
+                """
+                INSERT INTO downloads (url, partial_etag, partial_last_modified)
+                VALUES (?, ?, ?)
+                ON CONFLICT (url) DO UPDATE SET
+                    partial_etag = excluded.partial_etag,
+                    partial_last_modified = excluded.partial_last_modified
+                """,
+                (url, etag, last_modified),
+            )
+
+    def record(self, url, etag, last_modified, size, sha256):
+        """Store a completed download and clear its partial state"""
+        with self.lock, self.connection:
+            self.connection.execute(
+                """
+                INSERT INTO downloads (url, etag, last_modified, size, sha256,
+                                       downloaded_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (url) DO UPDATE SET
+                    etag = excluded.etag,
+                    last_modified = excluded.last_modified,
+                    size = excluded.size,
+                    sha256 = excluded.sha256,
+                    partial_etag = NULL,
+                    partial_last_modified = NULL,
+                    downloaded_at = excluded.downloaded_at
+                """,
+                (url, etag, last_modified, size, sha256, time.time()),
+            )
+
+    def record_processed(self, result):
+        """Record a download result once its file has been processed"""
+        if result["manifest_entry"]:
+            self.record(result["link"], *result["manifest_entry"])
+
+    def close(self):
+        self.connection.close()
@@ -0,0 +1,254 @@
+import json
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from urllib.parse import urlparse
+
+from .store import parse_file_name
+
+# Order of the stages a file goes through, for reports
+STAGES = [
+    "connect",  # DNS + TCP connect
+    "tls",
+    "request_wait",  # request sent → response headers
+    "transfer",  # response body
+    "decompress",
+    "parse",
+    "write",
+]
+QUANTILES = (0.5, 0.9, 0.99)
+
+
+def file_labels(link_or_path, portal=None):
+    """(portal, file type) labels: portal defaults to the link's host"""
+    info = parse_file_name(link_or_path)
+    file_type = info["file_type"] if info else "unknown"
+    if portal is None:
+        portal = urlparse(link_or_path).netloc or "local"
+    return portal, file_type
+
+
+def percentile(sorted_values, q):
+    """Linear interpolation between closest ranks (numpy's default)"""
+    if not sorted_values:
+        return None
+    position = (len(sorted_values) - 1) * q
+    lower = math.floor(position)
+    upper = math.ceil(position)
+    weight = position - lower
+    return sorted_values[lower] * (1 - weight) + sorted_values[upper] * weight
+
+
+class RunReport:
+    """Per-stage timings of one crawl run, grouped by portal and file type.
+
+    Thread-safe: downloads, extraction and conversion record into one instance.
+    Every sample is kept, so percentiles are exact.
+    """
+
+    def __init__(self, name="crawl"):
+        self.name = name
+        self.started_at = time.time()
+        self.samples = {}  # (stage, portal, file_type) → [(seconds, bytes)]
+        self.counters = {}
+        self.lock = threading.Lock()
+
+    def record(self, stage, seconds, nbytes=0, portal="unknown", file_type="unknown"):
+        with self.lock:
+            self.samples.setdefault((stage, portal, file_type), []).append(
+                (seconds, nbytes)
+            )
+
+    @contextmanager
+    def timer(self, stage, portal="unknown", file_type="unknown"):
+        """Time a block; set `sample["bytes"]` inside it to record a size"""
+        sample = {"bytes": 0}
+        started = time.perf_counter()
+        try:
+            yield sample
+        finally:
+            self.record(
+                stage,
+                time.perf_counter() - started,
+                sample["bytes"],
+                portal,
+                file_type,
+            )
+
+    def count(self, name, value=1):
+        """Run-level counters, e.g. download outcomes"""
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def summary(self):
+        """One row per (stage, portal, file type) with count, total and percentiles"""
+        with self.lock:
+            items = {key: list(values) for key, values in self.samples.items()}
+
+        rows = []
+        for (stage, portal, file_type), values in items.items():
+            seconds = sorted(value[0] for value in values)
+            total_seconds = sum(seconds)
+            total_bytes = sum(value[1] for value in values)
+            row = {
+                "stage": stage,
+                "portal": portal,
+                "file_type": file_type,
+                "count": len(seconds),
+                "seconds_total": round(total_seconds, 6),
+                "max": round(seconds[-1], 6),
+                "bytes": total_bytes,
+                "bytes_per_second": (
+                    round(total_bytes / total_seconds) if total_seconds else None
+                ),
+            }
+            for q in QUANTILES:
+                row[f"p{round(q * 100)}"] = round(percentile(seconds, q), 6)
+            rows.append(row)
+
+        order = {stage: i for i, stage in enumerate(STAGES)}
+        rows.sort(
+            key=lambda r: (r["portal"], r["file_type"], order.get(r["stage"], 99))
+        )
+        return rows
+
+    def to_dict(self):
+        finished_at = time.time()
+        return {
+            "name": self.name,
+            "started_at": datetime.fromtimestamp(self.started_at).isoformat(),
+            "finished_at": datetime.fromtimestamp(finished_at).isoformat(),
+            "duration_seconds": round(finished_at - self.started_at, 3),
+            "counters": dict(self.counters),
+            "stages": self.summary(),
+        }
+
+    def write_json(self, path):
+        """Write the report atomically; returns the path"""
+        _write_atomic(path, json.dumps(self.to_dict(), indent=2) + "\n")
+        return path
+
+    def write_prometheus(self, path):
+        """node_exporter textfile-collector format (a summary per stage)"""
+        report = self.to_dict()
+        lines = [
+            "# HELP crawler_stage_seconds Time spent per crawl stage.",
+            "# TYPE crawler_stage_seconds summary",
+        ]
+        for row in report["stages"]:
+            labels = (
+                f'crawler="{self.name}",stage="{row["stage"]}",'
+                f'portal="{row["portal"]}",file_type="{row["file_type"]}"'
+            )
+            for q in QUANTILES:
+                value = row[f"p{round(q * 100)}"]
+                lines.append(
+                    f'crawler_stage_seconds{{{labels},quantile="{q}"}} {value}'
+                )
+            lines += [
+                f"crawler_stage_seconds_sum{{{labels}}} {row['seconds_total']}",
+                f"crawler_stage_seconds_count{{{labels}}} {row['count']}",
+            ]
+        lines += [
+            "# HELP crawler_stage_bytes Bytes handled per crawl stage in the last run.",
+            "# TYPE crawler_stage_bytes gauge",
+        ]
+        for row in report["stages"]:
+            if row["bytes"]:
+                lines.append(
+                    f'crawler_stage_bytes{{crawler="{self.name}",'
+                    f'stage="{row["stage"]}",portal="{row["portal"]}",'
+                    f'file_type="{row["file_type"]}"}} {row["bytes"]}'
+                )
+        lines += [
+            "# HELP crawler_run_counter Run-level counters of the last run.",
+            "# TYPE crawler_run_counter gauge",
+        ]
+        for name, value in sorted(report["counters"].items()):
+            lines.append(
+                f'crawler_run_counter{{crawler="{self.name}",name="{name}"}} {value}'
+            )
+        lines += [
+            "# HELP crawler_last_run_duration_seconds Wall time of the last run.",
+            "# TYPE crawler_last_run_duration_seconds gauge",
+            f'crawler_last_run_duration_seconds{{crawler="{self.name}"}} '
+            f"{report['duration_seconds']}",
+            "# HELP crawler_last_run_timestamp_seconds When the last run finished.",
+            "# TYPE crawler_last_run_timestamp_seconds gauge",
+            f'crawler_last_run_timestamp_seconds{{crawler="{self.name}"}} '
+            f"{time.time():.0f}",
+        ]
+        _write_atomic(path, "\n".join(lines) + "\n")
+        return path
+
+    def print_summary(self):
+        print(f"\n{'stage':<13} {'portal':<24} {'file type':<10} "
+              f"{'n':>5} {'p50':>8} {'p90':>8} {'p99':>8} {'MB/s':>8}")
+        for row in self.summary():
+            rate = row["bytes_per_second"]
+            print(
+                f"{row['stage']:<13} {row['portal'][:24]:<24} {row['file_type']:<10} "
+                f"{row['count']:>5} {row['p50']:>8.3f} {row['p90']:>8.3f} "
+                f"{row['p99']:>8.3f} "
+                f"{(rate / 1024 / 1024 if rate else 0):>8.2f}"
+            )
+
+
+def _write_atomic(path, text):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+def default_report_path(report_dir, name):
+    """<report_dir>/<name>-YYYYmmdd-HHMMSS.json"""
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    return os.path.join(report_dir, f"{name}-{stamp}.json")
+
+
+def write_run_report(report, report_dir=None, prometheus_path=None):
+    """Print the per-stage percentiles and save the JSON (and Prometheus) report"""
+    report.print_summary()
+    if report_dir:
+        path = report.write_json(default_report_path(report_dir, report.name))
+        print(f"Run report: {path}")
+    if prometheus_path:
+        report.write_prometheus(prometheus_path)
+        print(f"Prometheus metrics: {prometheus_path}")
+
+
+def compare_reports(old, new, threshold=0.2):
+    """Rows whose p50 or p90 changed by more than `threshold` (0.2 = 20%)"""
+    def key(row):
+        return row["stage"], row["portal"], row["file_type"]
+
+    old_rows = {key(row): row for row in old["stages"]}
+    changes = []
+    for row in new["stages"]:
+        before = old_rows.get(key(row))
+        if before is None:
+            continue
+        for metric in ("p50", "p90"):
+            if not before[metric]:
+                continue
+            change = (row[metric] - before[metric]) / before[metric]
+            if abs(change) >= threshold:
+                changes.append(
+                    {
+                        "stage": row["stage"],
+                        "portal": row["portal"],
+                        "file_type": row["file_type"],
+                        "metric": metric,
+                        "old": before[metric],
+                        "new": row[metric],
+                        "change": round(change, 3),
+                    }
+                )
+    return changes
@@ -0,0 +1,263 @@
+import os
+import re
+import time
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from . import iter_xml_records
+
+# Hive-style layout: <dataset_dir>/<kind>/chain_id=.../store_id=.../date=YYYY-MM-DD/
+PARTITIONING = ds.partitioning(
+    pa.schema(
+        [("chain_id", pa.string()), ("store_id", pa.string()), ("date", pa.date32())]
+    ),
+    flavor="hive",
+)
+
+# Repeated text (names, manufacturers, units) compresses to small integer codes
+DICT_STRING = pa.dictionary(pa.int32(), pa.string())
+TIMESTAMP_FORMATS = ("%Y-%m-%d %H:%M:%S", "%Y-%m-%dT%H:%M:%S", "%Y-%m-%d %H:%M")
+FILE_DATE_PATTERN = re.compile(r"-(\d{8})\d{4}(?:\D|$)")
+
+
+def _text(value):
+    if isinstance(value, str):
+        return value.strip() or None
+    return None
+
+
+def _int(value):
+    try:
+        return int(_text(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def _decimal(scale):
+    quantum = Decimal(1).scaleb(-scale)
+
+    def parse(value):
+        try:
+            return Decimal(_text(value)).quantize(quantum)
+        except (TypeError, InvalidOperation):
+            return None
+
+    return parse
+
+
+def _timestamp(value):
+    text = _text(value)
+    for fmt in TIMESTAMP_FORMATS:
+        try:
+            return datetime.strptime(text, fmt)
+        except (TypeError, ValueError):
+            continue
+    return None
+
+
+def _date(value):
+    try:
+        return datetime.strptime(_text(value), "%Y-%m-%d").date()
+    except (TypeError, ValueError):
+        return None
+
+
+def _item_codes(value):
+    """PromotionItems → list of ItemCodes (a single Item is a dict, not a list)"""
+    items = value.get("Item") if isinstance(value, dict) else None
+    if isinstance(items, dict):
+        items = [items]
+    return [item.get("ItemCode") for item in items or [] if isinstance(item, dict)]
+
+
+# (column, XML field, Arrow type, parser)
+PRICE_COLUMNS = [
+    ("item_code", "ItemCode", pa.string(), _text),
+    ("item_type", "ItemType", pa.int8(), _int),
+    ("item_name", "ItemName", DICT_STRING, _text),
+    ("manufacturer_name", "ManufacturerName", DICT_STRING, _text),
+    ("manufacture_country", "ManufactureCountry", DICT_STRING, _text),
+    ("manufacturer_item_description", "ManufacturerItemDescription", DICT_STRING,
+     _text),
+    ("unit_qty", "UnitQty", DICT_STRING, _text),
+    ("quantity", "Quantity", pa.decimal128(12, 3), _decimal(3)),
+    ("unit_of_measure", "UnitOfMeasure", DICT_STRING, _text),
+    ("is_weighted", "bIsWeighted", pa.int8(), _int),
+    ("qty_in_package", "QtyInPackage", pa.decimal128(12, 3), _decimal(3)),
+    ("item_price", "ItemPrice", pa.decimal128(12, 2), _decimal(2)),
+    ("unit_of_measure_price", "UnitOfMeasurePrice", pa.decimal128(12, 4), _decimal(4)),
+    ("allow_discount", "AllowDiscount", pa.int8(), _int),
+    ("item_status", "ItemStatus", pa.int8(), _int),
+    ("price_update_date", "PriceUpdateDate", pa.timestamp("s"), _timestamp),
+]
+
+PROMO_COLUMNS = [
+    ("promotion_id", "PromotionId", pa.string(), _text),
+    ("promotion_description", "PromotionDescription", DICT_STRING, _text),
+    ("promotion_update_date", "PromotionUpdateDate", pa.timestamp("s"), _timestamp),
+    ("promotion_start_date", "PromotionStartDate", pa.date32(), _date),
+    ("promotion_start_hour", "PromotionStartHour", DICT_STRING, _text),
+    ("promotion_end_date", "PromotionEndDate", pa.date32(), _date),
+    ("promotion_end_hour", "PromotionEndHour", DICT_STRING, _text),
+    ("reward_type", "RewardType", pa.int8(), _int),
+    ("discount_type", "DiscountType", pa.int8(), _int),
+    ("discount_rate", "DiscountRate", pa.decimal128(12, 2), _decimal(2)),
+    ("min_qty", "MinQty", pa.decimal128(12, 3), _decimal(3)),
+    ("max_qty", "MaxQty", pa.decimal128(12, 3), _decimal(3)),
+    ("discounted_price", "DiscountedPrice", pa.decimal128(12, 2), _decimal(2)),
+    ("discounted_price_per_mida", "DiscountedPricePerMida", pa.decimal128(12, 2),
+     _decimal(2)),
+    ("min_no_of_item_offered", "MinNoOfItemOfered", pa.int32(), _int),
+    ("item_codes", "PromotionItems", pa.list_(pa.string()), _item_codes),
+]
+
+# kind → (record tag, columns); the kind is taken from the file name
+FILE_KINDS = {
+    "prices": ("Item", PRICE_COLUMNS),
+    "promos": ("Promotion", PROMO_COLUMNS),
+}
+
+
+def _file_kind(xml_file_path):
+    name = os.path.basename(xml_file_path).lower()
+    return "promos" if name.startswith("promo") else "prices"
+
+
+def _file_date(xml_file_path):
+    """PriceFull7290055700007-0084-202508060510 → 2025-08-06 (today if absent)"""
+    match = FILE_DATE_PATTERN.search(os.path.basename(xml_file_path))
+    if match:
+        try:
+            return datetime.strptime(match.group(1), "%Y%m%d").date()
+        except ValueError:
+            pass
+    return date.today()
+
+
+def _schema(columns):
+    fields = [pa.field("sub_chain_id", DICT_STRING)]
+    fields += [pa.field(name, arrow_type) for name, _, arrow_type, _ in columns]
+    return pa.schema(fields)
+
+
+def _to_table(records, columns, schema, sub_chain_id):
+    arrays = [pa.array([sub_chain_id] * len(records), type=DICT_STRING)]
+    for name, field, arrow_type, parse in columns:
+        values = [parse(record.get(field)) for record in records]
+        arrays.append(pa.array(values, type=arrow_type))
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+
+def convert_xml_to_parquet(
+    xml_file_path: str, dataset_dir: str, batch_size: int = 50000, timings=None
+):
+    """
+    Converts a PriceFull/PromoFull XML file to a typed Parquet file in the
+    partitioned dataset under dataset_dir. Records are streamed in batches.
+    Skips conversion if the Parquet file already exists.
+    With a timings dict, fills in "write" (encoding + writing) and "total".
+    """
+    started = time.perf_counter()
+    write_seconds = 0.0
+    kind = _file_kind(xml_file_path)
+    record_tag, columns = FILE_KINDS[kind]
+    schema = _schema(columns)
+
+    header = {}
+    records = iter_xml_records(xml_file_path, record_tag, header)
+    batch = []
+    for record in records:
+        batch.append(record)
+        # ChainId/StoreId precede the records, so the partition is known now
+        break
+
+    chain_id = header.get("ChainId") or header.get("ChainID") or "unknown"
+    store_id = header.get("StoreId") or header.get("StoreID") or "unknown"
+    sub_chain_id = header.get("SubChainId") or header.get("SubChainID")
+    partition_dir = os.path.join(
+        dataset_dir,
+        kind,
+        f"chain_id={chain_id}",
+        f"store_id={store_id}",
+        f"date={_file_date(xml_file_path).isoformat()}",
+    )
+    parquet_file_path = os.path.join(
+        partition_dir, os.path.basename(xml_file_path) + ".parquet"
+    )
+    if os.path.exists(parquet_file_path):
+        print(f"✅ Parquet already exists: {parquet_file_path}")
+        return parquet_file_path
+
+    os.makedirs(partition_dir, exist_ok=True)
+    tmp_path = parquet_file_path + ".tmp"
+    count = 0
+    try:
+        with pq.ParquetWriter(tmp_path, schema, compression="zstd") as writer:
+            for record in records:
+                batch.append(record)
+                if len(batch) >= batch_size:
+                    table = _to_table(batch, columns, schema, sub_chain_id)
+                    write_started = time.perf_counter()
+                    writer.write_table(table)
+                    write_seconds += time.perf_counter() - write_started
+                    count += len(batch)
+                    batch = []
+            if batch:
+                table = _to_table(batch, columns, schema, sub_chain_id)
+                write_started = time.perf_counter()
+                writer.write_table(table)
+                write_seconds += time.perf_counter() - write_started
+                count += len(batch)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    os.replace(tmp_path, parquet_file_path)
+    if timings is not None:
+        timings["write"] = write_seconds
+        timings["total"] = time.perf_counter() - started
+
+    print(f"✅ Converted {count} <{record_tag}> records: {parquet_file_path}")
+    return parquet_file_path
+
+
+def open_dataset(dataset_dir: str, kind: str = "prices"):
+    """Lazy pyarrow dataset over every converted file of one kind"""
+    return ds.dataset(
+        os.path.join(dataset_dir, kind), format="parquet", partitioning=PARTITIONING
+    )
+
+
+def scan_dataset(
+    dataset_dir: str,
+    kind: str = "prices",
+    columns=None,
+    chain_id: str = None,
+    store_id: str = None,
+    start_date: date = None,
+    end_date: date = None,
+):
+    """
+    Returns a lazy Scanner: only the requested columns are read, and partitions
+    outside the chain/store/date filters are never opened.
+    Use .to_batches() to stream or .to_table() to materialize.
+    """
+    conditions = []
+    if chain_id is not None:
+        conditions.append(ds.field("chain_id") == chain_id)
+    if store_id is not None:
+        conditions.append(ds.field("store_id") == store_id)
+    if start_date is not None:
+        conditions.append(ds.field("date") >= start_date)
+    if end_date is not None:
+        conditions.append(ds.field("date") <= end_date)
+
+    expression = None
+    for condition in conditions:
+        expression = condition if expression is None else expression & condition
+
+    return open_dataset(dataset_dir, kind).scanner(columns=columns, filter=expression)
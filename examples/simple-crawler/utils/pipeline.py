@@ -0,0 +1,134 @@
+import os
+import time
+from urllib.parse import urlparse
+
+from . import (
+    convert_xml_to_json,
+    download_files,
+    download_records_to_ndjson,
+    extract_and_delete_gz,
+)
+from .metrics import file_labels
+from .parquet import convert_xml_to_parquet
+
+# Typed Parquet output goes to one dataset shared by every branch
+DATASET_DIR = os.path.join("prices", "dataset")
+
+
+def extract_and_convert(output_path, output_format="json", report=None, portal=None):
+    """Extract → convert a downloaded .gz; returns the converted file path or None.
+
+    With a RunReport, records decompress, parse and write times (parse is the
+    conversion time not spent writing).
+    """
+    print(f"Output path: {output_path}")
+    if not output_path:
+        return None
+    labels = file_labels(output_path, portal or "local")
+    print(f"Extracting {output_path}...")
+    started = time.perf_counter()
+    output_path = extract_and_delete_gz(output_path)
+    if not output_path:
+        return None
+    if report:
+        report.record(
+            "decompress",
+            time.perf_counter() - started,
+            os.path.getsize(output_path),
+            *labels,
+        )
+
+    timings = {} if report else None
+    if output_format == "parquet":
+        converted = convert_xml_to_parquet(output_path, DATASET_DIR, timings=timings)
+    else:
+        converted = convert_xml_to_json(output_path, timings=timings)
+    # An existing output is skipped without timings
+    if report and "total" in timings:
+        report.record(
+            "parse",
+            timings["total"] - timings["write"],
+            os.path.getsize(output_path),
+            *labels,
+        )
+        report.record("write", timings["write"], os.path.getsize(converted), *labels)
+    return converted
+
+
+def process_links(
+    download_links,
+    output_dir,
+    record_tag="Item",
+    stream=False,
+    archive=True,
+    per_host_limit=4,
+    manifest=None,
+    output_format="json",
+    store=None,
+    report=None,
+    portal=None,
+    downloader=None,
+):
+    """Download, extract and convert one page of links; returns its statistics
+
+    With a DownloadLoop as downloader, the page's downloads share its per-host
+    limits with every other thread using it.
+    """
+    stats = {"successful": 0, "failed": 0, "skipped": 0, "download_results": []}
+
+    # Download the whole page concurrently; extract/convert stays sequential
+    downloaded = {}
+    if not stream:
+        fetch = downloader.download_files if downloader else download_files
+        results = fetch(
+            download_links,
+            output_dir,
+            per_host_limit=per_host_limit,
+            manifest=manifest,
+            report=report,
+            portal=portal,
+        )
+        stats["download_results"] = results
+        downloaded = {result["link"]: result for result in results}
+
+    for i, link in enumerate(download_links, 1):
+        print(f"[{i}/{len(download_links)}] Processing {link}...")
+        result = downloaded.get(link)
+        if result and result["outcome"] in ("not_modified", "unchanged"):
+            stats["skipped"] += 1
+            print(f"⏭️ Unchanged since the last crawl: {link}")
+            continue
+        if result and result["path"] and store:
+            if not store.add_download(result["path"]):
+                # Same bytes as a file already processed
+                if manifest:
+                    manifest.record_processed(result)
+                stats["skipped"] += 1
+                continue
+        try:
+            if stream:
+                output_path = download_records_to_ndjson(
+                    link, output_dir, record_tag=record_tag, archive=archive
+                )
+            else:
+                output_path = extract_and_convert(
+                    result and result["path"],
+                    output_format,
+                    report,
+                    portal or urlparse(link).netloc,
+                )
+        except Exception as e:
+            print(f"❌ Error processing {link}: {e}")
+            stats["failed"] += 1
+            continue
+
+        if output_path:
+            if result and manifest:
+                manifest.record_processed(result)
+            stats["successful"] += 1
+            print(f"✅ Successfully processed: {output_path}")
+        else:
+            stats["failed"] += 1
+            print(f"❌ Failed to download: {link}")
+
+    return stats
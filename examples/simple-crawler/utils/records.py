@@ -0,0 +1,65 @@
+import xml.etree.ElementTree as ET
+
+# Standard library only: the S3 producer image (docker-compose examples) copies
+# this file in too, so keep the crawler's dependencies out of it.
+
+
+def elem_to_dict(elem):
+    """Convert an element (recursively) into the {tag: value} layout used for JSON"""
+    result = {elem.tag: {} if elem.attrib else None}
+    children = list(elem)
+    if children:
+        dd = {}
+        for dc in map(elem_to_dict, children):
+            for k, v in dc.items():
+                if k in dd:
+                    if not isinstance(dd[k], list):
+                        dd[k] = [dd[k]]
+                    dd[k].append(v)
+                else:
+                    dd[k] = v
+        result = {elem.tag: dd}
+    if elem.attrib:
+        result[elem.tag].update(("@" + k, v) for k, v in elem.attrib.items())
+    if elem.text and elem.text.strip():
+        text = elem.text.strip()
+        if children or elem.attrib:
+            result[elem.tag]["#text"] = text
+        else:
+            result[elem.tag] = text
+    return result
+
+
+def iter_xml_records(source, record_tag: str = "Item", header: dict = None):
+    """
+    Yields every <record_tag> element as a dict (elem_to_dict layout, without the
+    tag wrapper), dropping each one from the tree after use.
+    `source` is a path or a binary file object. If `header` is given, it is filled
+    with the leaf elements outside the records (ChainId, StoreId, ...); the first
+    value of a tag wins.
+    """
+    parents = []
+    open_records = 0
+    record_parents = set()
+    for event, elem in ET.iterparse(source, events=("start", "end")):
+        if event == "start":
+            parents.append(elem)
+            if elem.tag == record_tag:
+                open_records += 1
+            continue
+        parents.pop()
+        if elem.tag == record_tag:
+            open_records -= 1
+            yield elem_to_dict(elem)[record_tag]
+            if parents:
+                parents[-1].remove(elem)
+                record_parents.add(id(parents[-1]))
+        elif id(elem) in record_parents:
+            record_parents.discard(id(elem))
+        elif (
+            header is not None
+            and not open_records
+            and len(elem) == 0
+            and elem.tag not in header
+        ):
+            header[elem.tag] = elem.text.strip() if elem.text else None
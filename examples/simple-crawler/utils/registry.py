@@ -0,0 +1,37 @@
+import json
+import os
+
+DEFAULT_REGISTRY_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "chains.json"
+)
+
+
+def load_registry(path=None):
+    """Read chains.json: {"portals": {name: limits}, "chains": [chain, ...]}"""
+    with open(path or DEFAULT_REGISTRY_PATH, encoding="utf-8") as f:
+        registry = json.load(f)
+
+    portals = registry.setdefault("portals", {})
+    for chain in registry.setdefault("chains", []):
+        if not chain.get("chain_id"):
+            raise ValueError(f"Chain without chain_id in registry: {chain}")
+        portal = chain.get("portal")
+        if portal and portal not in portals:
+            raise ValueError(
+                f"Chain {chain['chain_id']} uses unknown portal {portal!r}"
+            )
+    return registry
+
+
+def chain_names(registry):
+    """{chain_id: name} for every registered chain"""
+    return {chain["chain_id"]: chain["name"] for chain in registry["chains"]}
+
+
+def crawl_targets(registry):
+    """(chain, file type, file type config) for every crawlable chain/file type"""
+    for chain in registry["chains"]:
+        if not chain.get("portal"):
+            continue
+        for file_type, config in chain.get("file_types", {}).items():
+            yield chain, file_type, config
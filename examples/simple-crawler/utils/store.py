@@ -0,0 +1,161 @@
+import hashlib
+import os
+import re
+import shutil
+import sqlite3
+import threading
+
+# PriceFull7290055700007-0084-202508060510.gz, optionally with a sub-chain:
+# PromoFull7290055700007-001-0084-202508060510.gz
+FILE_NAME_PATTERN = re.compile(
+    r"^(?P<file_type>[A-Za-z]+)(?P<chain_id>\d+)-(?:\d+-)?(?P<store_id>\d+)-"
+    r"(?P<timestamp>\d{12,14})"
+)
+
+
+def parse_file_name(file_name):
+    """Chain, store, file type and timestamp from a price file name, or None"""
+    match = FILE_NAME_PATTERN.match(os.path.basename(file_name))
+    return match.groupdict() if match else None
+
+
+def sha256_file(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ContentStore:
+    """Raw crawl outputs stored once per content hash, plus an index of sightings.
+
+    blobs/<aa>/<sha256> holds each distinct file exactly once; index.sqlite3 maps
+    (chain_id, store_id, file_type, timestamp) to the sha256 that was seen.
+    One instance can be shared by crawler threads.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(os.path.join(root, "blobs"), exist_ok=True)
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(
+            os.path.join(root, "index.sqlite3"), check_same_thread=False
+        )
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS files (
+                chain_id TEXT NOT NULL,
+                store_id TEXT NOT NULL,
+                file_type TEXT NOT NULL,
+                timestamp TEXT NOT NULL,
+                sha256 TEXT NOT NULL,
+                file_name TEXT,
+                size INTEGER,
+                PRIMARY KEY (chain_id, store_id, file_type, timestamp)
+            )
+        """)
+        self.connection.execute(
+            "CREATE INDEX IF NOT EXISTS files_sha256_idx ON files (sha256)"
+        )
+        self.connection.commit()
+
+    def blob_path(self, sha256):
+        return os.path.join(self.root, "blobs", sha256[:2], sha256)
+
+    def has(self, sha256):
+        return os.path.exists(self.blob_path(sha256))
+
+    def put(self, path, chain_id, store_id, file_type, timestamp):
+        """Index a file and store its content if new; returns (sha256, is_new)"""
+        sha256 = sha256_file(path)
+        blob_path = self.blob_path(sha256)
+        with self.lock:
+            # Checked and created under the lock: two threads may hold the same file
+            is_new = not os.path.exists(blob_path)
+            if is_new:
+                os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+                tmp_path = blob_path + ".tmp"
+                try:
+                    # A hard link costs no extra space; fall back to a copy
+                    os.link(path, tmp_path)
+                except OSError:
+                    shutil.copyfile(path, tmp_path)
+                os.replace(tmp_path, blob_path)
+
+        with self.lock, self.connection:
+            self.connection.execute(
+                """
+                INSERT OR REPLACE INTO files
+                    (chain_id, store_id, file_type, timestamp, sha256, file_name, size)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    chain_id or "",
+                    store_id or "",
+                    file_type or "",
+                    timestamp,
+                    sha256,
+                    os.path.basename(path),
+                    os.path.getsize(path),
+                ),
+            )
+        return sha256, is_new
+
+    def add_download(self, path):
+        """put() a downloaded price file, taking the index key from its name.
+
+        Returns True if the content is new. A duplicate is removed from disk so
+        it is neither stored twice nor converted again.
+        """
+        info = parse_file_name(path) or {
+            "chain_id": "",
+            "store_id": "",
+            "file_type": "",
+            "timestamp": os.path.basename(path),
+        }
+        sha256, is_new = self.put(path, **info)
+        if not is_new:
+            os.remove(path)
+            print(f"⏭️ Duplicate of stored blob {sha256[:12]}: {path}")
+        return is_new
+
+    def lookup(self, chain_id=None, store_id=None, file_type=None):
+        """Index rows matching the given fields, newest first"""
+        conditions, params = [], []
+        for column, value in (
+            ("chain_id", chain_id),
+            ("store_id", store_id),
+            ("file_type", file_type),
+        ):
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                params.append(value)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        with self.lock:
+            rows = self.connection.execute(
+                f"SELECT * FROM files {where} ORDER BY timestamp DESC", params
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def stats(self):
+        """Index entries vs distinct blobs: how much the deduplication saved"""
+        with self.lock:
+            entries, distinct, indexed_bytes = self.connection.execute(
+                "SELECT COUNT(*), COUNT(DISTINCT sha256), COALESCE(SUM(size), 0) "
+                "FROM files"
+            ).fetchone()
+            stored_bytes = self.connection.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM "
+                "(SELECT MAX(size) AS size FROM files GROUP BY sha256)"
+            ).fetchone()[0]
+        return {
+            "entries": entries,
+            "blobs": distinct,
+            "bytes_indexed": indexed_bytes,
+            "bytes_stored": stored_bytes,
+        }
+
+    def close(self):
+        self.connection.close()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Measure the SQS worker's throughput (messages/sec) against LocalStack.
+
+Fills a fresh queue, drains it with the worker mode from handler.py and, with
+--baseline, with the old one-message-at-a-time consumer for comparison.
+
+    docker-compose up -d localstack
+    python lambda/benchmark.py --messages 2000 --baseline
+    python lambda/benchmark.py --messages 500 --work-ms 50 --concurrency 10 50
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+
+def fill_queue(sqs_client, queue_url, count, work_ms):
+    """send_message_batch in parallel, 10 messages per call"""
+    body = json.dumps({'event': 'benchmark', 'simulateWorkSeconds': work_ms / 1000})
+
+    def send(start):
+        sqs_client.send_message_batch(
+            QueueUrl=queue_url,
+            Entries=[{'Id': str(i), 'MessageBody': body} for i in range(min(10, count - start))]
+        )
+
+    with ThreadPoolExecutor(max_workers=10) as executor:
+        list(executor.map(send, range(0, count, 10)))
+
+
+def drain_baseline(handler, sqs_client, queue_url, count):
+    """Short polls, records handled one by one, one delete_message call each"""
+    done = 0
+    while done < count:
+        response = sqs_client.receive_message(QueueUrl=queue_url, MaxNumberOfMessages=10, WaitTimeSeconds=1)
+        for message in response.get('Messages', []):
+            handler.process_record(handler.to_record(message, queue_url), verbose=False)
+            sqs_client.delete_message(QueueUrl=queue_url, ReceiptHandle=message['ReceiptHandle'])
+            done += 1
+
+
+def drain_worker(handler, queue_url, count, pollers, concurrency):
+    worker = handler.SQSWorker(queue_url, pollers=pollers, concurrency=concurrency, verbose=False)
+    worker.start()
+    while True:
+        stats = worker.snapshot()
+        if stats['deleted'] >= count:
+            break
+        time.sleep(0.05)
+    return worker
+
+
+def run(handler, sqs_client, args, label, drain):
+    queue_name = f"benchmark-{label}-{int(time.time() * 1000)}"
+    queue_url = sqs_client.create_queue(QueueName=queue_name)['QueueUrl']
+    try:
+        fill_queue(sqs_client, queue_url, args.messages, args.work_ms)
+        started = time.perf_counter()
+        worker = drain(queue_url)
+        elapsed = time.perf_counter() - started
+        if worker:
+            # Outside the timing: pollers may sit in a long poll for up to WaitTimeSeconds
+            worker.stop_event.set()
+    finally:
+        sqs_client.delete_queue(QueueUrl=queue_url)
+    return {
+        'mode': label,
+        'messages': args.messages,
+        'seconds': round(elapsed, 3),
+        'messages_per_second': round(args.messages / elapsed, 1)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Messages/sec benchmark for the SQS worker mode")
+    parser.add_argument('--endpoint', default='http://localhost:4566', help="LocalStack endpoint")
+    parser.add_argument('--messages', type=int, default=1000)
+    parser.add_argument('--work-ms', type=float, default=0, help="Simulated processing time per message")
+    parser.add_argument('--pollers', type=int, default=2)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[10], help="Handler pool sizes (one run each)")
+    parser.add_argument('--baseline', action='store_true', help="Also run the sequential one-by-one consumer")
+    parser.add_argument('--output', help="Write the results as JSON")
+    args = parser.parse_args()
+
+    os.environ.setdefault('SQS_ENDPOINT', args.endpoint)
+    import handler
+
+    print("⏱️ SQS Worker Benchmark")
+    print("=" * 60)
+    sqs_client = handler.get_sqs_client()
+
+    results = []
+    if args.baseline:
+        results.append(run(handler, sqs_client, args, 'baseline',
+                           lambda queue_url: drain_baseline(handler, sqs_client, queue_url, args.messages)))
+        print(f"🐢 baseline: {results[-1]['messages_per_second']} msg/s ({results[-1]['seconds']}s)")
+
+    for concurrency in args.concurrency:
+        label = f"worker-{args.pollers}x{concurrency}"
+        results.append(run(handler, sqs_client, args, label,
+                           lambda queue_url: drain_worker(handler, queue_url, args.messages, args.pollers, concurrency)))
+        print(f"🚀 {label}: {results[-1]['messages_per_second']} msg/s ({results[-1]['seconds']}s)")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults: {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -1,25 +1,153 @@
 import boto3
 import os
+import sys
 import json
-from http.server import HTTPServer, BaseHTTPRequestHandler
-from botocore.exceptions import ClientError
+import time
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from functools import lru_cache
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from botocore.config import Config
+from botocore.exceptions import BotoCoreError, ClientError
+
+# Continuous worker mode (SQS_WORKER=1 or `python handler.py worker`)
+WORKER_POLLERS = int(os.getenv('WORKER_POLLERS', 2))
+WORKER_CONCURRENCY = int(os.getenv('WORKER_CONCURRENCY', 10))
+WORKER_WAIT_SECONDS = int(os.getenv('WORKER_WAIT_SECONDS', 20))
+WORKER_VISIBILITY_TIMEOUT = int(os.getenv('WORKER_VISIBILITY_TIMEOUT', 30))
+BATCH_SIZE = 10  # SQS maximum for receive and the *_batch calls
+# Concurrent *_batch calls for /send-messages and /delete-messages
+BATCH_CONCURRENCY = int(os.getenv('BATCH_CONCURRENCY', 8))
+NONEXISTENT_QUEUE_CODES = ('AWS.SimpleQueueService.NonExistentQueue', 'QueueDoesNotExist')
+
+print_lock = threading.Lock()
+
+@lru_cache(maxsize=None)
+def get_sqs_client():
+    """SQS client shared by the HTTP handler and the worker threads (boto3 clients are thread-safe)"""
+    return boto3.client(
+        'sqs',
+        endpoint_url=os.getenv('SQS_ENDPOINT', 'http://localstack:4566'),
+        aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID', 'test'),
+        aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY', 'test'),
+        region_name=os.getenv('AWS_DEFAULT_REGION', 'us-east-1'),
+        # Long polls hold a connection each, on top of the handlers' calls
+        config=Config(max_pool_connections=WORKER_POLLERS + WORKER_CONCURRENCY + BATCH_CONCURRENCY + 10)
+    )
+
+@lru_cache(maxsize=None)
+def get_queue_url(queue_name=None):
+    """Queue URL, looked up once per queue name (see forget_queue_url)"""
+    queue_name = queue_name or os.getenv('SQS_QUEUE_NAME', 'test-queue')
+    return get_sqs_client().get_queue_url(QueueName=queue_name)['QueueUrl']
+
+def forget_queue_url(error):
+    """Drop cached queue URLs when the queue is gone, so a recreated queue is found again"""
+    if error.response.get('Error', {}).get('Code') in NONEXISTENT_QUEUE_CODES:
+        get_queue_url.cache_clear()
+
+batch_executor = ThreadPoolExecutor(max_workers=BATCH_CONCURRENCY, thread_name_prefix='sqs-batch')
+
+def run_batches(call, entries):
+    """Split entries into chunks of 10 and run `call(chunk)` concurrently
+
+    Entry Ids are their index in `entries`. Returns (successful, failed) with
+    the per-entry results of every chunk; a chunk whose call raised counts as
+    failed entirely.
+    """
+    chunks = [entries[i:i + BATCH_SIZE] for i in range(0, len(entries), BATCH_SIZE)]
+    
+    def run_chunk(chunk):
+        try:
+            return call(chunk)
+        except ClientError as e:
+            forget_queue_url(e)
+            error = e.response.get('Error', {})
+            return {'Failed': [
+                {'Id': entry['Id'], 'Code': error.get('Code', 'Error'), 'Message': error.get('Message', str(e)), 'SenderFault': True}
+                for entry in chunk
+            ]}
+    
+    successful, failed = [], []
+    for response in batch_executor.map(run_chunk, chunks):
+        successful.extend(response.get('Successful', []))
+        failed.extend(response.get('Failed', []))
+    successful.sort(key=lambda entry: int(entry['Id']))
+    failed.sort(key=lambda entry: int(entry['Id']))
+    return successful, failed
+
+def send_messages(bodies):
+    """send_message_batch for any number of message bodies"""
+    queue_url = get_queue_url()
+    entries = [{'Id': str(i), 'MessageBody': body} for i, body in enumerate(bodies)]
+    return run_batches(
+        lambda chunk: get_sqs_client().send_message_batch(QueueUrl=queue_url, Entries=chunk),
+        entries
+    )
+
+def delete_messages(receipt_handles):
+    """delete_message_batch for any number of receipt handles"""
+    queue_url = get_queue_url()
+    entries = [{'Id': str(i), 'ReceiptHandle': handle} for i, handle in enumerate(receipt_handles)]
+    return run_batches(
+        lambda chunk: get_sqs_client().delete_message_batch(QueueUrl=queue_url, Entries=chunk),
+        entries
+    )
+
+def batch_failures(failed):
+    return [
+        {'index': int(entry['Id']), 'code': entry.get('Code'), 'message': entry.get('Message')}
+        for entry in failed
+    ]
+
+def process_record(record, verbose=True):
+    """Handle one SQS record; raises when the message could not be processed
+
+    JSON bodies may carry `simulateWorkSeconds` (a slow item) or
+    `simulateFailure` (a failing one) to exercise the worker.
+    """
+    message_body = record.get('body', '')
+    receipt_handle = record.get('receiptHandle', '')
+    message_id = record.get('messageId', '')
+    
+    if verbose:
+        # One print per record so concurrent handlers don't interleave lines
+        with print_lock:
+            print("\n".join([
+                f"🎯 SQS Message Received!",
+                f"   Message ID: {message_id}",
+                f"   Body: {message_body}",
+                f"   Receipt Handle: {receipt_handle[:20]}...",
+                "-" * 50
+            ]))
+    
+    try:
+        data = json.loads(message_body)
+    except ValueError:
+        return
+    if isinstance(data, dict):
+        if data.get('simulateWorkSeconds'):
+            time.sleep(float(data['simulateWorkSeconds']))
+        if data.get('simulateFailure'):
+            raise ValueError(f"Simulated failure for message {message_id}")
 
 def lambda_handler(event, context=None):
-    """AWS Lambda handler for SQS events"""
+    """AWS Lambda handler for SQS events
+
+    Failed records are reported in `batchItemFailures` (ReportBatchItemFailures),
+    so only those are retried instead of the whole batch.
+    """
     print(f"Received event: {json.dumps(event, indent=2)}")
     
+    failures = []
     try:
         if 'Records' in event:
             for record in event['Records']:
-                message_body = record.get('body', '')
-                receipt_handle = record.get('receiptHandle', '')
-                message_id = record.get('messageId', '')
-                
-                print(f"🎯 SQS Message Received!")
-                print(f"   Message ID: {message_id}")
-                print(f"   Body: {message_body}")
-                print(f"   Receipt Handle: {receipt_handle[:20]}...")
-                print("-" * 50)
+                try:
+                    process_record(record)
+                except Exception as e:
+                    print(f"❌ Message {record.get('messageId', '')} failed: {e}")
+                    failures.append({'itemIdentifier': record.get('messageId', '')})
         else:
             print("No SQS records found in event")
             
@@ -32,9 +160,185 @@ def lambda_handler(event, context=None):
     
     return {
         'statusCode': 200,
-        'body': json.dumps('Lambda function executed successfully')
+        'body': json.dumps('Lambda function executed successfully'),
+        'batchItemFailures': failures
     }
 
+def to_record(message, queue_url):
+    """SQS message → the record shape Lambda's SQS event source delivers"""
+    return {
+        'messageId': message['MessageId'],
+        'receiptHandle': message['ReceiptHandle'],
+        'body': message['Body'],
+        'md5OfBody': message['MD5OfBody'],
+        'attributes': message.get('Attributes', {}),
+        'messageAttributes': message.get('MessageAttributes', {}),
+        'eventSource': 'aws:sqs',
+        'eventSourceARN': queue_url
+    }
+
+class SQSWorker:
+    """Continuous consumer, like Lambda's SQS event source mapping
+
+    Each poller long-polls batches of 10 and runs the records on a shared
+    handler pool. Successful messages are removed with one delete_message_batch
+    per batch; failed ones are left to reappear after the visibility timeout
+    (and reach a DLQ if the queue has a redrive policy). While records are still
+    running, the batch's visibility timeout is extended every half timeout.
+    """
+    
+    def __init__(self, queue_url, pollers=WORKER_POLLERS, concurrency=WORKER_CONCURRENCY,
+                 wait_seconds=WORKER_WAIT_SECONDS, visibility_timeout=WORKER_VISIBILITY_TIMEOUT,
+                 verbose=True):
+        self.queue_url = queue_url
+        self.pollers = pollers
+        self.concurrency = concurrency
+        self.wait_seconds = wait_seconds
+        self.visibility_timeout = visibility_timeout
+        self.verbose = verbose
+        self.executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='sqs-handler')
+        self.stop_event = threading.Event()
+        self.threads = []
+        self.lock = threading.Lock()
+        self.stats = {'received': 0, 'succeeded': 0, 'failed': 0, 'deleted': 0, 'extended': 0, 'batches': 0, 'partial_batches': 0}
+    
+    def count(self, name, value=1):
+        with self.lock:
+            self.stats[name] += value
+    
+    def start(self):
+        for i in range(self.pollers):
+            thread = threading.Thread(target=self.poll, name=f'sqs-poller-{i}', daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        print(f"👷 SQS worker started: {self.pollers} poller(s), {self.concurrency} handlers, "
+              f"{self.wait_seconds}s long polls, {self.visibility_timeout}s visibility timeout")
+    
+    def stop(self):
+        """Stop polling; batches in progress are finished first"""
+        self.stop_event.set()
+        for thread in self.threads:
+            thread.join()
+        self.executor.shutdown(wait=True)
+    
+    def poll(self):
+        sqs_client = get_sqs_client()
+        while not self.stop_event.is_set():
+            try:
+                response = sqs_client.receive_message(
+                    QueueUrl=self.queue_url,
+                    MaxNumberOfMessages=BATCH_SIZE,
+                    WaitTimeSeconds=self.wait_seconds,
+                    VisibilityTimeout=self.visibility_timeout,
+                    AttributeNames=['All'],
+                    MessageAttributeNames=['All']
+                )
+                messages = response.get('Messages', [])
+                if messages:
+                    failures = self.handle_batch(messages)
+                    if failures:
+                        # Same report as ReportBatchItemFailures: these stay on the queue
+                        self.count('partial_batches')
+                        print(f"⚠️ {len(failures)} of {len(messages)} messages failed, "
+                              f"retried after the visibility timeout: {json.dumps({'batchItemFailures': failures})}")
+            except (ClientError, BotoCoreError) as e:
+                # Connection errors too (e.g. LocalStack restarting): back off, keep polling
+                if self.stop_event.is_set():
+                    break
+                print(f"❌ Worker error: {e}")
+                self.stop_event.wait(5)
+    
+    def handle_batch(self, messages):
+        """Run one received batch; returns the batchItemFailures
+
+        Successes are deleted as soon as they finish (records completing
+        together share a delete_message_batch call), so a slow record can't
+        hold finished ones past their visibility timeout.
+        """
+        self.count('received', len(messages))
+        self.count('batches')
+        futures = {
+            self.executor.submit(process_record, to_record(message, self.queue_url), self.verbose): message
+            for message in messages
+        }
+        
+        failures = []
+        pending = set(futures)
+        next_extension = time.monotonic() + self.visibility_timeout / 2
+        while pending:
+            done, pending = wait(pending, timeout=max(0, next_extension - time.monotonic()),
+                                 return_when=FIRST_COMPLETED)
+            succeeded = []
+            for future in done:
+                message = futures[future]
+                error = future.exception()
+                if error is None:
+                    succeeded.append(message)
+                else:
+                    print(f"❌ Message {message['MessageId']} failed: {error}")
+                    failures.append({'itemIdentifier': message['MessageId']})
+            self.count('succeeded', len(succeeded))
+            self.count('failed', len(done) - len(succeeded))
+            self.delete_batch(succeeded)
+            
+            if pending and time.monotonic() >= next_extension:
+                self.extend_visibility([futures[future] for future in pending])
+                next_extension = time.monotonic() + self.visibility_timeout / 2
+        return failures
+    
+    def extend_visibility(self, messages):
+        """Slow items keep their messages invisible until they finish"""
+        try:
+            response = get_sqs_client().change_message_visibility_batch(
+                QueueUrl=self.queue_url,
+                Entries=[
+                    {'Id': str(i), 'ReceiptHandle': message['ReceiptHandle'], 'VisibilityTimeout': self.visibility_timeout}
+                    for i, message in enumerate(messages)
+                ]
+            )
+        except (ClientError, BotoCoreError) as e:
+            print(f"⚠️ Could not extend visibility: {e}")
+            return
+        self.count('extended', len(response.get('Successful', [])))
+        for failed in response.get('Failed', []):
+            print(f"⚠️ Could not extend visibility of {messages[int(failed['Id'])]['MessageId']}: {failed.get('Message')}")
+    
+    def delete_batch(self, messages):
+        if not messages:
+            return
+        try:
+            response = get_sqs_client().delete_message_batch(
+                QueueUrl=self.queue_url,
+                Entries=[
+                    {'Id': str(i), 'ReceiptHandle': message['ReceiptHandle']}
+                    for i, message in enumerate(messages)
+                ]
+            )
+        except (ClientError, BotoCoreError) as e:
+            # The messages reappear after the visibility timeout and are handled again
+            print(f"⚠️ Could not delete {len(messages)} processed message(s): {e}")
+            return
+        self.count('deleted', len(response.get('Successful', [])))
+        for failed in response.get('Failed', []):
+            print(f"⚠️ Could not delete {messages[int(failed['Id'])]['MessageId']}: {failed.get('Message')}")
+    
+    def snapshot(self):
+        with self.lock:
+            return dict(self.stats)
+
+def start_worker():
+    """Start the worker once the queue exists (LocalStack creates it after startup)"""
+    while True:
+        try:
+            queue_url = get_queue_url()
+            break
+        except ClientError as e:
+            print(f"⏳ Waiting for the queue: {e}")
+            time.sleep(5)
+    worker = SQSWorker(queue_url)
+    worker.start()
+    return worker
+
 class LambdaHTTPHandler(BaseHTTPRequestHandler):
     """HTTP handler to simulate Lambda invocation"""
     
@@ -42,20 +346,12 @@ class LambdaHTTPHandler(BaseHTTPRequestHandler):
         """Handle GET requests to list SQS messages"""
         try:
             if self.path == '/messages':
-                sqs_client = boto3.client(
-                    'sqs',
-                    endpoint_url=os.getenv('SQS_ENDPOINT', 'http://localstack:4566'),
-                    aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID', 'test'),
-                    aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY', 'test'),
-                    region_name=os.getenv('AWS_DEFAULT_REGION', 'us-east-1')
-                )
+                sqs_client = get_sqs_client()
                 
                 queue_name = os.getenv('SQS_QUEUE_NAME', 'test-queue')
                 
                 try:
-                    # Get queue URL
-                    queue_url_response = sqs_client.get_queue_url(QueueName=queue_name)
-                    queue_url = queue_url_response['QueueUrl']
+                    queue_url = get_queue_url(queue_name)
                     
                     # Receive messages (up to 10)
                     response = sqs_client.receive_message(
@@ -96,6 +392,7 @@ class LambdaHTTPHandler(BaseHTTPRequestHandler):
                     }).encode('utf-8'))
                     
                 except ClientError as e:
+                    forget_queue_url(e)
                     self.send_response(404)
                     self.send_header('Content-Type', 'application/json')
                     self.send_header('Access-Control-Allow-Origin', '*')
@@ -123,20 +420,8 @@ class LambdaHTTPHandler(BaseHTTPRequestHandler):
                     data = json.loads(body)
                     message_body = data.get('message', '')
                     
-                    sqs_client = boto3.client(
-                        'sqs',
-                        endpoint_url=os.getenv('SQS_ENDPOINT', 'http://localstack:4566'),
-                        aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID', 'test'),
-                        aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY', 'test'),
-                        region_name=os.getenv('AWS_DEFAULT_REGION', 'us-east-1')
-                    )
-                    
-                    queue_name = os.getenv('SQS_QUEUE_NAME', 'test-queue')
-                    queue_url_response = sqs_client.get_queue_url(QueueName=queue_name)
-                    queue_url = queue_url_response['QueueUrl']
-                    
-                    response = sqs_client.send_message(
-                        QueueUrl=queue_url,
+                    response = get_sqs_client().send_message(
+                        QueueUrl=get_queue_url(),
                         MessageBody=message_body
                     )
                     
@@ -154,20 +439,8 @@ class LambdaHTTPHandler(BaseHTTPRequestHandler):
                     data = json.loads(body)
                     receipt_handle = data.get('receiptHandle', '')
                     
-                    sqs_client = boto3.client(
-                        'sqs',
-                        endpoint_url=os.getenv('SQS_ENDPOINT', 'http://localstack:4566'),
-                        aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID', 'test'),
-                        aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY', 'test'),
-                        region_name=os.getenv('AWS_DEFAULT_REGION', 'us-east-1')
-                    )
-                    
-                    queue_name = os.getenv('SQS_QUEUE_NAME', 'test-queue')
-                    queue_url_response = sqs_client.get_queue_url(QueueName=queue_name)
-                    queue_url = queue_url_response['QueueUrl']
-                    
-                    sqs_client.delete_message(
-                        QueueUrl=queue_url,
+                    get_sqs_client().delete_message(
+                        QueueUrl=get_queue_url(),
                         ReceiptHandle=receipt_handle
                     )
                     
@@ -177,6 +450,41 @@ class LambdaHTTPHandler(BaseHTTPRequestHandler):
                     self.end_headers()
                     self.wfile.write(json.dumps({'success': True}).encode('utf-8'))
                     
+                elif self.path == '/send-messages':
+                    # Send many messages: {"messages": ["text", {"json": "object"}, ...]}
+                    data = json.loads(body)
+                    bodies = [
+                        message if isinstance(message, str) else json.dumps(message)
+                        for message in data.get('messages', [])
+                    ]
+                    if not bodies:
+                        self.send_json(400, {'error': 'messages must be a non-empty list'})
+                        return
+                    
+                    successful, failed = send_messages(bodies)
+                    self.send_json(200, {
+                        'sent': len(successful),
+                        'messages': [
+                            {'index': int(entry['Id']), 'messageId': entry['MessageId'], 'md5OfBody': entry['MD5OfMessageBody']}
+                            for entry in successful
+                        ],
+                        'failed': batch_failures(failed)
+                    })
+                    
+                elif self.path == '/delete-messages':
+                    # Delete many messages: {"receiptHandles": [...]}
+                    data = json.loads(body)
+                    receipt_handles = data.get('receiptHandles', [])
+                    if not receipt_handles:
+                        self.send_json(400, {'error': 'receiptHandles must be a non-empty list'})
+                        return
+                    
+                    successful, failed = delete_messages(receipt_handles)
+                    self.send_json(200, {
+                        'deleted': len(successful),
+                        'failed': batch_failures(failed)
+                    })
+                    
                 else:
                     # Default lambda handler
                     event = json.loads(body)
@@ -199,11 +507,20 @@ class LambdaHTTPHandler(BaseHTTPRequestHandler):
             
         except Exception as e:
             print(f"Error handling request: {e}")
+            if isinstance(e, ClientError):
+                forget_queue_url(e)
             self.send_response(500)
             self.send_header('Access-Control-Allow-Origin', '*')
             self.end_headers()
             self.wfile.write(json.dumps({'error': str(e)}).encode('utf-8'))
     
+    def send_json(self, status, payload):
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.end_headers()
+        self.wfile.write(json.dumps(payload).encode('utf-8'))
+    
     def do_OPTIONS(self):
         """Handle preflight CORS requests"""
         self.send_response(200)
@@ -221,7 +538,12 @@ def main():
     port = int(os.getenv('LAMBDA_PORT', 8081))
     print(f"🚀 Lambda function server starting on port {port}...")
     
-    server = HTTPServer(('0.0.0.0', port), LambdaHTTPHandler)
+    # A thread per request, so batch sends don't queue behind /messages polls
+    server = ThreadingHTTPServer(('0.0.0.0', port), LambdaHTTPHandler)
+    server.daemon_threads = True
+    
+    if os.getenv('SQS_WORKER', '').lower() in ('1', 'true', 'yes'):
+        threading.Thread(target=start_worker, daemon=True).start()
     
     try:
         server.serve_forever()
@@ -229,5 +551,24 @@ def main():
         print("\nShutting down lambda function...")
         server.shutdown()
 
+def run_worker():
+    """Worker only, no HTTP server: `python handler.py worker`"""
+    worker = start_worker()
+    last, last_time = 0, time.perf_counter()
+    try:
+        while True:
+            time.sleep(10)
+            stats = worker.snapshot()
+            now = time.perf_counter()
+            rate = (stats['succeeded'] + stats['failed'] - last) / (now - last_time)
+            last, last_time = stats['succeeded'] + stats['failed'], now
+            print(f"📈 {rate:.1f} msg/s | {stats}")
+    except KeyboardInterrupt:
+        print("\nShutting down worker, finishing batches in progress...")
+        worker.stop()
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    if len(sys.argv) > 1 and sys.argv[1] == 'worker':
+        run_worker()
+    else:
+        main()
\ No newline at end of file
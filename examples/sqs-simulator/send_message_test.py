@@ -2,8 +2,16 @@ import boto3
 import os
 import sys
 import json
+import time
+import threading
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from botocore.config import Config
 from botocore.exceptions import ClientError
 
+LOAD_TICK_SECONDS = 0.1  # the load generator sends rate * tick messages per tick
+LAMBDA_URL = 'http://localhost:8081'
+
 def send_message_to_sqs(message_body):
     """Send a message to SQS queue using LocalStack"""
     
@@ -101,6 +109,99 @@ def receive_messages_from_sqs():
         print(f"Unexpected error: {e}")
         sys.exit(1)
 
+def load_test(count, rate, mode='direct'):
+    """Push `count` messages at `rate` messages/sec and report the achieved rate
+
+    direct: send_message_batch against LocalStack, 10 messages per call
+    api:    POST /send-messages on the lambda, one request per tick
+    """
+    print(f"🚀 Load test: {count} messages at {rate}/s ({mode})")
+    
+    sqs_client = boto3.client(
+        'sqs',
+        endpoint_url='http://localhost:4566',
+        aws_access_key_id='test',
+        aws_secret_access_key='test',
+        region_name='us-east-1',
+        config=Config(max_pool_connections=50)
+    )
+    queue_name = 'test-queue'
+    
+    try:
+        queue_url = sqs_client.get_queue_url(QueueName=queue_name)['QueueUrl']
+    except ClientError as e:
+        print(f"Error: Queue '{queue_name}' not available: {e}")
+        print("Make sure LocalStack services are running with: docker-compose up")
+        sys.exit(1)
+    
+    lock = threading.Lock()
+    totals = {'sent': 0, 'failed': 0}
+    latencies = []
+    
+    def send_direct(bodies):
+        for i in range(0, len(bodies), 10):
+            chunk = bodies[i:i + 10]
+            started = time.perf_counter()
+            try:
+                response = sqs_client.send_message_batch(
+                    QueueUrl=queue_url,
+                    Entries=[{'Id': str(j), 'MessageBody': body} for j, body in enumerate(chunk)]
+                )
+                sent, failed = len(response.get('Successful', [])), len(response.get('Failed', []))
+            except ClientError as e:
+                print(f"   ❌ Batch failed: {e}")
+                sent, failed = 0, len(chunk)
+            with lock:
+                latencies.append(time.perf_counter() - started)
+                totals['sent'] += sent
+                totals['failed'] += failed
+    
+    def send_api(bodies):
+        request = urllib.request.Request(
+            f"{LAMBDA_URL}/send-messages",
+            data=json.dumps({'messages': bodies}).encode('utf-8'),
+            headers={'Content-Type': 'application/json'}
+        )
+        started = time.perf_counter()
+        try:
+            with urllib.request.urlopen(request, timeout=30) as response:
+                result = json.loads(response.read())
+            sent, failed = result['sent'], len(result['failed'])
+        except (OSError, ValueError, KeyError) as e:
+            print(f"   ❌ Request failed: {e}")
+            sent, failed = 0, len(bodies)
+        with lock:
+            latencies.append(time.perf_counter() - started)
+            totals['sent'] += sent
+            totals['failed'] += failed
+    
+    send = send_api if mode == 'api' else send_direct
+    per_tick = max(1, round(rate * LOAD_TICK_SECONDS))
+    interval = per_tick / rate
+    
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=32) as executor:
+        for tick, first in enumerate(range(0, count, per_tick)):
+            # Sleep until this tick's slot; when behind schedule, send right away
+            delay = started + tick * interval - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            bodies = [
+                json.dumps({'event': 'load_test', 'seq': seq, 'sentAt': time.time()})
+                for seq in range(first, min(first + per_tick, count))
+            ]
+            executor.submit(send, bodies)
+    elapsed = time.perf_counter() - started
+    
+    latencies.sort()
+    achieved = totals['sent'] / elapsed if elapsed else 0
+    print(f"✅ Sent {totals['sent']} messages in {elapsed:.2f}s ({totals['failed']} failed)")
+    print(f"   Target rate: {rate}/s, achieved: {achieved:.1f}/s ({achieved / rate:.0%})")
+    if latencies:
+        p50 = latencies[len(latencies) // 2]
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+        print(f"   Call latency: p50 {p50 * 1000:.1f} ms, p99 {p99 * 1000:.1f} ms over {len(latencies)} calls")
+
 def main():
     """Main function to demonstrate SQS operations"""
     if len(sys.argv) < 2:
@@ -108,6 +209,7 @@ def main():
         print("  python send_message_test.py send '<message>'")
         print("  python send_message_test.py receive")
         print("  python send_message_test.py demo")
+        print("  python send_message_test.py load <count> <rate> [direct|api]")
         sys.exit(1)
     
     action = sys.argv[1].lower()
@@ -141,9 +243,19 @@ def main():
         print(f"\n✅ Demo completed! Sent {len(demo_messages)} messages.")
         print("You can now view them in the web UI at http://localhost:3001")
         
+    elif action == 'load':
+        if len(sys.argv) < 4:
+            print("Usage: python send_message_test.py load <count> <messages per second> [direct|api]")
+            sys.exit(1)
+        mode = sys.argv[4] if len(sys.argv) > 4 else 'direct'
+        if mode not in ('direct', 'api'):
+            print(f"Unknown load mode: {mode} (direct or api)")
+            sys.exit(1)
+        load_test(int(sys.argv[2]), float(sys.argv[3]), mode)
+        
     else:
         print(f"Unknown action: {action}")
-        print("Available actions: send, receive, demo")
+        print("Available actions: send, receive, demo, load")
         sys.exit(1)
 
 if __name__ == "__main__":
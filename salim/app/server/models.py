@@ -12,6 +12,8 @@ class Supermarket(Base):
     city = Column(Text)
     address = Column(Text)
     website = Column(Text)
+    chain_id = Column(Text)
+    store_id = Column(Text)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     # Relationship
@@ -170,7 +170,7 @@ def handle_search_product(product_name: str, db: Session) -> MCPToolResult:
                     "promo_price": float(product.promo_price) if product.promo_price else None,
                     "promo_text": product.promo_text,
                     "supermarket_id": product.supermarket_id,
-                    "size_value": product.size_value,
+                    "size_value": float(product.size_value) if product.size_value is not None else None,
                     "size_unit": product.size_unit,
                     "currency": product.currency,
                     "in_stock": product.in_stock
@@ -0,0 +1,26 @@
+-- Indexes for the access paths the API routes, the MCP tools and the ETL use.
+-- Idempotent, so it also migrates an existing database:
+--   psql -h localhost -U postgres -d salim_db -f indexes.sql
+-- check_query_plans.py EXPLAINs every query against a synthetic dataset and fails
+-- when one of them stops using these.
+
+-- /products/barcode/{barcode}, /products/price-history/{barcode}, MCP compare_results
+CREATE INDEX IF NOT EXISTS products_barcode_collected_idx ON products (barcode, collected_at DESC);
+DROP INDEX IF EXISTS products_barcode_idx;       -- a prefix of the index above
+
+-- /products?supermarket_id=, /supermarkets/{id}/products?category=, MCP get_store_info
+CREATE INDEX IF NOT EXISTS products_supermarket_category_idx ON products (supermarket_id, category);
+DROP INDEX IF EXISTS products_supermarket_idx;   -- a prefix of the index above
+
+-- /products/lowest-prices: joins each store back to its minimum effective price
+CREATE INDEX IF NOT EXISTS products_supermarket_effective_price_idx
+  ON products (supermarket_id, (COALESCE(promo_price, price)));
+
+-- /products?category=, /products/lowest-prices?category=
+CREATE INDEX IF NOT EXISTS products_category_effective_price_idx
+  ON products (category, supermarket_id, (COALESCE(promo_price, price)));
+
+-- /products?brand= (ILIKE '%...%'); canonical_name already has products_name_trgm_idx
+CREATE INDEX IF NOT EXISTS products_brand_trgm_idx ON products USING GIN (brand gin_trgm_ops);
+
+ANALYZE products;
@@ -8,6 +8,8 @@ CREATE TABLE supermarkets (
   city             TEXT,
   address          TEXT,
   website          TEXT,
+  chain_id         TEXT,                   -- PriceFull ChainId (set by load_price_items.py)
+  store_id         TEXT,                   -- PriceFull StoreId
   created_at       TIMESTAMPTZ NOT NULL DEFAULT now()
 );
 
@@ -42,7 +44,14 @@ CREATE TABLE products (
 
 -- indexes
 CREATE UNIQUE INDEX supermarkets_name_branch_idx ON supermarkets (LOWER(name), COALESCE(LOWER(branch_name), ''));
-CREATE INDEX products_supermarket_idx  ON products (supermarket_id);
-CREATE INDEX products_barcode_idx      ON products (barcode);
+CREATE INDEX supermarkets_chain_store_idx ON supermarkets (chain_id, store_id);
 CREATE INDEX products_time_idx         ON products (collected_at DESC);
 CREATE INDEX products_name_trgm_idx    ON products USING GIN (canonical_name gin_trgm_ops);
+-- query-specific product indexes: indexes.sql (run after this file)
+
+-- incremental ETL state (load_price_items.py)
+CREATE TABLE etl_watermarks (
+  source      TEXT PRIMARY KEY,
+  last_id     BIGINT NOT NULL,  -- highest price_items.id loaded
+  updated_at  TIMESTAMPTZ NOT NULL DEFAULT now()
+);